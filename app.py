@@ -7,13 +7,43 @@ Main Bottle app
 """
 import os
 import json
+import hashlib
+import itertools
+import tempfile
+from email.message import Message
+from email.parser import HeaderParser
+from email.utils import collapse_rfc2231_value
+from operator import itemgetter
 
-from bottle import Bottle
-from bottle import request, static_file
+from bottle import Bottle, FileUpload, HTTPResponse
+from bottle import request, response, static_file, http_date, parse_date
+from dotenv import load_dotenv
 from jinja2 import Environment, FileSystemLoader
 from code_references import CODE_REFERENCE, CODE_REGEX
-from codeislow import main, load_result
-from result_templates import start_results, end_results
+from check_validity import MAX_YEAR_NB, check_year_nb
+from codeislow import main, load_result, RESOLUTION_ORDERS
+from matching import PATTERN_FORMATS
+from jobs import register_job, release_job, cancel_job, get_cancel_stats
+from request_api import MissingCredentialsError, get_article_from_record, get_article_record, get_articles
+from result_templates import start_results, cancel_row, message_row, end_results
+from sandbox import ParserError, get_parser_pool
+
+# nombre maximal de références par requête POST /api/articles/
+API_BATCH_MAX = 200
+# temps maximal d'une analyse (secondes): les routeurs type Heroku coupent les requêtes après 30 secondes
+UPLOAD_TIME_BUDGET = 25
+# taille maximale d'un document déposé (octets), annoncée sur la page d'accueil
+UPLOAD_MAX_SIZE = 2 * 1024 * 1024
+# marge pour les champs du formulaire qui accompagnent le document (see upload)
+UPLOAD_FORM_MARGIN = 64 * 1024
+# au-delà de cette taille, le document déposé est écrit dans un fichier temporaire plutôt que gardé en mémoire
+UPLOAD_MEMORY_SIZE = int(os.getenv("CODEISLOW_UPLOAD_MEMORY_SIZE", 1024 * 1024))
+UPLOAD_CHUNK_SIZE = 64 * 1024
+UPLOAD_TOO_LARGE = 'Le fichier dépasse la taille maximale de 2 Mo'
+UPLOAD_FORM_INCORRECT = 'Le formulaire de dépôt est incorrect'
+UPLOAD_PERIOD_INCORRECT = f"Les périodes passée et future doivent être des nombres d'années entre 0 et {MAX_YEAR_NB}"
+# la lecture du document a échoué en cours d'analyse (see sandbox.ParserError)
+PARSER_FAILED = "Le document n'a pas pu être lu jusqu'au bout"
 
 app = Bottle()
 
@@ -54,34 +84,452 @@ def codes():
 #https://stackoverflow.com/questions/69125397/call-function-with-arguments-from-user-input-in-python3-flask-jinja2-template
 #https://stackoverflow.com/questions/6036082/call-a-python-function-from-jinja2
 
+class UploadTooLarge(ValueError):
+    """The document, or the request body, is larger than the upload limit"""
+
+
+def read_upload(chunks, max_size=UPLOAD_MAX_SIZE, memory_size=UPLOAD_MEMORY_SIZE, suffix=""):
+    """
+    Lire le document déposé par blocs, en s'arrêtant dès que max_size est dépassée
+
+    Arguments
+    ---------
+    chunks: iterator of bytes
+        le contenu du document déposé, au fil de la réception (see read_form)
+    max_size: int
+        taille maximale du document (octets). Default to UPLOAD_MAX_SIZE
+    memory_size: int
+        taille au-delà de laquelle le document est écrit dans un fichier temporaire. Default to UPLOAD_MEMORY_SIZE
+    suffix: str
+        l'extension du fichier temporaire eg. ".pdf"
+    Returns
+    -------
+    document: bytes or str
+        le contenu du document, ou le chemin d'un fichier temporaire au nom aléatoire (supprimé une fois lu,
+        see parsing.iter_doc): deux documents déposés sous le même nom ne se remplacent pas
+    Raises
+    ------
+    UploadTooLarge:
+        the document is larger than max_size
+    """
+    buffered, size, spill = [], 0, None
+    try:
+        for chunk in chunks:
+            size += len(chunk)
+            if size > max_size:
+                raise UploadTooLarge(f"The document is larger than {max_size} bytes")
+            if spill is None and size > memory_size:
+                spill = tempfile.NamedTemporaryFile(suffix=suffix, delete=False)
+                spill.writelines(buffered)
+                # from now on the document is only on disk
+                buffered = None
+            if spill is None:
+                buffered.append(chunk)
+            else:
+                spill.write(chunk)
+    except BaseException:
+        if spill is not None:
+            spill.close()
+            os.remove(spill.name)
+        raise
+    if spill is None:
+        return b"".join(buffered)
+    spill.close()
+    return spill.name
+
+
+def iter_multipart(stream, boundary, length=-1, chunk_size=UPLOAD_CHUNK_SIZE):
+    """
+    Lire un corps multipart/form-data au fil de la réception, sans le copier
+
+    bottle (request.files) écrit le corps de la requête dans un fichier temporaire au-delà de 100 Ko,
+    puis cgi.FieldStorage chaque document dans un autre fichier temporaire
+
+    Arguments
+    ---------
+    stream: file object
+        le corps de la requête eg. wsgi.input
+    boundary: str
+        le séparateur des parties (see get_boundary)
+    length: int
+        la taille du corps (Content-Length): stream n'est pas lu au-delà. Default to -1 (lu jusqu'au bout)
+    chunk_size: int
+        taille des blocs lus. Default to UPLOAD_CHUNK_SIZE
+    Yields
+    ------
+    part: (headers, chunk)
+        les en-têtes de la partie (email.message.Message, le même objet pour toute la partie)
+        et un bloc de son contenu, b"" au début de chaque partie (see itertools.groupby)
+    Raises
+    ------
+    ValueError:
+        the body is not a well-formed multipart body
+    """
+    delimiter = b"\r\n--" + boundary.encode("latin-1")
+    # the first delimiter is not preceded by a line break
+    buffer, headers, in_headers = b"\r\n", None, False
+    while True:
+        size = chunk_size if length < 0 else min(chunk_size, length)
+        chunk = stream.read(size) if size else b""
+        if length >= 0:
+            length -= len(chunk)
+        buffer += chunk
+        while True:
+            if in_headers:
+                if len(buffer) < 2:
+                    break
+                if buffer.startswith(b"--"):
+                    # the close delimiter, the epilogue is ignored
+                    return
+                end = buffer.find(b"\r\n\r\n")
+                if end < 0:
+                    if len(buffer) > UPLOAD_FORM_MARGIN:
+                        raise ValueError("The headers of a part are too large")
+                    break
+                # the end of the delimiter line, then the header lines
+                header_lines = buffer[:end].split(b"\r\n", 1)[-1]
+                headers = HeaderParser().parsestr(header_lines.decode("utf-8", "replace"))
+                buffer, in_headers = buffer[end + 4 :], False
+                yield headers, b""
+            index = buffer.find(delimiter)
+            if index < 0:
+                # the end of the buffer may be the beginning of a delimiter
+                keep = len(delimiter) - 1
+                if headers is not None and len(buffer) > keep:
+                    yield headers, buffer[:-keep]
+                buffer = buffer[-keep:]
+                break
+            if headers is not None and index:
+                yield headers, buffer[:index]
+            buffer, in_headers = buffer[index + len(delimiter) :], True
+        if not chunk:
+            raise ValueError("The multipart body is truncated")
+
+
+def get_boundary(content_type):
+    """Le séparateur des parties d'un corps multipart/form-data, None pour un autre Content-Type"""
+    message = Message()
+    message["Content-Type"] = content_type
+    if message.get_content_type() != "multipart/form-data":
+        return None
+    return message.get_param("boundary")
+
+
+def read_form(stream, boundary, length=-1, max_size=UPLOAD_MAX_SIZE, memory_size=UPLOAD_MEMORY_SIZE):
+    """
+    Lire le formulaire de dépôt au fil de la réception: le document n'est copié que par read_upload
+
+    Arguments
+    ---------
+    stream: file object
+        le corps de la requête (see iter_multipart)
+    boundary: str
+        le séparateur des parties
+    length: int
+        la taille du corps (Content-Length). Default to -1
+    max_size: int
+        taille maximale du document (octets). Default to UPLOAD_MAX_SIZE
+    memory_size: int
+        taille au-delà de laquelle le document est écrit dans un fichier temporaire. Default to UPLOAD_MEMORY_SIZE
+    Returns
+    -------
+    forms: dict
+        les champs du formulaire
+    file_name: str
+        le nom du document déposé (champ "upload"), normalisé comme bottle.FileUpload.filename. None sans document
+    document: bytes or str
+        le document, see read_upload. None sans document
+    Raises
+    ------
+    UploadTooLarge:
+        the document is larger than max_size
+    ValueError:
+        the body is not a well-formed multipart body
+    """
+    forms, file_name, document = {}, None, None
+    try:
+        for headers, part in itertools.groupby(iter_multipart(stream, boundary, length), key=itemgetter(0)):
+            chunks = (chunk for _headers, chunk in part)
+            name = collapse_rfc2231_value(headers.get_param("name", "", header="content-disposition"))
+            filename = headers.get_param("filename", header="content-disposition")
+            if filename is None:
+                forms[name] = b"".join(chunks).decode("utf-8", "replace")
+            elif name == "upload" and document is None:
+                file_name = FileUpload(None, name, collapse_rfc2231_value(filename)).filename
+                document = read_upload(chunks, max_size, memory_size, suffix=os.path.splitext(file_name)[1])
+    except BaseException:
+        discard_upload(document)
+        raise
+    return forms, file_name, document
+
+
+def discard_upload(document):
+    """Supprimer le fichier temporaire d'un document déposé, s'il n'a pas été lu (see read_upload)"""
+    if isinstance(document, str) and os.path.exists(document):
+        os.remove(document)
+
+
+class LimitedInput:
+    """
+    Le corps d'une requête sans Content-Length (chunked), lu dans la limite de `max_size` octets
+
+    Raises
+    ------
+    UploadTooLarge:
+        (read) the body is larger than max_size
+    """
+
+    def __init__(self, stream, max_size):
+        self.stream = stream
+        self.max_size = max_size
+        self.size = 0
+
+    def read(self, size=-1):
+        data = self.stream.read(size)
+        self.size += len(data)
+        if self.size > self.max_size:
+            raise UploadTooLarge(f"The request body is larger than {self.max_size} bytes")
+        return data
+
+
 @app.route("/upload/", method="POST")
 def upload():
-    upload = request.files.get('upload')
-    name, ext = os.path.splitext(upload.filename)
+    # fail before reading the request body
+    if request.content_length > UPLOAD_MAX_SIZE + UPLOAD_FORM_MARGIN:
+        yield UPLOAD_TOO_LARGE
+        return
+    boundary = get_boundary(request.content_type)
+    if boundary is None:
+        yield UPLOAD_FORM_INCORRECT
+        return
+    try:
+        if request.content_length < 0:
+            # no Content-Length: bottle decodes the chunks, stop it at the limit
+            request.environ['wsgi.input'] = LimitedInput(request.environ['wsgi.input'], UPLOAD_MAX_SIZE + UPLOAD_FORM_MARGIN)
+            forms, file_name, document = read_form(request.body, boundary)
+        else:
+            forms, file_name, document = read_form(request.environ['wsgi.input'], boundary, request.content_length)
+    except UploadTooLarge:
+        yield UPLOAD_TOO_LARGE
+        return
+    except ValueError:
+        yield UPLOAD_FORM_INCORRECT
+        return
+    if document is None:
+        yield UPLOAD_FORM_INCORRECT
+        return
+    name, ext = os.path.splitext(file_name)
     
     if ext not in ('.doc','.docx','.odt', '.pdf'):
-        return 'Le format du fichier est incorrect'
-    file_path = os.path.join("tmp", upload.filename)
-    upload.save(file_path)
-    past = int(request.forms.get('user_past'))
-    future =  int(request.forms.get('user_future'))
-    selected_codes = [short_name for short_name in CODE_REFERENCE.keys() if request.forms.get(short_name) is not None]
+        discard_upload(document)
+        yield 'Le format du fichier est incorrect'
+        return
+    try:
+        past, future = float(forms.get('user_past')), float(forms.get('user_future'))
+        check_year_nb(past)
+        check_year_nb(future)
+    except (TypeError, ValueError):
+        # before the first row: time_delta would fail once the results page is started
+        discard_upload(document)
+        yield UPLOAD_PERIOD_INCORRECT
+        return
+    selected_codes = [short_name for short_name in CODE_REFERENCE.keys() if forms.get(short_name) is not None]
     if len(selected_codes) == 0: 
         selected_codes = None
-    yield start_results
-    for row in load_result(file_path, None, "article_code", past, future):
-        yield row
-    #     row = f'''
-    #         <tr scope="row"><a href='{article["url"]}'>{article["code"]} - {article["article"]}</a></tr>
-    #         <tr>{article["status"]}</tr>
-    #         <tr>{article["texte"]}</tr>
-    #         <tr></tr>
-    #     '''
-    # yield 
-        
-    yield end_results
-    
+    # "frequency" counts every citation of the document before the first row: the document order is the default
+    order = forms.get('user_order', "document")
+    if order not in RESOLUTION_ORDERS:
+        order = "document"
+    pattern_format = forms.get('user_pattern', "both")
+    if pattern_format not in PATTERN_FORMATS:
+        pattern_format = "both"
+    try:
+        budget = min(float(forms.get('user_budget', UPLOAD_TIME_BUDGET)), UPLOAD_TIME_BUDGET)
+    except ValueError:
+        budget = UPLOAD_TIME_BUDGET
+    job = register_job()
+    results = load_result(
+        document, selected_codes, pattern_format, past, future, job=job, order=order, budget=budget, doc_ext=ext[1:]
+    )
+    try:
+        yield start_results
+        yield cancel_row.format(job_id=job.id)
+        try:
+            for row in results:
+                yield row
+        except ParserError:
+            # the rows already sent stay, the page is closed
+            yield message_row.format(color="danger", message=PARSER_FAILED)
+        yield end_results
+    except GeneratorExit:
+        # the client has gone away: stop resolving the remaining citations
+        job.cancel()
+        results.close()
+        raise
+    finally:
+        release_job(job)
+        # the analysis removes the temporary file once read, but not if it never started (early disconnect)
+        discard_upload(document)
+
+
+@app.route("/jobs/<job_id>/cancel/", method="POST")
+def cancel(job_id):
+    """Annuler une analyse en cours: les citations restantes ne sont plus résolues"""
+    job = cancel_job(job_id)
+    if job is None:
+        return json_error(404, f"Job `{job_id}` not found or already finished")
+    return json.dumps(job.to_dict())
+
+
+@app.route("/jobs/stats/", method="GET")
+def jobs_stats():
+    """Compteurs du travail économisé par les annulations"""
+    response.content_type = "application/json; charset=utf-8"
+    return json.dumps(get_cancel_stats())
+
+
+def json_response(payload, last_modified=None):
+    """
+    Réponse JSON avec ETag (et Last-Modified) qui honore les requêtes conditionnelles
+
+    Arguments
+    ---------
+    payload: dict
+        le contenu de la réponse
+    last_modified: float
+        date (epoch) de la donnée la plus récente. Default to None
+    Returns
+    -------
+    body: str
+        la réponse JSON (vide si le client dispose déjà de la dernière version: 304)
+    """
+    body = json.dumps(payload, ensure_ascii=False, sort_keys=True)
+    etag = '"{}"'.format(hashlib.sha1(body.encode("utf-8")).hexdigest())
+    response.content_type = "application/json; charset=utf-8"
+    response.set_header("ETag", etag)
+    response.set_header("Cache-Control", "private, max-age=0, must-revalidate")
+    if last_modified is not None:
+        response.set_header("Last-Modified", http_date(last_modified))
+    if_none_match = request.get_header("If-None-Match")
+    if if_none_match is not None:
+        if etag in [tag.strip() for tag in if_none_match.split(",")] or if_none_match.strip() == "*":
+            raise HTTPResponse(status=304, headers=dict(response.headers))
+    elif last_modified is not None:
+        if_modified_since = parse_date(request.get_header("If-Modified-Since", ""))
+        if if_modified_since and if_modified_since >= int(last_modified):
+            raise HTTPResponse(status=304, headers=dict(response.headers))
+    return body
+
+
+def json_error(status, message):
+    response.status = status
+    response.content_type = "application/json; charset=utf-8"
+    return json.dumps({"error": message}, ensure_ascii=False)
+
+
+def lookup_article(short_code, article_nb, past, future):
+    """
+    Statut d'un article servi depuis les caches de request_api
+
+    Returns
+    -------
+    article: dict
+        le résultat de request_api.get_article
+    stored_at: float
+        date (epoch) à laquelle l'article a été récupéré auprès de Legifrance
+    """
+    load_dotenv()
+    client_id = os.getenv("API_KEY")
+    client_secret = os.getenv("API_SECRET")
+    record, stored_at = get_article_record(short_code, article_nb, client_id, client_secret)
+    article = get_article_from_record(short_code, article_nb, record, past_year_nb=past, future_year_nb=future)
+    return article, stored_at
+
+
+def get_period(params):
+    """
+    Périodes passée et future (en années) d'une requête API. Default to 3
+
+    Raises
+    ------
+    TypeError, ValueError:
+        past or future is not a number between 0 and MAX_YEAR_NB (see check_validity.check_year_nb)
+    """
+    past, future = float(params.get("past", 3)), float(params.get("future", 3))
+    check_year_nb(past)
+    check_year_nb(future)
+    return past, future
+
+
+@app.route("/api/articles/<short_code>/<article_nb>", method="GET")
+def api_article(short_code, article_nb):
+    """Statut d'un article: GET /api/articles/CTRAV/L1234-5?past=3&future=3"""
+    if short_code not in CODE_REFERENCE:
+        return json_error(404, f"`{short_code}` not found in the supported Code List")
+    try:
+        past, future = get_period(request.query)
+    except ValueError:
+        return json_error(400, f"past and future must be numbers between 0 and {MAX_YEAR_NB}")
+    try:
+        article, stored_at = lookup_article(short_code, article_nb, past, future)
+    except MissingCredentialsError:
+        # a server configuration error, not a wrong request
+        return json_error(503, "The Legifrance API credentials are not configured")
+    except ValueError as e:
+        return json_error(400, str(e))
+    except Exception as e:
+        return json_error(502, str(e))
+    return json_response(article, stored_at)
+
+
+@app.route("/api/articles/", method="POST")
+def api_articles():
+    """
+    Statut de plusieurs articles: POST /api/articles/
+    {"past": 3, "future": 3, "references": [{"code": "CTRAV", "article": "L1234-5"}, ...]}
+    """
+    payload = request.json
+    if not isinstance(payload, dict) or not isinstance(payload.get("references"), list):
+        return json_error(400, "Expected a JSON body with a `references` list")
+    references = payload["references"]
+    if len(references) > API_BATCH_MAX:
+        return json_error(413, f"Too many references: {API_BATCH_MAX} max")
+    try:
+        past, future = get_period(payload)
+    except (TypeError, ValueError):
+        return json_error(400, f"past and future must be numbers between 0 and {MAX_YEAR_NB}")
+    checked_references = []
+    for reference in references:
+        if not isinstance(reference, dict):
+            reference = {}
+        short_code, article_nb = reference.get("code"), reference.get("article")
+        if short_code not in CODE_REFERENCE or not article_nb:
+            checked_references.append((short_code, article_nb, False))
+        else:
+            checked_references.append((short_code, str(article_nb), True))
+    load_dotenv()
+    resolved, stored_at = get_articles(
+        [(short_code, article_nb) for short_code, article_nb, valid in checked_references if valid],
+        os.getenv("API_KEY"),
+        os.getenv("API_SECRET"),
+        past_year_nb=past,
+        future_year_nb=future,
+    )
+    resolved = iter(resolved)
+    articles = []
+    for short_code, article_nb, valid in checked_references:
+        if valid:
+            articles.append(next(resolved))
+        else:
+            articles.append({"code": short_code, "article": article_nb, "status_code": 400, "status": "Référence incorrecte"})
+    stored_at = [t for t in stored_at if t is not None]
+    last_modified = max(stored_at) if stored_at else None
+    return json_response({"articles": articles}, last_modified)
+
+
 if __name__ == "__main__":
+    # start the parser workers before the first upload
+    get_parser_pool()
 #    if os.environ.get("APP_LOCATION") == "heroku":
 #         SSLify(app)
 #         app.run(host="0.0.0.0", port=int(os.environ.get("PORT", 5000)))
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# filename: bench_docx.py
+"""
+Benchmark de la lecture des DOCX: python-docx (document.paragraphs) contre la lecture au fil de l'eau du XML
+
+    python benchmarks/bench_docx.py [nombre de paragraphes]
+
+- thèse: les paragraphes de tests/newtest.docx répétés jusqu'au nombre demandé, dont un sur dix dans un tableau
+- durée de la lecture, pic d'allocation (tracemalloc) de la lecture suivie de la détection des citations,
+  et citations détectées: python-docx ne lit pas les tableaux
+
+"""
+
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+import docx
+
+from matching import get_matcher
+from parsing import iter_docx_paragraphs, normalize_text
+
+
+def build_docx(file_path, nb_paragraphs):
+    sample = [paragraph.text for paragraph in docx.Document(os.path.join(ROOT_DIR, "tests", "newtest.docx")).paragraphs]
+    document = docx.Document()
+    for i in range(nb_paragraphs):
+        text = sample[i % len(sample)]
+        if i % 10 == 9:
+            document.add_table(rows=1, cols=1).cell(0, 0).text = text
+        else:
+            document.add_paragraph(text)
+    document.save(file_path)
+
+
+def python_docx_paragraphs(file_path):
+    return [paragraph.text for paragraph in docx.Document(file_path).paragraphs]
+
+
+def streamed_paragraphs(file_path):
+    return (paragraph for _location, paragraph in iter_docx_paragraphs(file_path))
+
+
+def count_citations(paragraphs):
+    return sum(1 for _article in get_matcher(None).iter_articles(map(normalize_text, paragraphs)))
+
+
+def measure(function, file_path):
+    """Durée de la lecture seule, puis pic d'allocation et nombre de citations de la lecture suivie de la détection"""
+    start = time.perf_counter()
+    for _paragraph in function(file_path):
+        pass
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    nb = count_citations(function(file_path))
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak / 1024 / 1024, nb
+
+
+def main(nb_paragraphs=50000):
+    print("{:>12} {:>16} {:>10} {:>10} {:>12} {:>10} {:>10}".format(
+        "paragraphes", "python-docx (s)", "Mo", "citations", "flux XML (s)", "Mo", "citations"))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in [nb_paragraphs // 10, nb_paragraphs]:
+            file_path = os.path.join(tmp_dir, "these_{}.docx".format(size))
+            build_docx(file_path, size)
+            python_docx = measure(python_docx_paragraphs, file_path)
+            streamed = measure(streamed_paragraphs, file_path)
+            print("{:>12} {:>16.3f} {:>10.1f} {:>10} {:>12.3f} {:>10.1f} {:>10}".format(size, *python_docx, *streamed))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 50000)
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+# filename: bench_importtime.py
+"""
+Benchmark du temps de démarrage: import des modules dans un interpréteur neuf (python -X importtime)
+
+    python benchmarks/bench_importtime.py [nombre de répétitions]
+
+- temps d'import cumulé de chaque module (médiane des répétitions), comparé à IMPORT_TIME_BUDGET
+- bibliothèques lourdes chargées par l'import: les bibliothèques PDF ne doivent l'être qu'à l'ouverture d'un PDF
+- les imports les plus coûteux de l'application web
+
+Le script se termine en erreur si un budget est dépassé ou si une bibliothèque d'analyse est chargée au démarrage.
+
+"""
+
+import os
+import statistics
+import subprocess
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+
+# temps d'import maximal (millisecondes) de chaque module dans un interpréteur neuf
+IMPORT_TIME_BUDGET = {"parsing": 60, "matching": 80, "codeislow": 250, "app": 400}
+# bibliothèques d'analyse importées au premier document seulement (see parsing.PDF_BACKENDS)
+LAZY_MODULES = ("PyPDF2", "pdfminer", "docx", "odf")
+
+
+def import_times(module):
+    """
+    Importer `module` dans un nouvel interpréteur
+
+    Returns
+    -------
+    times: dict
+        {module: temps d'import cumulé en millisecondes} pour tous les modules chargés
+    """
+    process = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    times = {}
+    for line in process.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _self, cumulative, name = line[len("import time:"):].split("|")
+        times[name.strip()] = int(cumulative) / 1000
+    return times
+
+
+def main(number=5):
+    print("{:>12} {:>12} {:>12} {:>24}".format("module", "import (ms)", "budget (ms)", "bibliothèques chargées"))
+    failed = False
+    for module, budget in IMPORT_TIME_BUDGET.items():
+        runs = [import_times(module) for _ in range(number)]
+        median = statistics.median(times[module] for times in runs)
+        loaded = [name for name in LAZY_MODULES if name in runs[0]]
+        failed |= median > budget or bool(loaded)
+        print("{:>12} {:>12.1f} {:>12} {:>24}".format(module, median, budget, ", ".join(loaded) or "-"))
+
+    print("Imports les plus coûteux de l'application (ms)")
+    times = import_times("app")
+    top_level = [name for name in times if "." not in name]
+    for name in sorted(top_level, key=times.get, reverse=True)[:10]:
+        print("{:>24} {:>10.1f}".format(name, times[name]))
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main(int(sys.argv[1]) if len(sys.argv) > 1 else 5))
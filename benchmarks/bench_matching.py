@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# filename: bench_matching.py
+"""
+Benchmark de la détection des citations: regex d'origine (switch_pattern) contre le scanner en deux temps
+
+    python benchmarks/bench_matching.py [taille en Mo]
+
+- texte courant: le document de test (tests/newtest.md) répété jusqu'à la taille demandée
+- texte pathologique: un mot "article" par ligne, et un seul nom de code au début du document
+- mémoire: pic d'allocation (tracemalloc) du texte joint contre les paragraphes lus au fil de l'eau
+- paragraphes courts: 200 000 paragraphes de 50 caractères, joints contre lus au fil de l'eau (regroupés
+  jusqu'à MIN_SCAN_SIZE caractères avant chaque analyse)
+- parallèle: le texte courant découpé en morceaux analysés par un pool de processus (un par cœur)
+- ordres des références: un passage "both" contre deux passages "article_code" puis "code_article"
+- fenêtre de référence: un mot "article" par ligne, et un seul nom de code à la fin du document.
+  Sans limite (max_span=None), la référence avale tout le document.
+
+"""
+
+import os
+import sys
+import time
+import tracemalloc
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from matching import (
+    switch_pattern,
+    build_scanner,
+    scan_references,
+    stream_references,
+    get_matcher,
+    get_matching_result_item_parallel,
+    MAX_REF_SPAN,
+    MIN_SCAN_SIZE,
+    PARALLEL_CHUNK_SIZE,
+)
+from parsing import normalize_text
+
+
+def load_sample_text():
+    with open(os.path.join(ROOT_DIR, "tests", "newtest.md"), encoding="utf-8") as f:
+        return normalize_text(" ".join(f.read().splitlines()))
+
+
+def build_text(sample, size):
+    """Répéter le texte d'exemple jusqu'à `size` caractères"""
+    return " ".join([sample] * (size // len(sample) + 1))[:size]
+
+
+def build_pathological_text(nb_lines):
+    lines = ["Code civil"] + ["Voir l'article {} des présentes.".format(i) for i in range(nb_lines)]
+    return " ".join(lines)
+
+
+def build_code_at_end_text(nb_lines):
+    lines = ["Voir l'article {} des présentes.".format(i) for i in range(nb_lines)] + ["Code civil"]
+    return " ".join(lines)
+
+
+def legacy_references(text, max_span=None):
+    pattern = switch_pattern(None, "article_code", max_span)
+    return [match.group("ref") for match in pattern.finditer(text)]
+
+
+def scanner_references(text, max_span=MAX_REF_SPAN):
+    scanner, lookup = build_scanner(None)
+    return [ref for _code, ref in scan_references(text, scanner, lookup, max_span)]
+
+
+def iter_paragraphs(sample, size):
+    """Les lignes du texte d'exemple, produites une à une jusqu'à `size` caractères"""
+    lines = sample.split(". ")
+    produced = 0
+    while produced < size:
+        for line in lines:
+            produced += len(line) + 1
+            yield line + "."
+
+
+def build_short_paragraphs(nb_paragraphs, length=50):
+    """Des paragraphes de `length` caractères, une citation un paragraphe sur deux"""
+    lines = ("Sans référence, paragraphe {}.", "Voir l'article {} du Code civil.")
+    return [lines[i % 2].format(i).ljust(length)[:length] for i in range(nb_paragraphs)]
+
+
+def joined_references(paragraphs):
+    matcher = get_matcher(None)
+    text = normalize_text(" ".join(paragraphs))
+    return sum(1 for _ref in matcher.references(text))
+
+
+def streamed_references(paragraphs):
+    matcher = get_matcher(None)
+    return sum(1 for _ref in stream_references(paragraphs, matcher.scanner, matcher.lookup))
+
+
+def sequential_articles(text):
+    return list(get_matcher(None).iter_articles([text]))
+
+
+def parallel_articles(text):
+    return list(get_matching_result_item_parallel([text], None))
+
+
+def both_orders(text):
+    return list(get_matcher(None, pattern_format="both").iter_articles([text]))
+
+
+def separate_orders(text):
+    return list(get_matcher(None).iter_articles([text])) + list(
+        get_matcher(None, pattern_format="code_article").iter_articles([text])
+    )
+
+
+def measure_peak(function, *args):
+    tracemalloc.start()
+    result = function(*args)
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 1024 / 1024, result
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    result = function(*args)
+    return time.perf_counter() - start, result
+
+
+def main(size_mb=4):
+    sample = load_sample_text()
+    print("Texte courant")
+    print("{:>10} {:>12} {:>12} {:>10}".format("Mo", "regex (s)", "scanner (s)", "citations"))
+    for size in [size_mb / 4, size_mb / 2, size_mb]:
+        text = build_text(sample, int(size * 1024 * 1024))
+        legacy_time, legacy = measure(legacy_references, text)
+        scanner_time, refs = measure(scanner_references, text)
+        assert refs == legacy, "the scanner and the regex disagree"
+        print("{:>10.2f} {:>12.3f} {:>12.3f} {:>10}".format(size, legacy_time, scanner_time, len(refs)))
+
+    print("Mémoire (paragraphes produits au fil de l'eau)")
+    print("{:>10} {:>14} {:>14}".format("Mo", "joint (Mo)", "flux (Mo)"))
+    for size in [size_mb / 4, size_mb]:
+        size = int(size * 1024 * 1024)
+        joined_peak, joined_nb = measure_peak(joined_references, list(iter_paragraphs(sample, size)))
+        streamed_peak, streamed_nb = measure_peak(streamed_references, iter_paragraphs(sample, size))
+        assert joined_nb == streamed_nb, "the streamed and joined texts disagree"
+        print("{:>10.2f} {:>14.2f} {:>14.2f}".format(size / 1024 / 1024, joined_peak, streamed_peak))
+
+    print("Paragraphes courts (50 caractères), regroupés par {} caractères".format(MIN_SCAN_SIZE))
+    print("{:>12} {:>12} {:>12} {:>10}".format("paragraphes", "joint (s)", "flux (s)", "citations"))
+    for nb_paragraphs in [50000, 200000]:
+        paragraphs = build_short_paragraphs(nb_paragraphs)
+        joined_time, joined_nb = measure(joined_references, paragraphs)
+        streamed_time, streamed_nb = measure(streamed_references, paragraphs)
+        assert joined_nb == streamed_nb, "the streamed and joined texts disagree"
+        print("{:>12} {:>12.3f} {:>12.3f} {:>10}".format(nb_paragraphs, joined_time, streamed_time, streamed_nb))
+
+    print("Parallèle ({} processus, morceaux de {} caractères)".format(os.cpu_count(), PARALLEL_CHUNK_SIZE))
+    print("{:>10} {:>14} {:>14}".format("Mo", "séquentiel (s)", "parallèle (s)"))
+    for size in [size_mb, size_mb * 4]:
+        text = build_text(sample, int(size * 1024 * 1024))
+        sequential_time, expected = measure(sequential_articles, text)
+        parallel_time, articles = measure(parallel_articles, text)
+        assert articles == expected, "the parallel and sequential matchers disagree"
+        print("{:>10.2f} {:>14.3f} {:>14.3f}".format(size, sequential_time, parallel_time))
+
+    print("Ordres des références (texte courant et une citation C. civ., art. xxx par paragraphe)")
+    print("{:>10} {:>14} {:>14} {:>10} {:>10}".format("Mo", "both (s)", "2 passages (s)", "citations", "doublons"))
+    code_article_sample = sample + " Voir aussi C. civ., art. 1240, al. 2 et C. com., art. L. 110-1."
+    for size in [size_mb / 4, size_mb]:
+        text = build_text(code_article_sample, int(size * 1024 * 1024))
+        both_time, both = measure(both_orders, text)
+        separate_time, separate = measure(separate_orders, text)
+        print("{:>10.2f} {:>14.3f} {:>14.3f} {:>10} {:>10}".format(size, both_time, separate_time, len(both), len(separate) - len(both)))
+
+    print("Texte pathologique (un mot article par ligne, aucun code après)")
+    print("{:>10} {:>12} {:>12}".format("lignes", "regex (s)", "scanner (s)"))
+    for nb_lines in [500, 1000, 2000]:
+        text = build_pathological_text(nb_lines)
+        legacy_time, _legacy = measure(legacy_references, text)
+        scanner_time, _refs = measure(scanner_references, text)
+        print("{:>10} {:>12.3f} {:>12.3f}".format(nb_lines, legacy_time, scanner_time))
+    text = build_pathological_text(100000)
+    scanner_time, _refs = measure(scanner_references, text)
+    print("{:>10} {:>12} {:>12.3f}".format(100000, "-", scanner_time))
+
+    print("Fenêtre de référence (un mot article par ligne, le code à la fin), max_span={}".format(MAX_REF_SPAN))
+    print("{:>10} {:>14} {:>14} {:>14} {:>12}".format("lignes", "regex (s)", "regex borné", "scanner borné", "longueur ref"))
+    for nb_lines in [10000, 100000, 400000]:
+        text = build_code_at_end_text(nb_lines)
+        legacy_time, legacy = measure(legacy_references, text)
+        bounded_time, bounded = measure(legacy_references, text, MAX_REF_SPAN)
+        scanner_time, refs = measure(scanner_references, text)
+        assert refs == bounded, "the scanner and the bounded regex disagree"
+        print(
+            "{:>10} {:>14.3f} {:>14.3f} {:>14.3f} {:>5} -> {:<5}".format(
+                nb_lines, legacy_time, bounded_time, scanner_time, len(legacy[0]), len(refs[0])
+            )
+        )
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# filename: bench_normalize.py
+"""
+Benchmark de la normalisation des références: découpages successifs d'origine contre la grammaire ArticleRef
+
+    python benchmarks/bench_normalize.py [nombre de répétitions]
+
+- needles: les références du corpus tests/needles.csv
+- documents: les références détectées dans les documents de test (tests/newtest.md)
+
+"""
+
+import ast
+import os
+import re
+import sys
+import timeit
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from matching import get_matcher, normalize_references, parse_article_refs
+from parsing import normalize_text
+
+
+def legacy_normalize_references(ref):
+    """La normalisation d'origine, conservée pour comparaison"""
+    ref = ref.strip()
+    refs = [n for n in re.split(r"(\set\s|,\s|\sdu)", ref) if n not in [" et ", ", ", " du", " ", ""]]
+    refs = [
+        "-".join([r for r in re.split(r"\s|\.|-", ref) if r not in [" ", "", "al", "alinea", "alinéa"]])
+        for ref in refs
+    ]
+    article_numbers = []
+    for ref in refs:
+        ref = "".join([n for n in ref if (n.isdigit() or n in ["L", "A", "R", "D", "-"])])
+        if ref.endswith("-"):
+            ref = ref[:-1]
+        special_ref = ref.split("-", 1)
+        if special_ref[0] in ["L", "A", "R", "D"]:
+            article_numbers.append("".join(special_ref))
+        else:
+            article_numbers.append(ref)
+    return article_numbers
+
+
+def load_needles_refs():
+    with open(os.path.join(ROOT_DIR, "tests", "needles.csv"), encoding="utf-8") as f:
+        return [ast.literal_eval(line.split(" ", 1)[1])["ref"] for line in f if line.strip()]
+
+
+def load_document_refs():
+    with open(os.path.join(ROOT_DIR, "tests", "newtest.md"), encoding="utf-8") as f:
+        text = normalize_text(" ".join(f.read().splitlines()))
+    return [ref for _code, ref in get_matcher(None).references(text)]
+
+
+def run(function, refs):
+    for ref in refs:
+        function(ref)
+
+
+def main(number=2000):
+    print("{:>10} {:>6} {:>14} {:>14} {:>14}".format("corpus", "refs", "origine (µs)", "str (µs)", "ArticleRef (µs)"))
+    for name, refs in [("needles", load_needles_refs()), ("documents", load_document_refs())]:
+        timings = [
+            timeit.timeit(lambda: run(function, refs), number=number) / number / len(refs) * 1e6
+            for function in (legacy_normalize_references, normalize_references, parse_article_refs)
+        ]
+        print("{:>10} {:>6} {:>14.2f} {:>14.2f} {:>14.2f}".format(name, len(refs), *timings))
+    # the references the two versions read differently
+    for ref in load_needles_refs() + load_document_refs():
+        legacy, current = legacy_normalize_references(ref), normalize_references(ref)
+        if legacy != current:
+            print("{!r:.50} {} => {}".format(ref, legacy, current))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 2000)
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+# filename: bench_odt.py
+"""
+Benchmark de la lecture des ODT: odfpy (document complet, getElementsByType et teletype) contre la lecture
+au fil de l'eau de content.xml
+
+    python benchmarks/bench_odt.py [nombre de répétitions]
+
+- thèse: le texte de tests/testnew.odt répété le nombre de fois demandé (42 paragraphes par répétition)
+- durée de la lecture et pic d'allocation (tracemalloc)
+
+"""
+
+import os
+import re
+import sys
+import tempfile
+import time
+import tracemalloc
+import zipfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from odf import teletype, text
+from odf.opendocument import load
+
+from parsing import iter_odt_paragraphs
+
+SAMPLE = os.path.join(ROOT_DIR, "tests", "testnew.odt")
+
+
+def build_odt(file_path, repeat):
+    """Répéter le contenu de office:text dans une copie de testnew.odt"""
+    with zipfile.ZipFile(SAMPLE) as sample, zipfile.ZipFile(file_path, "w", zipfile.ZIP_DEFLATED) as archive:
+        for item in sample.infolist():
+            data = sample.read(item)
+            if item.filename == "content.xml":
+                content = data.decode("utf-8")
+                match = re.search(r"(<office:text[^>]*>)(.*)(</office:text>)", content, flags=re.S)
+                data = (content[: match.start(2)] + match.group(2) * repeat + content[match.end(2) :]).encode("utf-8")
+            # mimetype is stored first and uncompressed
+            archive.writestr(item, data, compress_type=item.compress_type)
+
+
+def odfpy_paragraphs(file_path):
+    return [teletype.extractText(paragraph) for paragraph in load(file_path).getElementsByType(text.P)]
+
+
+def streamed_paragraphs(file_path):
+    return (paragraph for _location, paragraph in iter_odt_paragraphs(file_path))
+
+
+def measure(function, file_path):
+    start = time.perf_counter()
+    nb = sum(1 for _paragraph in function(file_path))
+    duration = time.perf_counter() - start
+    tracemalloc.start()
+    for _paragraph in function(file_path):
+        pass
+    _current, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return duration, peak / 1024 / 1024, nb
+
+
+def main(repeat=500):
+    print("{:>12} {:>12} {:>10} {:>14} {:>10}".format("paragraphes", "odfpy (s)", "Mo", "flux XML (s)", "Mo"))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in [repeat // 10, repeat]:
+            file_path = os.path.join(tmp_dir, "these_{}.odt".format(size))
+            build_odt(file_path, size)
+            odfpy = measure(odfpy_paragraphs, file_path)
+            streamed = measure(streamed_paragraphs, file_path)
+            assert odfpy[2] == streamed[2], "the readers disagree"
+            print("{:>12} {:>12.3f} {:>10.1f} {:>14.3f} {:>10.1f}".format(odfpy[2], odfpy[0], odfpy[1], streamed[0], streamed[1]))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 500)
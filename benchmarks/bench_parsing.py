@@ -0,0 +1,76 @@
+#!/usr/bin/env python3
+# filename: bench_parsing.py
+"""
+Benchmark de l'extraction du texte des PDF: un seul processus contre un pool de processus (un par cœur)
+
+    python benchmarks/bench_parsing.py [nombre de pages]
+
+- PDF de test: les fichiers tests/*.pdf, sous le seuil PARALLEL_PAGE_THRESHOLD (extraction dans le processus courant)
+- thèse: un PDF construit en répétant les pages des PDF de test jusqu'au nombre de pages demandé.
+  Première page: délai avant la première ligne, qui conditionne l'affichage du premier résultat.
+
+Le pool de processus ne sert qu'à la lecture dans le processus courant (CODEISLOW_PARSER_WORKERS=0):
+un processus d'analyse (sandbox.py) extrait les pages une à une.
+
+"""
+
+import glob
+import os
+import sys
+import tempfile
+import time
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from PyPDF2 import PdfReader, PdfWriter
+
+from parsing import iter_pdf_pages, PARALLEL_PAGE_RANGE, PARALLEL_PAGE_THRESHOLD
+
+TEST_PDFS = sorted(glob.glob(os.path.join(ROOT_DIR, "tests", "*.pdf")))
+
+
+def build_pdf(file_path, nb_pages):
+    """Répéter les pages des PDF de test jusqu'à `nb_pages` pages"""
+    pages = [page for pdf in TEST_PDFS for page in PdfReader(pdf).pages]
+    writer = PdfWriter()
+    for i in range(nb_pages):
+        writer.add_page(pages[i % len(pages)])
+    with open(file_path, "wb") as f:
+        writer.write(f)
+
+
+def measure_pages(file_path, workers, threshold=PARALLEL_PAGE_THRESHOLD):
+    """Délai avant la première page, durée totale et nombre de pages"""
+    start = time.perf_counter()
+    first = None
+    nb_pages = 0
+    for _page_nb, _lines in iter_pdf_pages(file_path, workers, threshold=threshold):
+        if first is None:
+            first = time.perf_counter() - start
+        nb_pages += 1
+    return first, time.perf_counter() - start, nb_pages
+
+
+def main(nb_pages=300):
+    print("PDF de test (seuil: {} pages)".format(PARALLEL_PAGE_THRESHOLD))
+    print("{:>16} {:>8} {:>12}".format("fichier", "pages", "total (s)"))
+    for pdf in TEST_PDFS:
+        _first, total, nb = measure_pages(pdf, None)
+        print("{:>16} {:>8} {:>12.3f}".format(os.path.basename(pdf), nb, total))
+
+    print("Thèse ({} processus, {} pages par tâche)".format(max(2, os.cpu_count() or 1), PARALLEL_PAGE_RANGE))
+    print("{:>8} {:>14} {:>14} {:>14} {:>14}".format("pages", "1re page seq.", "total seq.", "1re page par.", "total par."))
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in [nb_pages // 10, nb_pages]:
+            file_path = os.path.join(tmp_dir, "these_{}.pdf".format(size))
+            build_pdf(file_path, size)
+            sequential = measure_pages(file_path, 1)
+            # threshold=0: always use the pool, even for the smaller document (and at least two processes)
+            parallel = measure_pages(file_path, max(2, os.cpu_count() or 1), threshold=0)
+            assert sequential[2] == parallel[2] == size
+            print("{:>8} {:>14.3f} {:>14.3f} {:>14.3f} {:>14.3f}".format(size, *sequential[:2], *parallel[:2]))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 300)
@@ -0,0 +1,62 @@
+#!/usr/bin/env python3
+# filename: bench_pdf_backends.py
+"""
+Benchmark des bibliothèques d'extraction des PDF: PyPDF2 contre pdfminer.six
+
+    python benchmarks/bench_pdf_backends.py [nombre de répétitions]
+
+- vitesse: durée moyenne de l'extraction de chaque PDF de test, sans repli sur l'autre bibliothèque
+- rappel: part des citations du document d'origine (tests/newtest.docx ou tests/testnew.odt) retrouvées dans
+  le texte extrait du PDF, ordres article_code et code_article confondus
+
+"""
+
+import os
+import sys
+import time
+from collections import Counter
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from matching import get_matcher
+from parsing import iter_doc_pages, iter_pdf_pages, normalize_text, PDF_BACKENDS
+
+# chaque PDF de test et le document dont il est issu
+DOCUMENTS = {"newtest.pdf": "newtest.docx", "newtest2.pdf": "newtest.docx", "testnew.pdf": "testnew.odt"}
+
+
+def read_lines(pages):
+    return [line for _page_nb, lines in pages for line in map(normalize_text, lines) if line.strip()]
+
+
+def count_citations(lines):
+    return Counter(get_matcher(None, pattern_format="both").iter_articles(lines))
+
+
+def extract(file_path, backend):
+    # budget=None and the backend alone: measure the library, not the fallback cascade
+    report = {}
+    lines = read_lines(iter_pdf_pages(file_path, workers=1, backend=backend, budget=None, report=report))
+    assert set(report) == {backend}, report
+    return lines
+
+
+def main(number=20):
+    print("{:>14} {:>10} {:>12} {:>10} {:>10}".format("fichier", "backend", "durée (ms)", "citations", "rappel"))
+    for pdf, source in DOCUMENTS.items():
+        file_path = os.path.join(ROOT_DIR, "tests", pdf)
+        source_ext = source.rsplit(".", 1)[1]
+        expected = count_citations(read_lines(iter_doc_pages(os.path.join(ROOT_DIR, "tests", source), source_ext)))
+        for backend in PDF_BACKENDS:
+            start = time.perf_counter()
+            for _ in range(number):
+                lines = extract(file_path, backend)
+            duration = (time.perf_counter() - start) / number * 1000
+            found = count_citations(lines)
+            recall = sum((found & expected).values()) / sum(expected.values())
+            print("{:>14} {:>10} {:>12.1f} {:>10} {:>10.1%}".format(pdf, backend, duration, sum(found.values()), recall))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 20)
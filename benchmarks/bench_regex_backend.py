@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+# filename: bench_regex_backend.py
+"""
+Benchmark des moteurs d'expressions régulières: re (module standard) contre re2 (google-re2)
+
+    python benchmarks/bench_regex_backend.py [taille en Mo]
+
+- scanner: l'arbre de préfixes de matching.build_scanner sur le texte courant (tests/newtest.md répété)
+- motif d'origine: switch_pattern sur un texte pathologique (un nom de code au début, un mot "article" par ligne)
+
+"""
+
+import os
+import sys
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from matching import get_matcher, switch_pattern, re2
+
+from bench_matching import load_sample_text, build_text, build_pathological_text, measure
+
+
+def matcher_articles(text, backend):
+    return list(get_matcher(None, backend=backend).iter_articles([text]))
+
+
+def legacy_references(text, backend):
+    return [match.group("ref") for match in switch_pattern(None, backend=backend).finditer(text)]
+
+
+def main(size_mb=4):
+    if re2 is None:
+        print("google-re2 n'est pas installé: pip install google-re2")
+        return
+    sample = load_sample_text()
+    print("Scanner (texte courant)")
+    print("{:>10} {:>12} {:>12} {:>10}".format("Mo", "re (s)", "re2 (s)", "citations"))
+    for size in [size_mb / 4, size_mb]:
+        text = build_text(sample, int(size * 1024 * 1024))
+        re_time, expected = measure(matcher_articles, text, "re")
+        re2_time, articles = measure(matcher_articles, text, "re2")
+        assert articles == expected, "the backends disagree"
+        print("{:>10.2f} {:>12.3f} {:>12.3f} {:>10}".format(size, re_time, re2_time, len(articles)))
+
+    print("Motif d'origine (texte pathologique)")
+    print("{:>10} {:>12} {:>12}".format("lignes", "re (s)", "re2 (s)"))
+    for nb_lines in [500, 1000, 2000, 100000]:
+        text = build_pathological_text(nb_lines)
+        re2_time, _refs = measure(legacy_references, text, "re2")
+        if nb_lines <= 2000:
+            re_time, _refs = measure(legacy_references, text, "re")
+            print("{:>10} {:>12.3f} {:>12.3f}".format(nb_lines, re_time, re2_time))
+        else:
+            print("{:>10} {:>12} {:>12.3f}".format(nb_lines, "-", re2_time))
+
+
+if __name__ == "__main__":
+    main(float(sys.argv[1]) if len(sys.argv) > 1 else 4)
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+# filename: bench_sandbox.py
+"""
+Benchmark de la lecture des documents dans le pool d'analyse (sandbox.ParserPool) contre le processus courant
+
+    python benchmarks/bench_sandbox.py [nombre de documents]
+
+- latence: les documents de test (pdf, docx, odt) lus les uns après les autres, médiane et 99e centile par document,
+  après une première lecture de chaque document (les bibliothèques PDF sont importées au premier PDF)
+- bombe zip: un DOCX de quelques centaines de Ko dont document.xml décompressé fait plusieurs centaines de Mo.
+  Dans le processus courant, la lecture va jusqu'au bout; dans le pool, le processus est tué après le délai imparti.
+
+"""
+
+import os
+import statistics
+import sys
+import tempfile
+import time
+import zipfile
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+sys.path.insert(0, ROOT_DIR)
+
+from parsing import iter_doc
+from sandbox import ParserError, ParserPool
+
+DOCUMENTS = ("newtest.pdf", "newtest.docx", "testnew.odt")
+BOMB_TIMEOUT = 2.0
+
+
+def load_documents():
+    documents = []
+    for file_name in DOCUMENTS:
+        with open(os.path.join(ROOT_DIR, "tests", file_name), "rb") as f:
+            documents.append((f.read(), file_name.split(".")[-1]))
+    return documents
+
+
+def build_bomb(nb_paragraphs):
+    """Un DOCX de nb_paragraphs paragraphes identiques: le XML se compresse presque entièrement"""
+    paragraph = b'<w:p><w:r><w:t>Voir l\'article 1240 du Code civil.</w:t></w:r></w:p>'
+    with tempfile.SpooledTemporaryFile() as f:
+        with zipfile.ZipFile(f, "w", zipfile.ZIP_DEFLATED) as archive, archive.open("word/document.xml", "w") as xml:
+            xml.write(b'<w:document xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"><w:body>')
+            for _ in range(nb_paragraphs // 1000):
+                xml.write(paragraph * 1000)
+            xml.write(b"</w:body></w:document>")
+        f.seek(0)
+        return f.read(), nb_paragraphs * len(paragraph)
+
+
+def measure(function, *args):
+    start = time.perf_counter()
+    try:
+        result = function(*args)
+    except ParserError as error:
+        result = type(error).__name__
+    return time.perf_counter() - start, result
+
+
+def count_lines(read, document, doc_ext):
+    return sum(1 for _line in read(document, doc_ext=doc_ext))
+
+
+def main(number=60):
+    documents = load_documents() * (number // len(DOCUMENTS))
+    with ParserPool(2) as pool:
+        print("Latence par document ({} documents, pool de 2 processus démarrés à l'avance)".format(len(documents)))
+        print("{:>12} {:>12} {:>12}".format("lecture", "p50 (ms)", "p99 (ms)"))
+        for name, read in (("processus", iter_doc), ("pool", pool.iter_doc)):
+            for document, doc_ext in load_documents() * 2:
+                count_lines(read, document, doc_ext)
+            durations = sorted(measure(count_lines, read, document, doc_ext)[0] * 1000 for document, doc_ext in documents)
+            p99 = durations[min(len(durations) - 1, int(len(durations) * 0.99))]
+            print("{:>12} {:>12.1f} {:>12.1f}".format(name, statistics.median(durations), p99))
+
+    bomb, size = build_bomb(4000000)
+    print("Bombe zip ({:.0f} Ko compressés, {:.0f} Mo de XML)".format(len(bomb) / 1024, size / 1024 / 1024))
+    print("{:>12} {:>12} {:>16}".format("lecture", "durée (s)", "résultat"))
+    in_process_time, nb_lines = measure(count_lines, iter_doc, bomb, "docx")
+    print("{:>12} {:>12.2f} {:>16}".format("processus", in_process_time, f"{nb_lines} lignes"))
+    with ParserPool(1, timeout=BOMB_TIMEOUT) as pool:
+        pool_time, result = measure(count_lines, pool.iter_doc, bomb, "docx")
+        print("{:>12} {:>12.2f} {:>16}".format("pool", pool_time, result))
+
+
+if __name__ == "__main__":
+    main(int(sys.argv[1]) if len(sys.argv) > 1 else 60)
@@ -0,0 +1,108 @@
+#!/usr/bin/env python3
+# filename: caching.py
+"""
+Caching module
+
+Cache mémoire partagé entre les requêtes du serveur:
+
+- TTLCache: dictionnaire borné en taille (LRU) dont les entrées expirent après une durée de vie
+
+"""
+
+import threading
+import time
+from collections import OrderedDict
+
+
+class TTLCache:
+    """
+    Cache LRU borné dont les entrées expirent après `ttl` secondes
+
+    Arguments
+    ---------
+    maxsize: int
+        nombre maximal d'entrées conservées. Default to 1024
+    ttl: float
+        durée de vie d'une entrée en secondes. Default to 3600
+
+    Notes
+    -----
+    Le cache est protégé par un verrou: il peut être partagé entre les threads du serveur.
+    Chaque entrée conserve sa date d'enregistrement (epoch) accessible avec `get_entry`.
+    """
+
+    def __init__(self, maxsize=1024, ttl=3600):
+        if maxsize < 1:
+            raise ValueError("maxsize must be a positive integer")
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_entry(self, key):
+        """
+        Renvoie le couple (valeur, date d'enregistrement) ou None si la clé est absente ou expirée
+        """
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            value, stored_at = entry
+            if time.time() - stored_at > self.ttl:
+                del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return value, stored_at
+
+    def get(self, key, default=None):
+        """Renvoie la valeur associée à la clé ou `default`"""
+        entry = self.get_entry(key)
+        if entry is None:
+            return default
+        return entry[0]
+
+    def set(self, key, value):
+        """Enregistre la valeur et renvoie sa date d'enregistrement"""
+        stored_at = time.time()
+        with self._lock:
+            self._data[key] = (value, stored_at)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+        return stored_at
+
+    def pop(self, key, default=None):
+        with self._lock:
+            entry = self._data.pop(key, None)
+        if entry is None:
+            return default
+        return entry[0]
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+        """Statistiques du cache: taille, hits, misses"""
+        with self._lock:
+            return {
+                "size": len(self._data),
+                "maxsize": self.maxsize,
+                "ttl": self.ttl,
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def __contains__(self, key):
+        return self.get_entry(key) is not None
+
+    def __len__(self):
+        with self._lock:
+            return len(self._data)
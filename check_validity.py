@@ -11,12 +11,19 @@ Module de vérification du status de l'article
     - (epoch<-> datetime)
 - time_delta: définition de nouvelle dates à partir d'un nombre année
 - check validity: module qui définit le status de l'article en fonction d'une plage temporelle
+- get_validity_status_batch: status d'un lot d'articles en une seule passe vectorisée (NumPy)
 
 """
 from datetime import datetime
 import datetime
+import math
+import numpy as np
 from dateutil.relativedelta import relativedelta
 
+VALIDITY_COLORS = {301: "yellow", 302: "orange", 204: "green"}
+# nombre maximal d'années dans le passé ou le futur, comme le formulaire: au-delà, les dates sortent du calendrier
+MAX_YEAR_NB = 99
+
 
 
 ### TIME CONVERSION UTILS
@@ -63,6 +70,27 @@ def convert_str_to_datetime(date_time):
     return datetime.datetime.strptime(date_time, "%d/%m/%Y %H:%M:%S")
 
 ### SPECIALS: plage de temps + status de l'article
+def check_year_nb(year_nb):
+    """
+    Vérifier un nombre d'années passé à time_delta
+
+    Arguments
+    ----------
+    year_nb: int or float
+        nombre d'années, entre 0 et MAX_YEAR_NB
+    Raises
+    -------
+    TypeError:
+        year_nb is not a number
+    ValueError:
+        year_nb is not finite (nan, inf) or out of [0, MAX_YEAR_NB]
+    """
+    if isinstance(year_nb, bool) or not isinstance(year_nb, (int, float)):
+        raise TypeError("Year must be a number")
+    if not math.isfinite(year_nb) or not 0 <= year_nb <= MAX_YEAR_NB:
+        raise ValueError(f"Year must be between 0 and {MAX_YEAR_NB}")
+
+
 def time_delta(operator, year_nb):
     """
     Calculer le différentiel de date selon l'opérator et le nombre d'années
@@ -70,8 +98,8 @@ def time_delta(operator, year_nb):
     ---------- 
     operator: str
         chaine de caractère qui représente l'opérateur: - ou +
-    year_nb: int
-        entier qui représente le nombre d'années
+    year_nb: int or float
+        nombre d'années, éventuellement décimal (0.5 pour six mois): arrondi au mois, see check_year_nb
     Return
     -------
     datetime_delta: datetime
@@ -79,13 +107,13 @@ def time_delta(operator, year_nb):
     """
     if operator not in ["-", "+"]:
         raise ValueError("Wrong operator")
-    if not isinstance(year_nb, int):
-        raise TypeError("Year must be an integer")
+    check_year_nb(year_nb)
+    months = round(year_nb * 12)
     today = datetime.date.today()
     if operator == "-":
-        return convert_date_to_datetime(today.replace(year=today.year - year_nb))
+        return convert_date_to_datetime(today - relativedelta(months=months))
     else:
-        return convert_date_to_datetime(today.replace(year=today.year + year_nb))
+        return convert_date_to_datetime(today + relativedelta(months=months))
 
 
 def time_delta_to_epoch(operator, year_nb):
@@ -113,11 +141,11 @@ def get_validity_status(start, end, year_before, year_after):
 
     Arguments
     ---------
-    year_before: int
+    year_before: int or float
         Nombre d'année avant aujourd'hui
     start: datetime
         Date de création de l'article
-    year_after:int
+    year_after: int or float
         Nombre d'année après aujourd'hui
     end: datetime 
         Date d'expiration de l'article
@@ -140,3 +168,60 @@ def get_validity_status(start, end, year_before, year_after):
     if start < past_boundary and end > future_boundary:
         return (204, "Pas de modification", "green")
 
+
+def convert_epochs_to_str(epochs):
+    """
+    convert an array of epochs (milliseconds) into an array of string dates (dd/mm/YYYY)
+    """
+    iso_dates = np.datetime_as_string(np.asarray(epochs, dtype="int64").astype("datetime64[ms]"), unit="D").astype("<U10")
+    if iso_dates.size == 0:
+        return iso_dates
+    # 'YYYY-MM-DD' -> 'DD/MM/YYYY' by reordering the characters of the fixed-width strings
+    chars = iso_dates.view("<U1").reshape(-1, 10)[:, [8, 9, 7, 5, 6, 4, 0, 1, 2, 3]]
+    chars[:, [2, 5]] = "/"
+    return np.ascontiguousarray(chars).view("<U10").ravel()
+
+
+def get_validity_status_batch(starts, ends, year_before, year_after):
+    """
+    Verifier la validité d'un lot d'articles en une seule passe
+
+    Arguments
+    ---------
+    starts: array
+        dates de début de version des articles (epoch en millisecondes, dateDebut de Legifrance)
+    ends: array
+        dates de fin de version des articles (epoch en millisecondes, dateFin de Legifrance)
+    year_before: int or float
+        Nombre d'année avant aujourd'hui
+    year_after: int or float
+        Nombre d'année après aujourd'hui
+
+    Returns
+    --------
+    status_codes: numpy.ndarray
+        Les codes de status (301, 302 ou 204)
+    responses: numpy.ndarray
+        Les messages de status
+    colors: numpy.ndarray
+        Les couleurs CSS des status
+
+    Notes
+    -----
+    Les bornes de la plage de temps ne sont calculées qu'une fois pour tout le lot.
+    Contrairement à get_validity_status, un article dont une date coïncide avec une borne est classé 204.
+    """
+    starts = np.asarray(starts, dtype="int64")
+    ends = np.asarray(ends, dtype="int64")
+    past_boundary = np.datetime64(time_delta("-", year_before), "ms").astype("int64")
+    future_boundary = np.datetime64(time_delta("+", year_after), "ms").astype("int64")
+    modified = starts > past_boundary
+    expiring = ~modified & (ends < future_boundary)
+    status_codes = np.select([modified, expiring], [301, 302], default=204)
+    responses = np.where(
+        modified,
+        np.char.add("Modifié le ", convert_epochs_to_str(starts)),
+        np.where(expiring, np.char.add("Valable jusqu'au ", convert_epochs_to_str(ends)), "Pas de modification"),
+    )
+    colors = np.select([modified, expiring], [VALIDITY_COLORS[301], VALIDITY_COLORS[302]], default=VALIDITY_COLORS[204])
+    return status_codes, responses, colors
@@ -3,85 +3,134 @@
 """
 Code references module:
 
+- Load the code registry from code_references.csv (short code, Légifrance name, aliases)
 - Build regex for codes
 - Get name and abbreviation for codes
 
+Le fichier code_references.csv est la seule source des codes pris en charge: une ligne par code,
+les alias séparés par "|" et écrits tels qu'ils apparaissent dans les documents (eg. C. civ.).
+Les correspondances nom, abréviation et alias sont des dictionnaires: une recherche ne dépend pas
+du nombre de codes. Les expressions régulières des codes sélectionnés ne sont compilées qu'au premier usage,
+réunies dans le scanner de matching (see matching.build_scanner).
 """
 
-CODE_REGEX = {
-    "CCIV": r"(?P<CCIV>Code\scivil|C\.\sciv\.|Code\sciv\.|C\.civ\.|civ\.|CCIV)",
-    "CPRCIV": r"(?P<CPRCIV>Code\sde\sprocédure\scivile|C\.\spr\.\sciv\.|CPC)",
-    "CCOM": r"(?P<CCOM>Code\sde\scommerce|C\.\scom\.)",
-    "CTRAV": r"(?P<CTRAV>Code\sdu\stravail|C\.\strav\.)",
-    "CPI": r"(?P<CPI>Code\sde\sla\spropriété\sintellectuelle|CPI|C\.\spr\.\sint\.)",
-    "CPEN": r"(?P<CPEN>Code\spénal|C\.\spén\.)",
-    "CPP": r"(?P<CPP>Code\sde\sprocédure\spénale|CPP)",
-    "CASSUR": r"(?P<CASSUR>Code\sdes\sassurances|C\.\sassur\.)",
-    "CCONSO": r"(?P<CCONSO>Code\sde\sla\sconsommation|C\.\sconso\.)",
-    "CSI": r"(?P<CSI>Code\sde\slasécurité\sintérieure|CSI)",
-    "CSP": r"(?P<CSP>Code\sde\slasanté\spublique|C\.\ssant\.\spub\.|CSP)",
-    "CSS": r"(?P<CSS>Code\sde\slasécurité\ssociale|C\.\ssec\.\ssoc\.|CSS)",
-    "CESEDA": r"(?P<CESEDA>Code\sde\sl'entrée\set\sdu\sséjour\sdes\sétrangers\set\sdu\sdroit\sd'asile|CESEDA)",
-    "CGCT": r"(?P<CGCT>Code\sgénéral\sdes\scollectivités\sterritoriales|CGCT)",
-    "CPCE": r"(?P<CPCE>Code\sdes\spostes\set\sdes\scommunications\sélectroniques|CPCE)",
-    "CENV": r"(?P<CENV>Code\sde\sl'environnement|C.\senvir.|CE\.)",
-    "CJA": r"(?P<CJA>Code\sde\sjustice\sadministrative|CJA)",
+import csv
+import os
+import re
+
+CODE_REFERENCES_PATH = os.path.join(os.path.dirname(os.path.realpath(__file__)), "code_references.csv")
+
+
+def alias_to_regex(alias):
+    """Expression régulière d'un alias littéral: espaces => \\s, caractères spéciaux échappés eg. C. civ. => C\\.\\sciv\\."""
+    return "".join(r"\s" if char == " " else re.escape(char) for char in alias)
+
+
+def get_alias_key(text):
+    """Clé de la table des alias: minuscules et espaces normalisés"""
+    return re.sub(r"\s", " ", text.lower())
+
+
+def load_code_references(file_path=CODE_REFERENCES_PATH):
+    """
+    Charger le registre des codes
+
+    Arguments
+    ----------
+    file_path: str
+        un fichier csv (séparateur ";") avec les colonnes short_code, long_code et aliases
+
+    Returns
+    ----------
+    code_reference: dict
+        {short_code: long_code} dans l'ordre du fichier
+    code_aliases: dict
+        {short_code: (alias, ...)} les alias littéraux, dans l'ordre du fichier
+
+    Raises
+    ----------
+    ValueError:
+        un code ou un alias est déclaré deux fois
+    """
+    code_reference, code_aliases, alias_codes = {}, {}, {}
+    with open(file_path, encoding="utf-8", newline="") as f:
+        for row in csv.DictReader(f, delimiter=";"):
+            short_code = row["short_code"]
+            if short_code in code_reference:
+                raise ValueError(f"`{short_code}` is declared twice in {file_path}")
+            aliases = tuple(row["aliases"].split("|"))
+            for alias in aliases:
+                if alias_codes.setdefault(get_alias_key(alias), short_code) != short_code:
+                    raise ValueError(f"`{alias}` is an alias of {alias_codes[get_alias_key(alias)]} and {short_code}")
+            code_reference[short_code] = row["long_code"]
+            code_aliases[short_code] = aliases
+    return code_reference, code_aliases
+
+
+CODE_REFERENCE, CODE_ALIASES = load_code_references()
+
+# index inverses: nom complet => abréviation, alias => abréviation
+SHORT_CODE_INDEX = {long_code: short_code for short_code, long_code in CODE_REFERENCE.items()}
+ALIAS_INDEX = {
+    get_alias_key(alias): short_code for short_code, aliases in CODE_ALIASES.items() for alias in aliases
 }
 
-CODE_REFERENCE = {
-    "CCIV": "Code civil",
-    "CPRCIV": "Code de procédure civile",
-    "CCOM": "Code de commerce",
-    "CTRAV": "Code du travail",
-    "CPI": "Code de la propriété intellectuelle",
-    "CPEN": "Code pénal",
-    "CPP": "Code de procédure pénale",
-    "CASSUR": "Code des assurances",
-    "CCONSO": "Code de la consommation",
-    "CSI": "Code de la sécurité intérieure",
-    "CSP": "Code de la santé publique",
-    "CSS": "Code de la sécurité sociale",
-    "CESEDA": "Code de l'entrée et du séjour des étrangers et du droit d'asile",
-    "CGCT": "Code général des collectivités territoriales",
-    "CPCE": "Code des postes et des communications électroniques",
-    "CENV": "Code de l'environnement",
-    "CJA": "Code de justice administrative",
+CODE_REGEX = {
+    short_code: "(?P<{}>{})".format(short_code, "|".join(alias_to_regex(alias) for alias in aliases))
+    for short_code, aliases in CODE_ALIASES.items()
 }
 
+
+def get_short_code(code_name):
+    """
+    Retrouver l'abréviation d'un code à partir de son abréviation, de son nom complet ou d'un de ses alias
+
+    Arguments
+    ----------
+    code_name: str
+        eg. CCIV, Code civil ou C. civ.
+
+    Returns
+    ----------
+    short_code: str
+        short form of Code eg. CCIV or None
+
+    Notes
+    ----------
+    Un nom complet l'emporte sur un alias: "Code minier" est le nom de l'ancien code (CMINANC)
+    et l'alias du nouveau (CMIN).
+    """
+    if code_name in CODE_REFERENCE:
+        return code_name
+    if code_name in SHORT_CODE_INDEX:
+        return SHORT_CODE_INDEX[code_name]
+    return ALIAS_INDEX.get(get_alias_key(code_name))
+
+
 def get_long_and_short_code(code_name: str) -> (str,str):
     '''
     Accéder aux deux versions du nom du code: le nom complet et son abréviation
 
     Parameters
     ----------
-    code_name : str 
-        le nom du code (version longue ou courte)
-    
+    code_name : str
+        le nom du code (version longue ou courte, ou un alias eg. C. civ.)
+
     Returns
-    ----------    
+    ----------
     long_code: str
         le nom complet du code
     short_code: str
         l'abréviation du code
-    
+
     Notes
     ----------
     Si le nom du code n'a pas été trouvé les valeurs sont nulles (None, None)
     '''
-    
-    if code_name in CODE_REFERENCE.keys():
-        short_code = code_name
-        long_code = CODE_REFERENCE[code_name]
-    elif code_name in CODE_REFERENCE.values():
-        long_code = code_name
-        short_code_results = [k for k, v in CODE_REFERENCE.items() if v == code_name]
-        if len(short_code_results) > 0:
-            short_code = short_code_results[0]
-        else: 
-            short_code = None
-    else:
-        short_code, long_code = None, None
-    return(long_code, short_code)
+    short_code = get_short_code(code_name)
+    if short_code is None:
+        return (None, None)
+    return (CODE_REFERENCE[short_code], short_code)
 
 
 def get_code_full_name_from_short_code(short_code):
@@ -92,18 +141,18 @@ def get_code_full_name_from_short_code(short_code):
     ----------
     short_code: str
         short form of Code eg. CCIV
-    
+
     Returns
     ----------
     full_name: str
         long form of code eg. Code Civil
-    
+
     """
     try:
         return CODE_REFERENCE[short_code]
 
     except KeyError:
-        if get_short_code_from_full_name(short_code) is not None:
+        if short_code in SHORT_CODE_INDEX:
             return short_code
         else:
             return None
@@ -115,21 +164,17 @@ def get_short_code_from_full_name(full_name):
 
     Arguments
     ----------
-    full_name: str 
+    full_name: str
         long form of code eg. Code Civil
-    
+
     Returns
     ----------
     short_code: str
         short form of Code eg. CCIV
     """
-    keys = [k for k, v in CODE_REFERENCE.items() if v == full_name]
-    if len(keys) > 0:
-        return keys[0]
-    else:
-        return None
+    return SHORT_CODE_INDEX.get(full_name)
+
 
-    
 def filter_code_regex(selected_codes):
     """
     Contruire l'expression régulière pour détecter les différents codes dans le document.
@@ -138,7 +183,7 @@ def filter_code_regex(selected_codes):
     ----------
     selected_codes: array
         [short_code, ...]. Default: None (no filter)
-    
+
     Returns
     ----------
     regex: str
@@ -147,11 +192,11 @@ def filter_code_regex(selected_codes):
     if selected_codes is None:
         return "({})".format("|".join(list(CODE_REGEX.values())))
 
-     
+
     if len(selected_codes) == 1:
         return CODE_REGEX[selected_codes[0]]
     else:
-        selected_code_list = [CODE_REGEX[x] for x in sorted(selected_codes)] 
+        selected_code_list = [CODE_REGEX[x] for x in sorted(selected_codes)]
         return "({})".format("|".join(selected_code_list))
 
 def filter_code_reference(selected_codes=None):
@@ -170,4 +215,3 @@ def filter_code_reference(selected_codes=None):
     if selected_codes is None:
         return CODE_REFERENCE
     return {x: CODE_REFERENCE[x] for x in sorted(selected_codes)}
-
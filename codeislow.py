@@ -1,64 +1,320 @@
 #!/usr/bin/env python
 
+import hashlib
 import os
+import time
+from array import array
+from collections import Counter
 from dotenv import load_dotenv
-from parsing import parse_doc
-from matching import get_matching_result_item
+from requests.exceptions import Timeout
+from caching import TTLCache
+from parsing import SKIPPED_PAGES, read_document
+from sandbox import ParserDeadline, iter_doc
+from matching import Citations, iter_citations
 from request_api import get_article
+from result_templates import message_row
 
-def main(file_path, selected_codes=None, pattern_format="article_code", past=3, future=3):
-    load_dotenv()
-    
-    client_id = os.getenv("API_KEY")
-    client_secret = os.getenv("API_SECRET")
-    #parse
-    full_text = parse_doc(file_path)
-    # matching_results = yield from get_matching_result_item(full_text,selected_codes, pattern_format)
-    for code, article_nb in get_matching_result_item(full_text,selected_codes, pattern_format):
-        #request and check validity
-        # article = get_article(code, article_nb, client_id, client_secret, past_year_nb=past, future_year_nb=future)
-        # print(article)
-        yield get_article(code, article_nb, client_id, client_secret, past_year_nb=past, future_year_nb=future)
-
-def load_result(file_path, selected_codes=None, pattern_format="article_code", past=3, future=3):
+RESOLUTION_ORDERS = ("document", "frequency")
+# statut des citations qui n'ont pas pu être vérifiées dans le temps imparti
+UNCHECKED_STATUS_CODE = 408
+UNCHECKED_STATUS = "Non vérifié (délai dépassé)"
+# le document n'a pas été lu jusqu'au bout dans le temps imparti
+PARTIAL_STATUS = "Analyse partielle: la fin du document n'a pas été lue dans le temps imparti"
+# pages d'un PDF dont aucune bibliothèque n'a pu extraire le texte (see parsing.iter_pdf_pages)
+SKIPPED_STATUS = "Pages illisibles, non analysées: {pages}"
+# citations déjà extraites d'un document, par empreinte du fichier: (sha256, codes, pattern_format) => matching.Citations
+# seules les références, leur position et leur page sont conservées, jamais le texte du document
+CITATION_CACHE = TTLCache(maxsize=512, ttl=24 * 3600)
+
+
+def main(file_path, selected_codes=None, pattern_format="article_code", past=3, future=3, job=None, order="document", budget=None, doc_ext=None):
+    '''
+    Load result as article dicts
+
+    Arguments
+    ---------
+    see load_result
+
+    Yields
+    ------
+    article: dict
+        le résultat de request_api.get_article (ou une citation non vérifiée si le budget de temps est épuisé)
+    '''
+    for article, _position, _nb in resolve_articles(file_path, selected_codes, pattern_format, past, future, job, order, budget, doc_ext):
+        yield article
+
+
+def load_result(file_path, selected_codes=None, pattern_format="article_code", past=3, future=3, job=None, order="document", budget=None, doc_ext=None):
     '''
     Load result in HTML
-    
+
     Arguments
     ---------
-    filepath: str
-        le chemin du fichier
+    filepath: str, bytes or file object
+        le chemin du fichier, ou son contenu (see parsing.iter_doc)
     selected_codes: array
         la liste des codes (version abbréviée) à détecter
     pattern_format: str
-        le format des références: Article xxx du Code yyy ou Code yyyy Article xxx
+        le format des références: Article xxx du Code yyy (article_code), Code yyyy Article xxx (code_article)
+        ou les deux (both), see matching.PATTERN_FORMATS
     past: int
         nombre d'années dans le passé
     future: int
         nombre d'années dans le futur
+    job: jobs.Job
+        l'analyse en cours: les citations restantes ne sont plus résolues une fois l'analyse annulée. Default to None
+    order: str
+        ordre de résolution des citations: "document" (ordre d'apparition, une ligne par citation)
+        ou "frequency" (articles les plus cités en premier, une ligne par article replacée dans l'ordre du document). Default to document
+    budget: float
+        temps maximal de l'analyse en secondes: au-delà, la lecture du document s'arrête et les citations restantes
+        sont listées comme non vérifiées, suivies d'une ligne "analyse partielle". Default to None (no limit)
+        Les pages illisibles d'un PDF sont aussi signalées par une ligne, après les citations.
+    doc_ext: str
+        l'extension du document, obligatoire si filepath n'est pas un chemin eg. "pdf". Default to None
     Yields
     ------
     html_results: str
         resultat sous forme de cellule d'une table HTML
+    Raises
+    ------
+    ValueError:
+        order is not one of RESOLUTION_ORDERS
+    '''
+    report = {}
+    articles = resolve_articles(file_path, selected_codes, pattern_format, past, future, job, order, budget, doc_ext, report)
+    try:
+        for article, position, nb in articles:
+            yield get_result_row(article, position, nb)
+        if report.get(SKIPPED_PAGES):
+            pages = ", ".join(str(page_nb + 1) for page_nb in report[SKIPPED_PAGES])
+            yield message_row.format(color="warning", message=SKIPPED_STATUS.format(pages=pages))
+        if report.get("partial"):
+            yield message_row.format(color="warning", message=PARTIAL_STATUS)
+    finally:
+        # propagate a client disconnect to the resolution loop
+        articles.close()
+
+
+def resolve_articles(file_path, selected_codes=None, pattern_format="article_code", past=3, future=3, job=None, order="document", budget=None, doc_ext=None, report=None):
     '''
+    Analyser le document et résoudre les citations auprès de Legifrance
+
+    Arguments
+    ---------
+    see load_result
+    report: dict
+        complété au fil de l'analyse, see get_document_citations. Default to None
+
+    Yields
+    ------
+    article: dict
+        le résultat de request_api.get_article ou une citation non vérifiée (status_code 408)
+    position: int
+        rang de la première citation de l'article dans le document (order="frequency") ou None
+    nb: int
+        nombre de citations de l'article
+    '''
+    if order not in RESOLUTION_ORDERS:
+        raise ValueError(f"Wrong order: choose between {RESOLUTION_ORDERS}")
+    deadline = None if budget is None else time.monotonic() + budget
     load_dotenv()
     client_id = os.getenv("API_KEY")
     client_secret = os.getenv("API_SECRET")
-    #parse
-    full_text = parse_doc(file_path)
-    # matching_results = yield from get_matching_result_item(full_text,selected_codes, pattern_format)
-    for code, article_nb in get_matching_result_item(full_text,selected_codes, pattern_format):
-        #request and check validity
-        article = get_article(code, article_nb, client_id, client_secret, past_year_nb=past, future_year_nb=future)
-        row = f"""
-        <tr>
-            <th scope="row"><a href='{article["url"]}'>{article["code"]} - {article["article"]}</a></th>
+    #parse and match, or reuse the citations of the same document
+    document_citations = get_document_citations(file_path, selected_codes, pattern_format, doc_ext, deadline, report)
+    if order == "frequency":
+        frequencies = Counter(citation[:2] for citation in document_citations)
+        positions = {citation: position for position, citation in enumerate(frequencies)}
+        # most_common is stable: equally cited articles keep the document order
+        citations = ((citation, positions[citation], nb) for citation, nb in frequencies.most_common())
+    else:
+        citations = ((citation[:2], None, 1) for citation in document_citations)
+    try:
+        for (code, article_nb), position, nb in citations:
+            if job is not None and job.is_cancelled():
+                # the rest of the document is not read to count what the cancellation saved
+                job.add_skipped(1)
+                job.skip_remaining()
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                yield get_unchecked_article(code, article_nb), position, nb
+                continue
+            #request and check validity, within the time left
+            timeout = None if deadline is None else deadline - time.monotonic()
+            try:
+                article = get_article(
+                    code, article_nb, client_id, client_secret, past_year_nb=past, future_year_nb=future, timeout=timeout
+                )
+            except Timeout:
+                yield get_unchecked_article(code, article_nb), position, nb
+                continue
+            if job is not None:
+                job.add_resolved()
+            yield article, position, nb
+    except GeneratorExit:
+        # client disconnected: the WSGI server closed the response iterator
+        if job is not None:
+            job.cancel()
+            job.skip_remaining()
+        raise
+    finally:
+        # stop parsing and matching the document
+        document_citations.close()
+
+
+def get_document_hash(file_path):
+    """Empreinte SHA-256 du contenu du fichier (un chemin ou des bytes)"""
+    if isinstance(file_path, bytes):
+        return hashlib.sha256(file_path).hexdigest()
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 16), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def read_lines(lines, deadline=None, report=None, pages=None):
+    """
+    Le texte des lignes (page_nb, line) du document, jusqu'à l'échéance: au-delà, report["partial"] est vrai
+
+    Le processus d'analyse cesse aussi d'attendre à l'échéance (sandbox.ParserDeadline), sans attendre une ligne.
+    Le numéro de page de chaque ligne produite est ajouté à `pages` (see matching.Matcher.iter_citations).
+    """
+    try:
+        for page_nb, line in lines:
+            if deadline is not None and time.monotonic() >= deadline:
+                break
+            if pages is not None:
+                pages.append(page_nb)
+            yield line
+        else:
+            return
+    except ParserDeadline:
+        pass
+    if report is not None:
+        report["partial"] = True
+
+
+def get_document_citations(file_path, selected_codes=None, pattern_format="article_code", doc_ext=None, deadline=None, report=None):
+    """
+    Les citations du document, lues dans CITATION_CACHE si le même fichier a déjà été analysé
+
+    Arguments
+    ---------
+    file_path: str, bytes or file object
+        le chemin du fichier, supprimé une fois lu, ou son contenu
+    selected_codes: array
+        la liste des codes (version abbréviée) à détecter. Default to None (tous les codes)
+    pattern_format: str
+        see matching.PATTERN_FORMATS
+    doc_ext: str
+        see parsing.iter_doc. Default to None
+    deadline: float
+        échéance (time.monotonic) de la lecture du document: les citations trouvées avant sont produites,
+        le reste du document n'est pas lu. Default to None (no limit)
+    report: dict
+        complété à la fin de la lecture: {"partial": True} si la lecture s'est arrêtée à l'échéance,
+        {SKIPPED_PAGES: [page_nb, ...]} les pages d'un PDF qui n'ont pas pu être lues. Default to None
+    Yields
+    ------
+    citation: matching.Citation
+        (code_short_name, article_number, start, end, paragraph, page) dans l'ordre du document
+
+    Notes
+    -----
+    Sans entrée dans le cache, les citations sont produites au fil de la lecture du document, dans un processus
+    d'analyse isolé (see sandbox.iter_doc), et enregistrées une fois le document entièrement parcouru,
+    si aucune page n'a été abandonnée (une page abandonnée faute de temps peut être lue la fois suivante).
+    """
+    # an open file is read once, to be hashed then parsed
+    file_path = read_document(file_path)
+    key = (get_document_hash(file_path), tuple(sorted(selected_codes or ())), pattern_format)
+    cached = CITATION_CACHE.get(key)
+    if cached is not None:
+        if isinstance(file_path, str) and os.path.exists(file_path):
+            os.remove(file_path)
+        yield from cached.records()
+        return
+    report = {} if report is None else report
+    citations = Citations()
+    # the page of each line read, for the page of each citation
+    line_pages = array("I")
+    # the pages extracted by each PDF library, and the skipped pages, once the document is read
+    pages = {}
+    lines = iter_doc(file_path, report=pages, doc_ext=doc_ext, deadline=deadline)
+    try:
+        # the pages are matched, and the first citations resolved, while the next pages are still being read
+        full_text = read_lines(lines, deadline, report, line_pages)
+        # the lines of iter_doc are already normalized
+        for citation in iter_citations(
+            full_text, selected_codes, pattern_format, pages=line_pages, normalized=True,
+            paragraph_starts=citations.paragraph_starts
+        ):
+            citations.append(*citation)
+            yield citation
+        if pages.get(SKIPPED_PAGES):
+            report[SKIPPED_PAGES] = pages[SKIPPED_PAGES]
+        # the citations of a partially read document are not those of the document
+        elif not report.get("partial"):
+            CITATION_CACHE.set(key, citations)
+    finally:
+        # an interrupted reading (cancel, disconnect) stops the parser
+        lines.close()
+
+
+def get_unchecked_article(short_code_name, article_number):
+    """
+    Citation qui n'a pas été vérifiée auprès de Legifrance faute de temps
+
+    Returns
+    -------
+    article: dict
+        un dictionnaire au format de request_api.get_article avec le status_code 408
+    """
+    return {
+        "code": short_code_name,
+        "article": article_number,
+        "status_code": UNCHECKED_STATUS_CODE,
+        "status": UNCHECKED_STATUS,
+        "color": "secondary",
+        "url": "",
+        "texte": "",
+        "date_debut": "",
+        "date_fin": "",
+        "id": None,
+    }
+
+
+def get_result_row(article, position=None, nb=1):
+    """
+    Mettre en forme le résultat d'un article
+
+    Arguments
+    ---------
+    article: dict
+        le résultat de request_api.get_article
+    position: int
+        rang de la première citation de l'article dans le document: la ligne est replacée à ce rang dans la page. Default to None
+    nb: int
+        nombre de citations de l'article dans le document. Default to 1
+    Returns
+    -------
+    row: str
+        resultat sous forme de ligne d'une table HTML
+    """
+    citation_nb = f" <small>({nb} citations)</small>" if nb > 1 else ""
+    if position is None:
+        row_attributes, place_row = "", ""
+    else:
+        row_attributes = f' data-position="{position}"'
+        place_row = f"<script>placeRow({position})</script>"
+    return f"""
+        <tr{row_attributes}>
+            <th scope="row"><a href='{article["url"]}'>{article["code"]} - {article["article"]}</a>{citation_nb}</th>
             <td><span class="badge badge-pill badge-{article["color"]}">{article["status"]}</span></td>
             <td>{article["texte"]}</td>
             <td>{article["date_debut"]}-{article["date_fin"]}</td>
-        <tr>
+        </tr>
+        {place_row}
         """
-        yield(row)
-        
-        
-
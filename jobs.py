@@ -0,0 +1,135 @@
+#!/usr/bin/env python3
+# filename: jobs.py
+"""
+Jobs module
+
+Suivi des analyses en cours pour pouvoir les interrompre:
+
+- Job: une analyse (annulation, nombre de citations résolues et abandonnées)
+- register_job, get_job, release_job: registre des analyses en cours
+- cancel_job: annulation explicite d'une analyse
+- get_cancel_stats: compteurs du travail économisé par les annulations
+
+"""
+
+import threading
+import time
+import uuid
+
+JOBS = {}
+CANCEL_STATS = {
+    "jobs_cancelled": 0,
+    "citations_resolved": 0,
+    "citations_skipped": 0,
+    # analyses annulées avant la fin de la lecture du document: le nombre de citations abandonnées est inconnu
+    "jobs_skipped_unknown": 0,
+}
+_lock = threading.Lock()
+
+
+class Job:
+    """
+    Une analyse de document en cours
+
+    Attributes
+    ----------
+    id: str
+        identifiant unique de l'analyse
+    resolved: int
+        nombre de citations résolues auprès de Legifrance
+    skipped: int
+        nombre de citations abandonnées après l'annulation
+    skipped_unknown: bool
+        la lecture du document a été interrompue: d'autres citations, non comptées, ont été abandonnées
+    """
+
+    def __init__(self, job_id=None):
+        self.id = job_id or uuid.uuid4().hex
+        self.created_at = time.time()
+        self.resolved = 0
+        self.skipped = 0
+        self.skipped_unknown = False
+        self._cancelled = threading.Event()
+
+    def cancel(self):
+        """Annuler l'analyse: les citations restantes ne seront pas résolues"""
+        if not self._cancelled.is_set():
+            self._cancelled.set()
+            with _lock:
+                CANCEL_STATS["jobs_cancelled"] += 1
+
+    def is_cancelled(self):
+        return self._cancelled.is_set()
+
+    def add_resolved(self, nb=1):
+        self.resolved += nb
+        with _lock:
+            CANCEL_STATS["citations_resolved"] += nb
+
+    def add_skipped(self, nb=1):
+        self.skipped += nb
+        with _lock:
+            CANCEL_STATS["citations_skipped"] += nb
+
+    def skip_remaining(self):
+        """Les citations restantes ne sont pas comptées: le document n'est pas lu jusqu'au bout pour les dénombrer"""
+        if not self.skipped_unknown:
+            self.skipped_unknown = True
+            with _lock:
+                CANCEL_STATS["jobs_skipped_unknown"] += 1
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "cancelled": self.is_cancelled(),
+            "resolved": self.resolved,
+            "skipped": self.skipped,
+            "skipped_unknown": self.skipped_unknown,
+        }
+
+
+def register_job(job=None):
+    """Enregistrer une nouvelle analyse dans le registre et la renvoyer"""
+    job = job or Job()
+    with _lock:
+        JOBS[job.id] = job
+    return job
+
+
+def get_job(job_id):
+    """Renvoie l'analyse en cours correspondant à l'identifiant ou None"""
+    with _lock:
+        return JOBS.get(job_id)
+
+
+def release_job(job):
+    """Retirer l'analyse terminée (ou annulée) du registre"""
+    with _lock:
+        JOBS.pop(job.id, None)
+
+
+def cancel_job(job_id):
+    """
+    Annuler une analyse en cours
+
+    Arguments
+    ---------
+    job_id: str
+        identifiant de l'analyse
+    Returns
+    -------
+    job: Job
+        l'analyse annulée ou None si elle est inconnue ou déjà terminée
+    """
+    job = get_job(job_id)
+    if job is not None:
+        job.cancel()
+    return job
+
+
+def get_cancel_stats():
+    """Compteurs globaux: analyses annulées, citations résolues et citations abandonnées"""
+    with _lock:
+        stats = dict(CANCEL_STATS)
+        stats["jobs_running"] = len(JOBS)
+    return stats
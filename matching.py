@@ -5,14 +5,58 @@ The matching module
 
 Ce module permet la detection des articles du code de droit français
 
+La détection se fait en deux temps:
+
+- un seul passage sur le texte repère les mots-clés "article" et les abréviations des codes (scanner:
+  un automate en forme d'arbre de préfixes, compilé en une expression régulière)
+- les mots-clés sont ensuite associés à la référence de code qui les suit pour extraire les numéros d'articles
+
+Le scanner est compilé une fois par sélection de codes (Matcher, conservé par get_matcher).
+
+switch_pattern conserve l'expression régulière d'origine (une seule regex par code) à titre de référence.
 """
 
+import os
 import re
+from array import array
+from bisect import bisect_right
+from collections import deque, namedtuple
+from concurrent.futures import ProcessPoolExecutor
 
-from parsing import parse_doc
-from code_references import filter_code_regex, CODE_REFERENCE, CODE_REGEX
+try:
+    # google-re2: moteur d'expressions régulières en temps linéaire, optionnel
+    import re2
+except ImportError:
+    re2 = None
+
+from caching import TTLCache
+from parsing import normalize_text
+from code_references import filter_code_regex, alias_to_regex, get_alias_key, CODE_ALIASES, CODE_REFERENCE, CODE_REGEX
 
 ARTICLE_REGEX = r"(?P<art>(Articles?|Art\.))"
+# les mots-clés qui annoncent une référence d'article, sous forme de regex élémentaires
+ARTICLE_KEYWORDS = ("Article", "Articles", r"Art\.")
+# valeur de la table des alias pour les mots-clés "article"
+ARTICLE_TOKEN = "art"
+# nombre maximal de caractères entre le mot-clé "article" et la référence du code
+MAX_REF_SPAN = 200
+# l'ordre des références: Article xxx du Code yyy, Code yyy, article xxx ou les deux
+PATTERN_FORMATS = ("article_code", "code_article", "both")
+# code_article: séparateurs admis entre le nom du code et le mot-clé eg. "C. civ., art. 1240"
+CODE_ARTICLE_GAP_MAX = 10
+CODE_ARTICLE_GAP = re.compile(r"[\s,;:]{0,%d}" % CODE_ARTICLE_GAP_MAX)
+# code_article: une référence qui se termine ainsi renvoie au code qui la suit eg. "article 1241 du Code pénal"
+ARTICLE_CODE_LINK = re.compile(r"\s(?:du|de|des)\s*$", flags=re.I)
+# taille des morceaux de texte analysés en parallèle (en caractères)
+PARALLEL_CHUNK_SIZE = 1000000
+# stream_reference_spans: les paragraphes courts sont regroupés jusqu'à cette longueur (en caractères) avant d'être
+# analysés, la fin du texte déjà lu n'est ainsi reprise qu'une fois par groupe (see benchmarks/bench_matching.py)
+MIN_SCAN_SIZE = 512
+# moteurs d'expressions régulières: re (module standard) ou re2 (google-re2, sans retour arrière)
+REGEX_BACKENDS = ("re", "re2")
+DEFAULT_REGEX_BACKEND = os.getenv("CODEISLOW_REGEX_BACKEND", "re")
+# les scanners compilés, un par sélection de codes: les entrées n'expirent pas
+MATCHER_CACHE = TTLCache(maxsize=64, ttl=float("inf"))
 
 # ARTICLE_REF = re.compile("\d+")
 # ARTICLE_ID = r"(L|R|A|D)?(\.|\s)?\d+(-\d+)?((\s(al\.|alinea)?\s\d+)?(\s|\.)"
@@ -20,7 +64,52 @@ ARTICLE_REGEX = r"(?P<art>(Articles?|Art\.))"
 
 
 
-def switch_pattern(selected_codes=None, pattern="article_code"):
+def get_regex_backend(backend=None):
+    """
+    Le moteur d'expressions régulières effectivement utilisé
+
+    Arguments
+    ---------
+    backend: str
+        "re" ou "re2". Default to None (DEFAULT_REGEX_BACKEND, see the CODEISLOW_REGEX_BACKEND environment variable)
+    Returns
+    -------
+    backend: str
+        "re2" si demandé et si google-re2 est installé, sinon "re"
+    Raises
+    ------
+    ValueError:
+        backend is not one of REGEX_BACKENDS
+    """
+    backend = backend or DEFAULT_REGEX_BACKEND
+    if backend not in REGEX_BACKENDS:
+        raise ValueError(f"Wrong regex backend: choose between {REGEX_BACKENDS}")
+    if backend == "re2" and re2 is None:
+        return "re"
+    return backend
+
+
+def compile_regex(pattern, backend=None):
+    """
+    Compiler une expression régulière insensible à la casse avec le moteur choisi
+
+    Arguments
+    ---------
+    pattern: str
+        l'expression régulière, sans lookahead ni backreference (non supportés par re2)
+    backend: str
+        see get_regex_backend
+    Returns
+    -------
+    regex: re.Pattern or re2._Regexp
+        an object with the finditer, search and match methods of re.Pattern
+    """
+    if get_regex_backend(backend) == "re2":
+        return re2.compile(f"(?i){pattern}")
+    return re.compile(pattern, flags=re.I)
+
+
+def switch_pattern(selected_codes=None, pattern="article_code", max_span=None, backend=None):
     """
     Build pattern recognition using pattern short code switch
 
@@ -30,6 +119,10 @@ def switch_pattern(selected_codes=None, pattern="article_code"):
         a list of short codes to select. Default to None
     pattern: str
         a string article_code or code_article. Default to article_code
+    max_span: int
+        maximum number of characters between the article keyword and the code. Default to None (no limit)
+    backend: str
+        the regex engine, see get_regex_backend. Default to None
     Returns
     ---------
     regex_pattern: str
@@ -46,14 +139,769 @@ def switch_pattern(selected_codes=None, pattern="article_code"):
         raise ValueError(
             "Wrong pattern name: choose between 'article_code' or 'code_article'"
         )
+    ref_regex = ".*?" if max_span is None else f".{{0,{max_span}}}?"
     if pattern == "article_code":
-        return re.compile(f"{ARTICLE_REGEX}(?P<ref>.*?){code_regex}", flags=re.I)
+        return compile_regex(f"{ARTICLE_REGEX}(?P<ref>{ref_regex}){code_regex}", backend)
     # else:
     #     #code_article
     #     # return re.compile(f"{code_regex}.*?{ARTICLE_REGEX}(\s|\.)(?P<ref>.*?)(\.|\s)", flags=re.I)
     #     return re.compile(f"{code_regex}.*?{ARTICLE_REGEX}.*?{ARTICLE_ID}", flags=re.I)
 
-def get_matching_results_dict(full_text, selected_short_codes=[], pattern_format="article_code"):
+def split_regex_atoms(regex):
+    r"""
+    Découper une expression régulière élémentaire (alias d'un code) en atomes
+
+    Arguments
+    ---------
+    regex: str
+        un alias sans groupe ni alternative eg. C\.\sciv\.
+    Returns
+    -------
+    atoms: list
+        les atomes: caractère en minuscule, \s ou \. eg. ["c", "\.", "\s", "c", "i", "v", "\."]
+
+    Notes
+    -----
+    Un point non échappé est lu comme un point littéral.
+    """
+    atoms = []
+    i = 0
+    while i < len(regex):
+        if regex[i] == "\\":
+            atoms.append(regex[i : i + 2])
+            i += 2
+        else:
+            atoms.append(r"\." if regex[i] == "." else regex[i].lower())
+            i += 1
+    return atoms
+
+
+def atoms_to_text(atoms):
+    """Texte littéral correspondant aux atomes eg. ["c", "\\.", "\\s", "c"] => 'c. c'"""
+    return "".join(" " if atom == r"\s" else atom.lstrip("\\") for atom in atoms)
+
+
+def build_trie_pattern(alternatives):
+    """
+    Construire une expression régulière en arbre de préfixes à partir d'une liste d'alias
+
+    Arguments
+    ---------
+    alternatives: array
+        une liste d'alias découpés en atomes (voir split_regex_atoms)
+    Returns
+    -------
+    pattern: str
+        une regex dont les préfixes communs sont factorisés: à chaque position du texte,
+        le moteur ne teste que les branches qui commencent par le bon caractère.
+        L'alias le plus long l'emporte (eg. CPCE plutôt que CPC).
+    """
+    trie = {}
+    for atoms in alternatives:
+        node = trie
+        for atom in atoms:
+            node = node.setdefault(atom, {})
+        node[""] = {}
+
+    def to_pattern(node):
+        branches = [
+            (atom if atom.startswith("\\") else re.escape(atom)) + to_pattern(child)
+            for atom, child in node.items()
+            if atom != ""
+        ]
+        if not branches:
+            return ""
+        if len(branches) == 1 and "" not in node:
+            return branches[0]
+        return "(?:{}){}".format("|".join(branches), "?" if "" in node else "")
+
+    return to_pattern(trie)
+
+
+def build_scanner(selected_codes=None, backend=None):
+    """
+    Construire le scanner: une seule expression régulière pour les mots-clés "article" et les alias des codes
+
+    Arguments
+    ---------
+    selected_codes: array
+        a list of short codes to select. Default to None (no filter)
+    backend: str
+        the regex engine, see get_regex_backend. Default to None
+    Returns
+    ---------
+    scanner: re.Pattern
+        the compiled trie pattern
+    lookup: dict
+        {alias_key: short_code or ARTICLE_TOKEN} pour identifier le jeton trouvé
+    """
+    if not selected_codes:
+        selected_codes = list(CODE_REGEX)
+    lookup = {}
+    alternatives = []
+    for keyword in ARTICLE_KEYWORDS:
+        atoms = split_regex_atoms(keyword)
+        alternatives.append(atoms)
+        lookup[get_alias_key(atoms_to_text(atoms))] = ARTICLE_TOKEN
+    for short_code in selected_codes:
+        for alias in CODE_ALIASES[short_code]:
+            atoms = split_regex_atoms(alias_to_regex(alias))
+            alternatives.append(atoms)
+            lookup.setdefault(get_alias_key(atoms_to_text(atoms)), short_code)
+    return compile_regex(build_trie_pattern(alternatives), backend), lookup
+
+
+def check_pattern_format(pattern_format):
+    """
+    Raises
+    ------
+    ValueError:
+        pattern name is not one of PATTERN_FORMATS
+    """
+    if pattern_format not in PATTERN_FORMATS:
+        raise ValueError(f"Wrong pattern name: choose between {PATTERN_FORMATS}")
+
+
+def scan_references(text, scanner, lookup, max_span=MAX_REF_SPAN, pattern_format="article_code"):
+    """
+    Associer chaque mot-clé "article" à la référence de code qui le suit
+
+    Arguments
+    ---------
+    text: str
+        the normalized text
+    scanner: re.Pattern
+        see build_scanner
+    lookup: dict
+        see build_scanner
+    max_span: int
+        nombre maximal de caractères entre le mot-clé et la référence du code. Default to MAX_REF_SPAN, None for no limit
+    pattern_format: str
+        l'ordre des références: "article_code" (Article xxx du Code yyy), "code_article" (Code yyy, article xxx)
+        ou "both" (les deux ordres en un seul passage). Default to article_code
+    Yields
+    ------
+    code_short_name: str
+
+    ref: str
+        le texte entre le mot-clé et la référence du code eg. " L. 385-2, R. 343-4 et A421-13 "
+        ou, dans l'ordre code_article, le texte qui suit le mot-clé eg. " 1240, al. 2 et "
+    """
+    return stream_references([text], scanner, lookup, max_span, pattern_format)
+
+
+def stream_references(paragraphs, scanner, lookup, max_span=MAX_REF_SPAN, pattern_format="article_code"):
+    """
+    Associer les mots-clés "article" aux références de code au fil des paragraphes, sans construire le texte complet
+
+    Arguments
+    ---------
+    paragraphs: iterable
+        les paragraphes (ou pages) du document, éventuellement produits au fur et à mesure de la lecture du fichier
+    scanner: re.Pattern
+        see build_scanner
+    lookup: dict
+        see build_scanner
+    max_span: int
+        see scan_references
+    pattern_format: str
+        see scan_references
+    Yields
+    ------
+    code_short_name: str
+
+    ref: str
+        see scan_references
+
+    Notes
+    -----
+    Les paragraphes sont séparés par une espace, comme dans " ".join(paragraphs): les résultats sont identiques à ceux
+    de scan_references sur le texte complet. Seule la fin du texte est conservée en mémoire: depuis le premier mot-clé
+    en attente d'un code (au plus max_span caractères) ou les derniers caractères où un jeton peut encore commencer.
+    Avec max_span=None, un mot-clé sans code oblige à conserver tout le texte qui le suit.
+    """
+    for code, _start, _end, ref in stream_reference_spans(paragraphs, scanner, lookup, max_span, pattern_format):
+        yield code, ref
+
+
+def stream_reference_spans(paragraphs, scanner, lookup, max_span=MAX_REF_SPAN, pattern_format="article_code", normalized=False):
+    """
+    Comme stream_references, avec la position de chaque référence dans le texte normalisé
+
+    Arguments
+    ---------
+    see stream_references
+    normalized: bool
+        les paragraphes sont déjà normalisés (see parsing.normalize_text), eg. les lignes de parsing.iter_doc.
+        Default to False
+
+    Yields
+    ------
+    code_short_name: str
+
+    start: int
+        position du mot-clé "article" (ou du nom du code dans l'ordre code_article) dans " ".join(paragraphs)
+    end: int
+        position de la fin du nom du code (ou de la référence dans l'ordre code_article) dans " ".join(paragraphs)
+    ref: str
+        see scan_references
+
+    Notes
+    -----
+    Un mot-clé qui suit immédiatement un nom de code (au plus CODE_ARTICLE_GAP_MAX caractères parmi " ,;:") ouvre une
+    citation code_article, si ce nom de code ne termine pas déjà une citation article_code. Elle est terminée par le
+    jeton suivant ou au plus max_span caractères plus loin. Si ce jeton est un nom de code annoncé par "du", "de" ou
+    "des" (eg. "Code civil, article 1241 du Code pénal"), la citation est rattachée à ce code dans l'ordre
+    article_code: chaque mot-clé et chaque nom de code ne servent qu'à une citation. Les citations de l'ordre "both"
+    sont celles des ordres "article_code" et "code_article" réunies.
+    """
+    check_pattern_format(pattern_format)
+    article_code = pattern_format != "code_article"
+    code_article = pattern_format != "article_code"
+    # a token starting closer than this to the end of the buffer may still grow with the next paragraph (eg. CPC => CPCE)
+    max_token_len = max(map(len, lookup))
+    buffer = ""
+    # offset of the buffer in the document
+    offset = 0
+    # where the scan resumes in the buffer
+    position = 0
+    # (start, end) offsets of the keywords waiting for a code: the first one opens the reference,
+    # the following ones belong to it unless the first one is too far from the code
+    keywords = deque()
+    # code_article: (code, start, end) of the last code name and (code, code_start, keyword_start, keyword_end)
+    # of the keyword that follows it, in document offsets
+    last_code = None
+    pending = None
+    separator = ""
+    # the paragraphs read since the last scan, and their length with their separators
+    batch = []
+    batch_size = 0
+    paragraphs = iter(paragraphs)
+    while True:
+        paragraph = next(paragraphs, None)
+        if paragraph is not None:
+            batch.append(paragraph if normalized else normalize_text(paragraph))
+            batch_size += len(batch[-1]) + 1
+            if batch_size < MIN_SCAN_SIZE:
+                continue
+        if batch:
+            buffer += separator + " ".join(batch)
+            separator = " "
+            batch = []
+            batch_size = 0
+        if paragraph is None:
+            # end of the document: every remaining token is complete
+            safe = len(buffer) + 1
+        else:
+            safe = len(buffer) - max_token_len
+        for token in scanner.finditer(buffer, position):
+            if token.start() >= safe:
+                break
+            position = token.end()
+            kind = lookup.get(get_alias_key(token.group()))
+            if kind is None:
+                continue
+            if pending is not None:
+                code, code_start, keyword_start, keyword_end = pending
+                pending = None
+                token_start = offset + token.start()
+                in_span = max_span is None or token_start - keyword_end <= max_span
+                if kind != ARTICLE_TOKEN and in_span and ARTICLE_CODE_LINK.search(buffer, keyword_end - offset, token.start()):
+                    # the reference belongs to the following code
+                    if article_code:
+                        yield kind, keyword_start, offset + token.end(), buffer[keyword_end - offset : token.start()]
+                    continue
+                ref_end = token_start if in_span else keyword_end + max_span
+                yield code, code_start, ref_end, buffer[keyword_end - offset : ref_end - offset]
+            if max_span is not None:
+                while keywords and keywords[0][1] < token.start() - max_span:
+                    keywords.popleft()
+            if kind == ARTICLE_TOKEN:
+                if (
+                    code_article
+                    and last_code is not None
+                    and CODE_ARTICLE_GAP.fullmatch(buffer, last_code[2] - offset, token.start())
+                ):
+                    pending = (last_code[0], last_code[1], offset + token.start(), offset + token.end())
+                elif max_span is not None or not keywords:
+                    keywords.append(token.span())
+                last_code = None
+            else:
+                if keywords:
+                    keyword_start, keyword_end = get_reference_keyword(buffer, keywords)
+                    if article_code:
+                        yield kind, offset + keyword_start, offset + token.end(), buffer[keyword_end : token.start()]
+                    keywords.clear()
+                else:
+                    # a code name which closes no reference may open a code_article one
+                    last_code = (kind, offset + token.start(), offset + token.end())
+        if paragraph is None:
+            if pending is not None:
+                code, code_start, _keyword_start, keyword_end = pending
+                ref_end = offset + len(buffer) if max_span is None else min(offset + len(buffer), keyword_end + max_span)
+                yield code, code_start, ref_end, buffer[keyword_end - offset : ref_end - offset]
+            return
+        # no token starts between the scan position and the safe offset
+        position = max(position, safe)
+        if max_span is not None:
+            # the next tokens start after the safe offset: drop the keywords they can no longer reach
+            while keywords and keywords[0][1] < safe - max_span:
+                keywords.popleft()
+            if pending is not None and offset + safe - pending[3] > max_span:
+                code, code_start, _keyword_start, keyword_end = pending
+                pending = None
+                yield code, code_start, keyword_end + max_span, buffer[keyword_end - offset : keyword_end + max_span - offset]
+        if last_code is not None and last_code[2] < offset + safe - CODE_ARTICLE_GAP_MAX:
+            # too far from the next keyword
+            last_code = None
+        cut = position
+        if keywords:
+            cut = min(cut, keywords[0][0])
+        if pending is not None:
+            cut = min(cut, pending[3] - offset)
+        if last_code is not None:
+            cut = min(cut, last_code[2] - offset)
+        if cut > 0:
+            buffer = buffer[cut:]
+            offset += cut
+            position -= cut
+            keywords = deque((start - cut, end - cut) for start, end in keywords)
+
+
+class Matcher:
+    """
+    Détecteur de citations compilé une fois pour une sélection de codes
+
+    Arguments
+    ---------
+    selected_codes: array
+        a list of short codes to select. Default to None (no filter)
+    max_span: int
+        nombre maximal de caractères entre le mot-clé et la référence du code. Default to MAX_REF_SPAN, None for no limit
+    pattern_format: str
+        l'ordre des références, see scan_references. Default to article_code
+    backend: str
+        le moteur d'expressions régulières du scanner, see get_regex_backend. Default to None
+
+    Notes
+    -----
+    Un Matcher ne change plus après sa construction: il peut être partagé entre les threads du serveur.
+    Utiliser get_matcher pour réutiliser le scanner déjà compilé pour la même sélection.
+    """
+
+    def __init__(self, selected_codes=None, max_span=MAX_REF_SPAN, pattern_format="article_code", backend=None):
+        check_pattern_format(pattern_format)
+        self.codes = tuple(sorted(selected_codes or CODE_REGEX))
+        self.max_span = max_span
+        self.pattern_format = pattern_format
+        self.backend = get_regex_backend(backend)
+        self.scanner, self.lookup = build_scanner(self.codes, self.backend)
+
+    def references(self, text):
+        """Les couples (code, référence) du texte normalisé, see scan_references"""
+        return scan_references(text, self.scanner, self.lookup, self.max_span, self.pattern_format)
+
+    def reference_spans(self, full_text, normalized=False):
+        """Les références des paragraphes avec leur position, see stream_reference_spans"""
+        return stream_reference_spans(full_text, self.scanner, self.lookup, self.max_span, self.pattern_format, normalized)
+
+    def iter_articles(self, full_text, normalized=False):
+        """
+        Renvoie les références des articles détectés dans le texte, dès que chaque citation est complète
+
+        Arguments
+        ---------
+        full_text: iterable
+            les paragraphes du document (see parsing.parse_doc): une liste ou un générateur
+        normalized: bool
+            see stream_reference_spans. Default to False
+        Yields
+        ------
+        code_short_name: str
+
+        article_number: str
+        """
+        for code, _start, _end, ref in self.reference_spans(full_text, normalized):
+            for article_nb in normalize_references(ref):
+                yield (code, article_nb)
+
+    def iter_citations(self, full_text, pages=None, normalized=False, paragraph_starts=None):
+        """
+        Les citations du texte avec leur position, dès que chaque citation est complète
+
+        Arguments
+        ---------
+        full_text: iterable
+            les paragraphes du document (see parsing.parse_doc): une liste ou un générateur
+        pages: array
+            le numéro de page (à partir de 0) de chaque paragraphe, éventuellement complété au fur et à mesure
+            de la lecture du document. Default to None (documents sans pages: page 0)
+        normalized: bool
+            see stream_reference_spans. Default to False
+        paragraph_starts: array
+            complété au fil de la lecture: la position du début de chaque paragraphe, see Citations. Default to None
+        Yields
+        ------
+        citation: Citation
+        """
+        paragraphs = array("I") if paragraph_starts is None else paragraph_starts
+
+        def track_paragraphs():
+            # the offsets are those of the normalized text (eg. a ligature becomes two characters)
+            start = 0
+            for paragraph in full_text:
+                if not normalized:
+                    paragraph = normalize_text(paragraph)
+                paragraphs.append(start)
+                start += len(paragraph) + 1
+                yield paragraph
+
+        for code, start, end, ref in self.reference_spans(track_paragraphs(), normalized=True):
+            paragraph = bisect_right(paragraphs, start) - 1
+            page = 0 if pages is None else pages[paragraph]
+            for article_ref in parse_article_refs(ref):
+                yield Citation(code, str(article_ref), start, end, paragraph, page)
+
+    def find_citations(self, full_text, pages=None, normalized=False):
+        """
+        Les citations du texte avec leur position, see Citations
+
+        Arguments
+        ---------
+        see iter_citations
+        Returns
+        -------
+        citations: Citations
+        """
+        citations = Citations()
+        for citation in self.iter_citations(full_text, pages, normalized, citations.paragraph_starts):
+            citations.append(*citation)
+        return citations
+
+    def __repr__(self):
+        return (
+            f"Matcher(codes={self.codes!r}, max_span={self.max_span!r}, "
+            f"pattern_format={self.pattern_format!r}, backend={self.backend!r})"
+        )
+
+
+def get_matcher(selected_codes=None, max_span=MAX_REF_SPAN, pattern_format="article_code", backend=None):
+    """
+    Renvoie le Matcher de la sélection de codes, compilé au premier appel puis conservé dans MATCHER_CACHE
+
+    Arguments
+    ---------
+    selected_codes: array
+        a list of short codes to select. Default to None (no filter)
+    max_span: int
+        see Matcher
+    pattern_format: str
+        see Matcher
+    backend: str
+        see Matcher
+    Returns
+    -------
+    matcher: Matcher
+
+    Raises
+    ------
+    KeyError:
+        a selected code is unknown
+    ValueError:
+        pattern name or regex backend is wrong
+    """
+    # the order of the selection does not change the matcher
+    key = (frozenset(selected_codes or CODE_REGEX), max_span, pattern_format, get_regex_backend(backend))
+    matcher = MATCHER_CACHE.get(key)
+    if matcher is None:
+        matcher = Matcher(selected_codes, max_span, pattern_format, backend)
+        MATCHER_CACHE.set(key, matcher)
+    return matcher
+
+
+class ArticleRef:
+    """
+    Numéro d'article d'un code eg. L. 385-2 al. 3 => ArticleRef("L", ("385", "2"), 3)
+
+    Arguments
+    ---------
+    prefix: str
+        la partie du code: L (législative), R, D ou A (réglementaire) ou "" (codes sans partie)
+    parts: tuple
+        les numéros séparés par un tiret eg. ("385", "2")
+    alinea: int
+        l'alinéa cité. Default to None
+
+    Notes
+    -----
+    str(article_ref) donne le numéro attendu par Légifrance eg. "L385-2": l'alinéa ne fait pas partie du numéro.
+    """
+
+    __slots__ = ("prefix", "parts", "alinea")
+
+    def __init__(self, prefix, parts, alinea=None):
+        self.prefix = prefix
+        self.parts = tuple(parts)
+        self.alinea = alinea
+
+    def __str__(self):
+        return self.prefix + "-".join(self.parts)
+
+    def __repr__(self):
+        return f"ArticleRef({self.prefix!r}, {self.parts!r}, {self.alinea!r})"
+
+    def __eq__(self, other):
+        if not isinstance(other, ArticleRef):
+            return NotImplemented
+        return (self.prefix, self.parts, self.alinea) == (other.prefix, other.parts, other.alinea)
+
+    def __hash__(self):
+        return hash((self.prefix, self.parts, self.alinea))
+
+
+# les séparateurs d'une liste de numéros d'articles eg. ", ", " et ", " et art. ", " et l'article "
+ARTICLE_LIST_SEPARATORS = r"(?:\s|,|(?i:l')(?=art|$)|(?i:et|ou|art\.|articles?)(?=[\s.]|$))*"
+ARTICLE_LIST_END = re.compile(ARTICLE_LIST_SEPARATORS)
+# un numéro d'article, précédé des séparateurs d'une liste
+# L. 385-2 | R.343-4 | A421-13 | 811- 3 | 1er | 1240 al. 1
+ARTICLE_REF_REGEX = re.compile(
+    ARTICLE_LIST_SEPARATORS +
+    r"(?:(?P<prefix>[LRDA])\s*\.?\s*)?"
+    r"(?P<number>\d+(?:\s*-\s*\d+)*)(?:er\b)?"
+    r"(?:\s?,?\s?(?i:al\.?|alinéa|alinea)\s?(?P<alinea>\d+))?"
+)
+
+
+def parse_article_refs(ref):
+    """
+    Lire les numéros d'articles au début de la référence détectée
+
+    Arguments
+    ---------
+    ref: str
+        le texte entre le mot-clé et la référence du code eg. " L. 385-2, R. 343-4 et A421-13 "
+    Returns
+    -------
+    article_refs: list
+        [ArticleRef]: la lecture s'arrête au premier mot qui n'est ni un numéro ni un séparateur de liste,
+        une référence sans numéro ne donne aucun article
+    """
+    article_refs = []
+    position = 0
+    while True:
+        match = ARTICLE_REF_REGEX.match(ref, position)
+        if match is None:
+            return article_refs
+        number = match.group("number")
+        parts = number.replace(" ", "").split("-")
+        alinea = match.group("alinea")
+        article_refs.append(ArticleRef(match.group("prefix") or "", parts, None if alinea is None else int(alinea)))
+        position = match.end()
+
+
+def is_article_list(text):
+    """
+    Le texte ne contient que des numéros d'articles et des séparateurs de liste eg. " 5 et l'" ou " L. 1424-71, "
+
+    Notes
+    -----
+    Utilisé entre deux mots-clés "article" en attente d'un code: le second poursuit la liste ouverte par le premier.
+    """
+    position = 0
+    while True:
+        match = ARTICLE_REF_REGEX.match(text, position)
+        if match is None:
+            return ARTICLE_LIST_END.fullmatch(text, position) is not None
+        position = match.end()
+
+
+def get_reference_keyword(buffer, keywords):
+    """
+    Le mot-clé qui ouvre la référence fermée par un nom de code
+
+    Arguments
+    ---------
+    buffer: str
+        le texte en cours d'analyse
+    keywords: deque
+        les positions (start, end) dans buffer des mots-clés en attente d'un code, dans l'ordre du texte
+    Returns
+    -------
+    start: int
+        la position du premier mot-clé de la liste qui se termine au nom du code
+    end: int
+        la fin de ce mot-clé: la référence commence là
+
+    Notes
+    -----
+    Un mot-clé dont le texte jusqu'au mot-clé suivant n'est pas une liste de numéros (see is_article_list)
+    n'est pas cité: eg. "l'article 5 de la loi du 10 juillet 1965 et l'article L. 1234-5 du Code du travail"
+    ne cite que l'article L. 1234-5.
+    """
+    start, end = keywords[0]
+    previous_end = end
+    for keyword_start, keyword_end in list(keywords)[1:]:
+        if not is_article_list(buffer[previous_end:keyword_start]):
+            start, end = keyword_start, keyword_end
+        previous_end = keyword_end
+    return start, end
+
+
+def normalize_references(ref):
+    """
+    Normaliser la référence détectée en une liste de numéros d'articles
+
+    Arguments
+    ---------
+    ref: str
+        le texte entre le mot-clé et la référence du code eg. " L. 385-2, R. 343-4 et A421-13 "
+    Returns
+    -------
+    article_numbers: list
+        les numéros d'articles normalisés eg. ["L385-2", "R343-4", "A421-13"], see parse_article_refs
+    """
+    return [str(article_ref) for article_ref in parse_article_refs(ref)]
+
+
+Citation = namedtuple("Citation", ["code", "article", "start", "end", "paragraph", "page"])
+
+
+class Citations:
+    """
+    Les citations d'un document, rangées en colonnes compactes (array) plutôt qu'en un objet par citation
+
+    Colonnes
+    --------
+    keys: array('I')
+        l'article cité, rang dans `articles`: deux citations du même article partagent la même clé
+    starts, ends: array('I')
+        position du mot-clé "article" et de la fin du nom du code dans le texte (paragraphes séparés par une espace)
+    paragraphs, pages: array('I')
+        rang du paragraphe et de la page où commence la citation
+    paragraph_starts: array('I')
+        position du début de chaque paragraphe dans le texte
+
+    Notes
+    -----
+    Une citation occupe 20 octets: 10 000 citations tiennent en 200 Ko.
+    citations[i] renvoie un Citation(code, article, start, end, paragraph, page),
+    l'itération renvoie les couples (code, article) comme get_matching_result_item.
+    """
+
+    __slots__ = ("articles", "article_keys", "keys", "starts", "ends", "paragraphs", "pages", "paragraph_starts")
+
+    def __init__(self):
+        # the distinct (code_short_name, article_number) in the order of their first citation
+        self.articles = []
+        self.article_keys = {}
+        self.keys = array("I")
+        self.starts = array("I")
+        self.ends = array("I")
+        self.paragraphs = array("I")
+        self.pages = array("I")
+        self.paragraph_starts = array("I")
+
+    def append(self, code, article_nb, start, end, paragraph=0, page=0):
+        article = (code, article_nb)
+        key = self.article_keys.get(article)
+        if key is None:
+            key = self.article_keys[article] = len(self.articles)
+            self.articles.append(article)
+        self.keys.append(key)
+        self.starts.append(start)
+        self.ends.append(end)
+        self.paragraphs.append(paragraph)
+        self.pages.append(page)
+
+    def __len__(self):
+        return len(self.keys)
+
+    def __iter__(self):
+        articles = self.articles
+        return (articles[key] for key in self.keys)
+
+    def __getitem__(self, i):
+        code, article_nb = self.articles[self.keys[i]]
+        return Citation(code, article_nb, self.starts[i], self.ends[i], self.paragraphs[i], self.pages[i])
+
+    def records(self):
+        """Les citations dans l'ordre du document, see Citation"""
+        return map(self.__getitem__, range(len(self)))
+
+    def first_citation(self, i):
+        """Rang de la première citation du même article que la citation i (i si c'est la première)"""
+        return self.keys.index(self.keys[i])
+
+    def occurrences(self, code, article_nb):
+        """Rangs des citations de l'article"""
+        key = self.article_keys.get((code, article_nb))
+        return [i for i, k in enumerate(self.keys) if k == key]
+
+    def __repr__(self):
+        return f"<Citations: {len(self)} citations, {len(self.articles)} articles>"
+
+
+def get_citations(full_text, selected_shortcodes=[], pattern_format="article_code", max_span=MAX_REF_SPAN, pages=None, normalized=False):
+    """
+    Les citations détectées dans le texte, avec leur position dans le document
+
+    Arguments
+    -----------
+    full_text: array
+        the paragraphs of the document
+    selected_shortcodes: array
+        see get_matching_result_item
+    pattern_format: str
+        see get_matching_result_item
+    max_span: int
+        see get_matching_result_item
+    pages: array
+        see Matcher.find_citations
+    normalized: bool
+        see get_matching_result_item
+
+    Returns
+    --------
+    citations: Citations
+
+    Raises
+    ------
+    ValueError:
+        pattern name is wrong
+    """
+    check_pattern_format(pattern_format)
+    return get_matcher(selected_shortcodes, max_span, pattern_format).find_citations(full_text, pages, normalized)
+
+
+def iter_citations(
+    full_text, selected_shortcodes=[], pattern_format="article_code", max_span=MAX_REF_SPAN, pages=None, normalized=False,
+    paragraph_starts=None
+):
+    """
+    Les citations détectées dans le texte, avec leur position dans le document, dès que chacune est complète
+
+    Arguments
+    -----------
+    see get_citations
+    paragraph_starts: array
+        see Matcher.iter_citations
+
+    Yields
+    --------
+    citation: Citation
+
+    Raises
+    ------
+    ValueError:
+        pattern name is wrong
+    """
+    check_pattern_format(pattern_format)
+    yield from get_matcher(selected_shortcodes, max_span, pattern_format).iter_citations(
+        full_text, pages, normalized, paragraph_starts
+    )
+
+
+def get_matching_results_dict(full_text, selected_short_codes=[], pattern_format="article_code", max_span=MAX_REF_SPAN):
     """
     Une fonction qui renvoie un dictionnaire de resultats: trié par code (version abbréviée) avec la liste des articles détectés lui appartenant. 
 
@@ -62,72 +910,22 @@ def get_matching_results_dict(full_text, selected_short_codes=[], pattern_format
     full_text: str
         a string of the full document normalized
     pattern_format: str
-        a string representing the pattern format article_code or code_article. Defaut to article_code
+        a string representing the pattern format article_code, code_article or both. Defaut to article_code
+    max_span: int
+        maximum number of characters between the article keyword and the code. Default to MAX_REF_SPAN
 
     Returns
     ----------
     code_found: dict
         a dict compose of short version of code as key and list of the detected articles references  as values {code: [art_ref, art_ref2, ... ]}
     """
-    article_pattern = switch_pattern(selected_short_codes, pattern_format)
     code_found = {}
-
-    # normalisation
-    full_text = re.sub(r"\r|\n|\t|\xa0", " ", " ".join(full_text))
-    for i, match in enumerate(re.finditer(article_pattern, full_text)):
-        needle = match.groupdict()
-        qualified_needle = {
-            key: value for key, value in needle.items() if value is not None
-        }
-        msg = f"#{i+1}\t{qualified_needle}"
-        # logging.debug(msg)
-        # get the code shortname based on regex group name <code>
-        code = [k for k in qualified_needle.keys() if k not in ["ref", "art"]][0]
-
-        ref = match.group("ref").strip()
-        # split multiple articles of a same code
-        refs = [
-            n
-            for n in re.split(r"(\set\s|,\s|\sdu)", ref)
-            if n not in [" et ", ", ", " du", " ", ""]
-        ]
-        # normalize articles to remove dots, spaces, caret and 'alinea'
-        refs = [
-            "-".join(
-                [
-                    r
-                    for r in re.split(r"\s|\.|-", ref)
-                    if r not in [" ", "", "al", "alinea", "alinéa"]
-                ]
-            )
-            for ref in refs
-        ]
-        # clean caracters for everything but numbers and (L|A|R|D) and caret
-        normalized_refs = []
-        for ref in refs:
-            # accepted caracters for article
-            ref = "".join(
-                [n for n in ref if (n.isdigit() or n in ["L", "A", "R", "D", "-"])]
-            )
-            if ref.endswith("-"):
-                ref = ref[:-1]
-            # remove caret separating article nb between first letter
-            special_ref = ref.split("-", 1)
-            if special_ref[0] in ["L", "A", "R", "D"]:
-                normalized_refs.append("".join(special_ref))
-            else:
-                normalized_refs.append(ref)
-
-        if code not in code_found:
-            # append article references
-            code_found[code] = normalized_refs
-        else:
-            # append article references to existing list
-            code_found[code].extend(normalized_refs)
-
+    for code, article_nb in get_matching_result_item(full_text, selected_short_codes, pattern_format, max_span):
+        code_found.setdefault(code, []).append(article_nb)
     return code_found
 
-def get_matching_result_item(full_text, selected_shortcodes=[], pattern_format="article_code"):
+
+def get_matching_result_item(full_text, selected_shortcodes=[], pattern_format="article_code", max_span=MAX_REF_SPAN, normalized=False):
     """"
     Renvoie les références des articles détectés dans le texte
 
@@ -138,59 +936,130 @@ def get_matching_result_item(full_text, selected_shortcodes=[], pattern_format="
     selected_shortcodes: array
         a list of selected codes in short format for filtering article detection. Default is an empty list (which stands for no filter) 
     pattern_format: str
-    a string representing the pattern format article_code or code_article. Defaut to article_code
+    a string representing the pattern format article_code, code_article or both. Defaut to article_code
+    max_span: int
+        maximum number of characters between the article keyword and the code. Default to MAX_REF_SPAN, None for no limit
+    normalized: bool
+        the paragraphs are already normalized, eg. the lines of parsing.iter_doc: they are not normalized again. Default to False
 
     Yields
     --------
     code_short_name:str
 
     article_number:str
+
+    Raises
+    ------
+    ValueError:
+        pattern name is wrong
     """
-    article_pattern = switch_pattern(selected_shortcodes, pattern_format)
-    # normalisation des espaces dans le texte
-    full_text = re.sub(r"\r|\n|\t|\f|\xa0", " ", " ".join(full_text))
-    for i, match in enumerate(re.finditer(article_pattern, full_text)):
-        needle = match.groupdict()
-        qualified_needle = {
-            key: value for key, value in needle.items() if value is not None
-        }
-        msg = f"#{i+1}\t{qualified_needle}"
-        # logging.debug(msg)
-        # get the code shortname based on regex group name <code>
-        code = [k for k in qualified_needle.keys() if k not in ["ref", "art"]][0]
-
-        ref = match.group("ref").strip()
-        # split multiple articles of a same code example: Article 22, 23 et 24 du Code
-        refs = [
-            n
-            for n in re.split(r"(\set\s|,\s|\sdu)", ref)
-            if n not in [" et ", ", ", " du", " ", ""]
-        ]
-        # normalize articles to remove dots, spaces, caret and 'alinea'
-        refs = [
-            "-".join(
-                [
-                    r
-                    for r in re.split(r"\s|\.|-", ref)
-                    if r not in [" ", "", "al", "alinea", "alinéa"]
-                ]
-            )
-            for ref in refs
-        ]
-        # clean caracters for everything but numbers and (L|A|R|D) and caret
-        for ref in refs:
-            # accepted caracters for article
-            # exemple: 1224 du => Non 298 al 32 => Non R-288 => oui A-24-14=> oui
-            ref = "".join(
-                [n for n in ref if (n.isdigit() or n in ["L", "A", "R", "D", "-"])]
-            )
-            if ref.endswith("-"):
-                ref = ref[:-1]
-            # remove caret separating article nb between first letter
-            # exemple: L-248-1 = > L248-1
-            special_ref = ref.split("-", 1)
-            if special_ref[0] in ["L", "A", "R", "D"]:
-                yield(code, "".join(special_ref))
-                
-            else:
-                yield(code, ref)
\ No newline at end of file
+    check_pattern_format(pattern_format)
+    yield from get_matcher(selected_shortcodes, max_span, pattern_format).iter_articles(full_text, normalized)
+
+
+def split_chunks(text, chunk_size, context, tail):
+    """
+    Découper le texte en morceaux qui se chevauchent
+
+    Arguments
+    ---------
+    text: str
+        the normalized text
+    chunk_size: int
+        nombre de caractères attribués à chaque morceau
+    context: int
+        nombre de caractères repris avant le morceau pour retrouver les mots-clés en attente d'un code
+    tail: int
+        nombre de caractères repris après le morceau pour compléter une citation commencée dans le morceau
+    Returns
+    -------
+    chunks: list
+        [(chunk_text, own_start, own_end)]: chaque citation appartient au morceau dont la plage
+        [own_start, own_end[ (relative à chunk_text) contient son début
+    """
+    chunks = []
+    for start in range(0, len(text), chunk_size):
+        end = min(start + chunk_size, len(text))
+        chunk_start = max(0, start - context)
+        chunks.append((text[chunk_start : end + tail], start - chunk_start, end - chunk_start))
+    return chunks
+
+
+def match_chunk(chunk_text, own_start, own_end, selected_codes, max_span, pattern_format="article_code", backend=None):
+    """
+    Les citations d'un morceau de texte (see split_chunks), exécuté dans un processus du pool
+
+    Returns
+    -------
+    articles: list
+        [(code_short_name, article_number)] des citations qui commencent dans [own_start, own_end[
+    """
+    matcher = get_matcher(selected_codes, max_span, pattern_format, backend)
+    articles = []
+    for code, start, _end, ref in matcher.reference_spans([chunk_text], normalized=True):
+        if own_start <= start < own_end:
+            articles.extend((code, article_nb) for article_nb in normalize_references(ref))
+    return articles
+
+
+def get_matching_result_item_parallel(
+    full_text, selected_shortcodes=[], pattern_format="article_code", max_span=MAX_REF_SPAN, workers=None, chunk_size=PARALLEL_CHUNK_SIZE, executor=None
+):
+    """
+    Comme get_matching_result_item, en répartissant le texte entre plusieurs processus
+
+    Arguments
+    -----------
+    full_text: array
+        the paragraphs of the document
+    selected_shortcodes: array
+        see get_matching_result_item
+    pattern_format: str
+        see get_matching_result_item
+    max_span: int
+        maximum number of characters between the article keyword and the code. Default to MAX_REF_SPAN
+    workers: int
+        nombre de processus. Default to None (os.cpu_count())
+    chunk_size: int
+        nombre de caractères par morceau. Default to PARALLEL_CHUNK_SIZE
+    executor: concurrent.futures.Executor
+        un pool existant, à réutiliser d'un document à l'autre. Default to None (un pool est créé pour le document)
+
+    Yields
+    --------
+    code_short_name:str
+
+    article_number:str
+
+    Raises
+    ------
+    ValueError:
+        pattern name is wrong or max_span is None
+
+    Notes
+    -----
+    Chaque morceau reprend les max_span caractères (et la longueur de trois jetons) qui le précèdent et qui le suivent:
+    une citation est retenue par le seul morceau où elle commence. Les résultats sont identiques, et dans
+    le même ordre, que ceux de get_matching_result_item.
+    """
+    check_pattern_format(pattern_format)
+    if max_span is None:
+        raise ValueError("The parallel matching needs a bounded reference span (max_span)")
+    matcher = get_matcher(selected_shortcodes, max_span, pattern_format)
+    # a citation ends at most max_span characters and three tokens (code, keyword and the next token) after its start,
+    # and depends on as much text before it
+    margin = max_span + 3 * max(map(len, matcher.lookup)) + CODE_ARTICLE_GAP_MAX
+    text = normalize_text(" ".join(full_text))
+    chunks = split_chunks(text, chunk_size, margin, margin)
+    if len(chunks) < 2:
+        yield from matcher.iter_articles([text], normalized=True)
+        return
+    arguments = [chunk + (matcher.codes, max_span, pattern_format, matcher.backend) for chunk in chunks]
+    pool = executor if executor is not None else ProcessPoolExecutor(workers)
+    try:
+        # map keeps the order of the chunks, hence the document order
+        for articles in pool.map(match_chunk, *zip(*arguments)):
+            yield from articles
+    finally:
+        if executor is None:
+            pool.shutdown(cancel_futures=True)
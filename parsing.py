@@ -4,66 +4,643 @@
 """
 Parsing file module:
 
-Load document with the accepted extensions and transform into list of text
+Load document with the accepted extensions and transform into list of text (parse_doc)
+or into lines produced page by page while the document is read (iter_doc)
 
-"""
+Le document est un chemin, son contenu (bytes) ou un fichier ouvert: un fichier déposé est lu directement en mémoire,
+sans être écrit sur le disque.
+
+Les bibliothèques PDF (PyPDF2, pdfminer.six) ne sont importées qu'à l'ouverture du premier PDF: les modules qui
+n'utilisent que normalize_text (matching, l'application web au démarrage) ne les chargent pas.
+
+Chaque paragraphe est normalisé une seule fois à la lecture (normalize_text): le texte produit alimente directement
+le module matching.
 
+"""
 
-import docx
-from PyPDF2 import PdfReader
-from odf import text, teletype
-from odf.opendocument import load
+import io
+import os
+import re
+import signal
+import threading
+import zipfile
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import ExitStack, contextmanager
+from itertools import repeat
+from xml.etree import ElementTree
 
 ACCEPTED_EXTENSIONS = ("odt", "pdf", "docx", "doc")
 
+# à partir de ce nombre de pages, l'extraction d'un PDF est répartie entre plusieurs processus (see iter_pdf_pages).
+# Seulement dans le processus courant: un processus d'analyse (sandbox.PARSER_WORKERS > 0) extrait les pages une à une
+PARALLEL_PAGE_THRESHOLD = 40
+# nombre de pages consécutives extraites par un processus à chaque tâche
+PARALLEL_PAGE_RANGE = 8
+# bibliothèque d'extraction du texte des PDF, see PDF_BACKENDS: pdfminer.six est plus lent que PyPDF2
+# mais retrouve plus de citations (see benchmarks/bench_pdf_backends.py)
+DEFAULT_PDF_BACKEND = os.getenv("CODEISLOW_PDF_BACKEND", "pdfminer")
+# temps maximal d'extraction d'une page (en secondes): au-delà, la page est confiée à l'autre bibliothèque
+PDF_PAGE_BUDGET = 10.0
+# see iter_pdf_pages: pages qu'aucune bibliothèque n'a pu extraire
+SKIPPED_PAGES = "skipped"
+
+# DOCX: les parties du fichier lues par iter_docx_paragraphs et la localisation de leurs paragraphes
+WORD_NAMESPACE = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+DOCX_PARTS = (("word/document.xml", "body"), ("word/footnotes.xml", "footnote"), ("word/endnotes.xml", "endnote"))
+# les éléments d'un run qui produisent du texte (w:delText, le texte supprimé en mode révision, est ignoré)
+DOCX_RUN_TEXT = {
+    WORD_NAMESPACE + "tab": "\t",
+    WORD_NAMESPACE + "br": "\n",
+    WORD_NAMESPACE + "cr": "\n",
+    WORD_NAMESPACE + "noBreakHyphen": "-",
+    WORD_NAMESPACE + "softHyphen": "",
+}
+
+# ODT: content.xml, lu par iter_odt_paragraphs
+TEXT_NAMESPACE = "{urn:oasis:names:tc:opendocument:xmlns:text:1.0}"
+TABLE_NAMESPACE = "{urn:oasis:names:tc:opendocument:xmlns:table:1.0}"
+# les éléments vides qui produisent du texte (text:s est complété par son attribut text:c)
+ODT_TEXT = {
+    TEXT_NAMESPACE + "s": " ",
+    TEXT_NAMESPACE + "tab": "\t",
+    TEXT_NAMESPACE + "line-break": "\n",
+}
 
-def parse_doc(file_path):
+# caractères remplacés à la lecture du document: espaces et sauts de ligne, caractères invisibles,
+# ligatures (extraction PDF), apostrophes et traits d'union typographiques
+NORMALIZATION = {
+    # espaces, sauts de ligne et de page => espace simple
+    **dict.fromkeys("\t\n\x0b\x0c\r\x85\xa0\u1680\u2028\u2029\u202f\u205f\u3000", " "),
+    **dict.fromkeys(map(chr, range(0x2000, 0x200B)), " "),
+    # césure conditionnelle, espaces sans chasse, marque d'ordre des octets => supprimés
+    **dict.fromkeys("\xad\u200b\u200c\u200d\u2060\ufeff", ""),
+    "\ufb00": "ff",
+    "\ufb01": "fi",
+    "\ufb02": "fl",
+    "\ufb03": "ffi",
+    "\ufb04": "ffl",
+    "\ufb05": "st",
+    "\ufb06": "st",
+    **dict.fromkeys("\u2018\u2019\u02bc\u2032", "'"),
+    **dict.fromkeys("\u2010\u2011", "-"),
+}
+NORMALIZATION_TABLE = str.maketrans(NORMALIZATION)
+# str.translate is slower than a search on the (mostly clean) paragraphs: only translate the ones which need it
+NORMALIZATION_REGEX = re.compile("[{}]".format("".join(NORMALIZATION)))
+
+
+def normalize_text(text):
+    """
+    Normaliser un paragraphe: espaces, caractères invisibles, ligatures et apostrophes typographiques
+
+    Arguments
+    ---------
+    text: str
+        un paragraphe du document
+    Returns
+    -------
+    text: str
+        le paragraphe normalisé (normalize_text(normalize_text(text)) == normalize_text(text))
+    """
+    if NORMALIZATION_REGEX.search(text) is None:
+        return text
+    return text.translate(NORMALIZATION_TABLE)
+
+
+def check_extension(file_path, doc_ext=None):
     """
-    Parcourir le document pour en extraire le texte 
     Arguments
     ----------
-    file_path: str 
-        absolute filepath of the document
+    file_path: str
+        filepath of the document
+    doc_ext: str
+        l'extension du document (sans le point). Default to None (lue dans file_path)
     Returns
     ----------
-    full_text: array 
-        a list of sentences.
+    doc_ext: str
+        one of ACCEPTED_EXTENSIONS
     Raises
     ----------
-    Exception: 
+    ValueError:
         Extension incorrecte. Les types de fichiers supportés sont odt, doc, docx, pdf
-    FileNotFoundError: 
-        File has not been found. File_path must be incorrect
     """
-    
-    doc_name, doc_ext = file_path.split("/")[-1].split(".")
+    if doc_ext is None:
+        doc_name, doc_ext = file_path.split("/")[-1].split(".")
     if doc_ext not in ACCEPTED_EXTENSIONS:
         raise ValueError(
             "Extension incorrecte: les fichiers acceptés terminent par *.odt, *.docx, *.doc,  *.pdf"
         )
+    return doc_ext
 
-    full_text = []
-    if doc_ext == "pdf":
-        with open(file_path, "rb") as f:
-            reader = PdfReader(f)
 
-            for i in range(len(reader.pages)):
-                page = reader.pages[i]
-                full_text.extend((page.extract_text()).split("\n"))
+def read_document(document):
+    """Le contenu d'un fichier ouvert (bytes), lu depuis sa position courante. Un chemin ou des bytes sont inchangés"""
+    if hasattr(document, "read"):
+        return document.read()
+    return document
+
+
+def open_document(document):
+    """Ouvrir le document en lecture binaire: chaque appel donne un fichier (et une position) indépendant"""
+    if isinstance(document, bytes):
+        return io.BytesIO(document)
+    return open(document, "rb")
+
+
+def iter_doc(file_path, workers=None, pdf_backend=None, report=None, doc_ext=None):
+    """
+    Parcourir le document page par page: les lignes sont produites dès que leur page a été lue
+
+    Arguments
+    ----------
+    file_path: str, bytes or file object
+        absolute filepath of the document, ou son contenu: des bytes ou un fichier ouvert en lecture binaire
+    workers: int
+        nombre de processus pour extraire le texte d'un PDF d'au moins PARALLEL_PAGE_THRESHOLD pages,
+        see iter_pdf_pages. Default to None (os.cpu_count())
+    pdf_backend: str
+        la bibliothèque d'extraction essayée en premier pour chaque page d'un PDF, see get_pdf_backends. Default to None
+    report: dict
+        les pages extraites par chaque bibliothèque et les pages abandonnées d'un PDF, see iter_pdf_pages. Default to None
+    doc_ext: str
+        l'extension du document, obligatoire si file_path n'est pas un chemin eg. "pdf". Default to None
+    Returns
+    ----------
+    lines: generator
+        des couples (page_nb, line): le numéro de page (à partir de 0, toujours 0 pour les formats odt et docx)
+        et une ligne non vide, normalisée (see normalize_text). Le fichier est supprimé une fois lu
+        (file_path est un chemin).
+    Raises
+    ----------
+    ValueError:
+        Extension incorrecte. Les types de fichiers supportés sont odt, doc, docx, pdf
+    FileNotFoundError:
+        File has not been found (à la lecture de la première ligne)
+
+    Notes
+    ----------
+    Seule la page en cours est conservée en mémoire: le matcher peut traiter la première page d'un PDF
+    pendant l'extraction des suivantes. Le fichier est aussi supprimé si la lecture est interrompue (close).
+    Un fichier ouvert est lu en entier à l'appel: les bibliothèques PDF et les processus d'extraction
+    relisent chacun le contenu de leur côté.
+    """
+    document, doc_ext = prepare_document(file_path, doc_ext)
+    return iter_doc_lines(document, doc_ext, workers, pdf_backend, report)
+
+
+def prepare_document(file_path, doc_ext=None):
+    """
+    Le document à lire et son extension, see iter_doc
+
+    Returns
+    ----------
+    document: str or bytes
+        le chemin du document, ou son contenu (un fichier ouvert est lu en entier)
+    doc_ext: str
+        one of ACCEPTED_EXTENSIONS
+    Raises
+    ----------
+    ValueError:
+        Extension incorrecte, ou absente pour un document qui n'est pas un chemin
+    """
+    if isinstance(file_path, str):
+        return file_path, check_extension(file_path, doc_ext)
+    if doc_ext is None:
+        raise ValueError("doc_ext is required to read a document which is not a file path")
+    return read_document(file_path), check_extension(None, doc_ext)
+
+
+def iter_doc_lines(file_path, doc_ext, workers=None, pdf_backend=None, report=None):
+    pages = iter_normalized_pages(file_path, doc_ext, workers, pdf_backend, report)
+    try:
+        for page_nb, lines in pages:
+            for line in lines:
+                yield page_nb, line
+    finally:
+        pages.close()
+
+
+def iter_normalized_pages(file_path, doc_ext, workers=None, pdf_backend=None, report=None):
+    """Les lignes non vides et normalisées du document, page par page. Le fichier (un chemin) est supprimé une fois lu"""
+    pages = iter_doc_pages(file_path, doc_ext, workers, pdf_backend, report)
+    try:
+        for page_nb, lines in pages:
+            yield page_nb, [line for line in map(normalize_text, lines) if line.strip()]
+    finally:
+        # stop the extraction workers before removing the file they read
+        pages.close()
+        if isinstance(file_path, str) and os.path.exists(file_path):
+            os.remove(file_path)
+
+
+def iter_doc_pages(file_path, doc_ext, workers=None, pdf_backend=None, report=None):
+    """Les lignes brutes du document, page par page: des couples (page_nb, lines)"""
+    if doc_ext == "pdf":
+        yield from iter_pdf_pages(file_path, workers, backend=pdf_backend, report=report)
 
     elif doc_ext == "odt":
-        with open(file_path, "rb") as f:
-            document = load(f)
-            paragraphs = document.getElementsByType(text.P)
-            for i in range(len(paragraphs)):
-                full_text.append((teletype.extractText(paragraphs[i])))
+        for _location, paragraph in iter_odt_paragraphs(file_path):
+            yield 0, [paragraph]
     else:
         # if doc_ext in ["docx", "doc"]:
-        with open(file_path, "rb") as f:
-            document = docx.Document(f)
-            paragraphs = document.paragraphs
-            for i in range(len(paragraphs)):
-                full_text.append((paragraphs[i].text))
-    full_text = [n for n in full_text if n not in ["\n", "", " "]]
-    os.remove(file_path)
-    return full_text
\ No newline at end of file
+        for _location, paragraph in iter_docx_paragraphs(file_path):
+            yield 0, [paragraph]
+
+
+def get_docx_paragraph_text(paragraph):
+    """Le texte d'un paragraphe w:p: les runs, y compris ceux des liens et des insertions, dans l'ordre du document"""
+    chunks = []
+    for run in paragraph.iter(WORD_NAMESPACE + "r"):
+        for child in run:
+            if child.tag == WORD_NAMESPACE + "t":
+                chunks.append(child.text or "")
+            elif child.tag in DOCX_RUN_TEXT:
+                chunks.append(DOCX_RUN_TEXT[child.tag])
+    return "".join(chunks)
+
+
+def append_odt_text(element, chunks):
+    """Ajouter à `chunks` le texte de l'élément puis celui qui le suit (tail), sans le texte des notes"""
+    if element.tag in ODT_TEXT:
+        chunks.append(ODT_TEXT[element.tag] * int(element.get(TEXT_NAMESPACE + "c", 1)))
+    elif element.tag != TEXT_NAMESPACE + "note":
+        # the paragraphs of a note are read on their own (see iter_odt_paragraphs)
+        chunks.append(element.text or "")
+        for child in element:
+            append_odt_text(child, chunks)
+    chunks.append(element.tail or "")
+
+
+def get_odt_paragraph_text(paragraph):
+    """Le texte d'un paragraphe text:p ou d'un titre text:h: les spans, liens et espaces, dans l'ordre du document"""
+    chunks = [paragraph.text or ""]
+    for child in paragraph:
+        append_odt_text(child, chunks)
+    return "".join(chunks)
+
+
+def iter_odt_paragraphs(file_path):
+    """
+    Parcourir les paragraphes d'un ODT sans construire le document: paragraphes, titres, tableaux et notes
+
+    Arguments
+    ----------
+    file_path: str or bytes
+        absolute filepath of the document, or its content
+    Yields
+    ----------
+    location: str
+        "body", "heading", "table" (un paragraphe d'un tableau), "footnote" ou "endnote"
+    text: str
+        le texte brut du paragraphe
+
+    Notes
+    ----------
+    content.xml est lu au fil de l'eau (ElementTree.iterparse) et chaque paragraphe est retiré de l'arbre une fois lu.
+    Une note est produite avant le paragraphe qui l'appelle, dont le texte ne la reprend pas.
+    """
+    with open_document(file_path) as document, zipfile.ZipFile(document) as archive, archive.open("content.xml") as f:
+        parents = []
+        tables = 0
+        notes = []
+        for event, element in ElementTree.iterparse(f, events=("start", "end")):
+            if event == "start":
+                parents.append(element)
+                if element.tag == TABLE_NAMESPACE + "table":
+                    tables += 1
+                elif element.tag == TEXT_NAMESPACE + "note":
+                    notes.append(element.get(TEXT_NAMESPACE + "note-class", "footnote"))
+                continue
+            parents.pop()
+            if element.tag == TABLE_NAMESPACE + "table":
+                tables -= 1
+            elif element.tag == TEXT_NAMESPACE + "note":
+                notes.pop()
+            elif element.tag in (TEXT_NAMESPACE + "p", TEXT_NAMESPACE + "h"):
+                if notes:
+                    # kept in its note, which is dropped with the paragraph that contains it
+                    yield notes[-1], get_odt_paragraph_text(element)
+                    continue
+                if tables:
+                    location = "table"
+                else:
+                    location = "heading" if element.tag == TEXT_NAMESPACE + "h" else "body"
+                yield location, get_odt_paragraph_text(element)
+                parents[-1].remove(element)
+
+
+def iter_docx_paragraphs(file_path):
+    """
+    Parcourir les paragraphes d'un DOCX sans construire le document: corps du texte, tableaux, notes de bas de page et de fin
+
+    Arguments
+    ----------
+    file_path: str or bytes
+        absolute filepath of the document, or its content
+    Yields
+    ----------
+    location: str
+        "body", "table" (un tableau du corps du texte), "footnote" ou "endnote"
+    text: str
+        le texte brut du paragraphe
+
+    Notes
+    ----------
+    Les parties XML sont lues au fil de l'eau (ElementTree.iterparse) et chaque paragraphe est retiré de l'arbre
+    une fois lu: la mémoire utilisée ne dépend pas de la taille du document. Les notes suivent le corps du texte.
+    """
+    with open_document(file_path) as document, zipfile.ZipFile(document) as archive:
+        names = set(archive.namelist())
+        for part, location in DOCX_PARTS:
+            if part not in names:
+                continue
+            with archive.open(part) as f:
+                parents = []
+                tables = 0
+                for event, element in ElementTree.iterparse(f, events=("start", "end")):
+                    if event == "start":
+                        parents.append(element)
+                        tables += element.tag == WORD_NAMESPACE + "tbl"
+                        continue
+                    parents.pop()
+                    if element.tag == WORD_NAMESPACE + "p":
+                        yield "table" if tables and location == "body" else location, get_docx_paragraph_text(element)
+                    elif element.tag == WORD_NAMESPACE + "tbl":
+                        tables -= 1
+                    else:
+                        continue
+                    # a paragraph nested in a text box is removed before the paragraph which contains it is read
+                    if parents:
+                        parents[-1].remove(element)
+
+
+class PyPDF2Pages:
+    """Les pages d'un PDF lues par PyPDF2: rapide, mais découpe parfois les mots eg. "V oir" pour "Voir"
+    """
+
+    def __init__(self, f):
+        from PyPDF2 import PdfReader
+
+        self.reader = PdfReader(f)
+
+    def __len__(self):
+        return len(self.reader.pages)
+
+    def extract_text(self, page_nb):
+        return self.reader.pages[page_nb].extract_text()
+
+
+class PdfminerPages:
+    """Les pages d'un PDF lues par pdfminer.six: plus lent, mais respecte mieux la mise en page"""
+
+    def __init__(self, f):
+        from pdfminer.layout import LAParams
+        from pdfminer.pdfinterp import PDFResourceManager
+        from pdfminer.pdfpage import PDFPage
+
+        self.pages = list(PDFPage.get_pages(f))
+        self.resource_manager = PDFResourceManager()
+        self.laparams = LAParams()
+
+    def __len__(self):
+        return len(self.pages)
+
+    def extract_text(self, page_nb):
+        from pdfminer.converter import TextConverter
+        from pdfminer.pdfinterp import PDFPageInterpreter
+
+        output = io.StringIO()
+        device = TextConverter(self.resource_manager, output, laparams=self.laparams)
+        try:
+            PDFPageInterpreter(self.resource_manager, device).process_page(self.pages[page_nb])
+        finally:
+            device.close()
+        return output.getvalue()
+
+
+# l'interface d'une bibliothèque: construite sur le fichier ouvert, len() et extract_text(page_nb)
+PDF_BACKENDS = {"pypdf2": PyPDF2Pages, "pdfminer": PdfminerPages}
+
+
+def get_pdf_backends(backend=None):
+    """
+    L'ordre dans lequel les bibliothèques sont essayées pour chaque page
+
+    Arguments
+    ---------
+    backend: str
+        "pypdf2" ou "pdfminer". Default to None (DEFAULT_PDF_BACKEND, see the CODEISLOW_PDF_BACKEND environment variable)
+    Returns
+    -------
+    backends: tuple
+        la bibliothèque demandée, puis les autres bibliothèques de PDF_BACKENDS
+    Raises
+    ------
+    ValueError:
+        backend is not one of PDF_BACKENDS
+    """
+    backend = backend or DEFAULT_PDF_BACKEND
+    if backend not in PDF_BACKENDS:
+        raise ValueError(f"Wrong PDF backend: choose between {tuple(PDF_BACKENDS)}")
+    return (backend,) + tuple(name for name in PDF_BACKENDS if name != backend)
+
+
+class PageTimeout(Exception):
+    """L'extraction d'une page a dépassé PDF_PAGE_BUDGET"""
+
+
+@contextmanager
+def time_limit(budget):
+    """
+    Interrompre le bloc (PageTimeout) après `budget` secondes
+
+    Notes
+    -----
+    L'interruption repose sur SIGALRM: elle n'est possible que dans le thread principal d'un système POSIX
+    (le serveur, la ligne de commande et les processus du pool d'extraction). Ailleurs, le bloc n'est pas limité.
+    """
+    if budget is None or not hasattr(signal, "setitimer") or threading.current_thread() is not threading.main_thread():
+        yield
+        return
+
+    def on_timeout(_signum, _frame):
+        raise PageTimeout(f"page extraction took more than {budget}s")
+
+    previous = signal.signal(signal.SIGALRM, on_timeout)
+    signal.setitimer(signal.ITIMER_REAL, budget)
+    try:
+        yield
+    finally:
+        signal.setitimer(signal.ITIMER_REAL, 0)
+        signal.signal(signal.SIGALRM, previous)
+
+
+class PdfDocument:
+    """
+    Un PDF ouvert par une ou plusieurs bibliothèques: chaque page est extraite par la première qui y parvient
+
+    Arguments
+    ---------
+    file_path: str or bytes
+        absolute filepath of the PDF, or its content
+    backend: str
+        la bibliothèque essayée en premier, see get_pdf_backends. Default to None
+    budget: float
+        temps maximal d'extraction d'une page par chaque bibliothèque, see PDF_PAGE_BUDGET. None for no limit
+
+    Notes
+    -----
+    Les autres bibliothèques ne sont chargées qu'à la première page qui leur est confiée,
+    chacune avec son propre descripteur de fichier. Une bibliothèque qui ne parvient pas à ouvrir le document
+    (len) est écartée pour toutes les pages.
+    """
+
+    def __init__(self, file_path, backend=None, budget=PDF_PAGE_BUDGET):
+        self.file_path = file_path
+        self.backends = get_pdf_backends(backend)
+        self.budget = budget
+        self.files = ExitStack()
+        self.readers = {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.files.close()
+
+    def get_reader(self, backend):
+        if backend not in self.readers:
+            self.readers[backend] = PDF_BACKENDS[backend](self.files.enter_context(open_document(self.file_path)))
+        return self.readers[backend]
+
+    def __len__(self):
+        """Le nombre de pages, lu par la première bibliothèque qui parvient à ouvrir le document"""
+        for backend in self.backends:
+            try:
+                return len(self.get_reader(backend))
+            except Exception:
+                # a document the library cannot open at all goes to the next one, which extracts every page
+                if backend == self.backends[-1]:
+                    raise
+                self.backends = self.backends[1:]
+
+    def extract_page(self, page_nb):
+        """
+        Returns
+        -------
+        lines: list
+            les lignes brutes de la page, vide si la page a été abandonnée
+        backend: str
+            la bibliothèque qui a extrait la page, ou SKIPPED_PAGES
+        """
+        for backend in self.backends:
+            try:
+                with time_limit(self.budget):
+                    return self.get_reader(backend).extract_text(page_nb).split("\n"), backend
+            except Exception:
+                # a page the library cannot read (or not in time) goes to the next one
+                continue
+        return [], SKIPPED_PAGES
+
+
+def extract_pdf_pages(file_path, start, stop, backend=None, budget=PDF_PAGE_BUDGET):
+    """
+    Extraire le texte des pages [start, stop[ d'un PDF, exécuté dans un processus du pool
+
+    Returns
+    -------
+    pages: list
+        [(lines, backend), ...] see PdfDocument.extract_page. Chaque processus ouvre le fichier de son côté.
+    """
+    with PdfDocument(file_path, backend, budget) as document:
+        return [document.extract_page(page_nb) for page_nb in range(start, stop)]
+
+
+def iter_pdf_pages(
+    file_path, workers=None, page_range=PARALLEL_PAGE_RANGE, threshold=PARALLEL_PAGE_THRESHOLD, executor=None,
+    backend=None, budget=PDF_PAGE_BUDGET, report=None
+):
+    """
+    Les lignes brutes d'un PDF, page par page, extraites par un ou plusieurs processus
+
+    Arguments
+    ----------
+    file_path: str or bytes
+        absolute filepath of the PDF, or its content
+    workers: int
+        nombre de processus. Default to None (os.cpu_count())
+    page_range: int
+        nombre de pages consécutives par tâche. Default to PARALLEL_PAGE_RANGE
+    threshold: int
+        nombre de pages en dessous duquel le texte est extrait dans le processus courant. Default to PARALLEL_PAGE_THRESHOLD
+    executor: concurrent.futures.Executor
+        un pool existant, à réutiliser d'un document à l'autre. Default to None (un pool est créé pour le document)
+    backend: str
+        la bibliothèque essayée en premier pour chaque page, see get_pdf_backends. Default to None
+    budget: float
+        see PdfDocument. Default to PDF_PAGE_BUDGET
+    report: dict
+        complété au fil de l'extraction: {backend: [page_nb, ...]} la bibliothèque qui a extrait chaque page,
+        et {SKIPPED_PAGES: [page_nb, ...]} les pages abandonnées. Default to None
+    Yields
+    ----------
+    page_nb: int
+        le numéro de la page, à partir de 0
+    lines: list
+        les lignes brutes de la page (vide pour une page abandonnée)
+
+    Notes
+    ----------
+    Les pages sont produites dans l'ordre du document, dès que la tâche qui les contient est terminée:
+    la lecture commence avant la fin de l'extraction des dernières pages.
+    """
+    report = {} if report is None else report
+    with PdfDocument(file_path, backend, budget) as document:
+        nb_pages = len(document)
+        if executor is None and (workers or os.cpu_count() or 1) < 2 or nb_pages < threshold:
+            for page_nb in range(nb_pages):
+                lines, page_backend = document.extract_page(page_nb)
+                report.setdefault(page_backend, []).append(page_nb)
+                yield page_nb, lines
+            return
+    starts = range(0, nb_pages, page_range)
+    stops = [min(start + page_range, nb_pages) for start in starts]
+    pool = executor if executor is not None else ProcessPoolExecutor(workers)
+    try:
+        # map keeps the order of the page ranges, hence the document order
+        page_nb = 0
+        for pages in pool.map(extract_pdf_pages, repeat(file_path), starts, stops, repeat(backend), repeat(budget)):
+            for lines, page_backend in pages:
+                report.setdefault(page_backend, []).append(page_nb)
+                yield page_nb, lines
+                page_nb += 1
+    finally:
+        if executor is None:
+            pool.shutdown(cancel_futures=True)
+
+
+def parse_doc(file_path, doc_ext=None):
+    """
+    Parcourir le document pour en extraire le texte 
+    Arguments
+    ----------
+    file_path: str, bytes or file object
+        absolute filepath of the document, ou son contenu (see iter_doc)
+    doc_ext: str
+        l'extension du document, obligatoire si file_path n'est pas un chemin eg. "pdf". Default to None
+    Returns
+    ----------
+    full_text: array 
+        a list of sentences.
+    Raises
+    ----------
+    Exception: 
+        Extension incorrecte. Les types de fichiers supportés sont odt, doc, docx, pdf
+    FileNotFoundError: 
+        File has not been found. File_path must be incorrect
+
+    Notes
+    ----------
+    Le texte complet est construit en mémoire: iter_doc produit les mêmes lignes au fil de la lecture.
+    """
+    return [line for _page_nb, line in iter_doc(file_path, doc_ext=doc_ext)]
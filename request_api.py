@@ -7,20 +7,37 @@ Module pour requeter l'API
 - get_article_id
 - get_article_content
 - get_article: module complet avec le status de l'article
+- get_articles: status d'un lot d'articles calculé en une seule passe
 """
 
 import requests
 import time
 from dotenv import load_dotenv
+from caching import TTLCache
 from code_references import get_code_full_name_from_short_code
-from check_validity import convert_epoch_to_datetime, convert_datetime_to_str, get_validity_status
+from check_validity import convert_epoch_to_datetime, convert_datetime_to_str, convert_epochs_to_str, get_validity_status, get_validity_status_batch
 
 API_ROOT_URL = "https://sandbox-api.piste.gouv.fr/dila/legifrance-beta/lf-engine-app/"
 # API_ROOT_URL =  "https://api.piste.gouv.fr/dila/legifrance-beta/lf-engine-app/",
 
+# le jeton Legifrance est valable une heure: on le renouvelle un peu avant son expiration
+TOKEN_CACHE = TTLCache(maxsize=8, ttl=50 * 60)
+# données brutes des articles (identifiant, texte, dates de version) partagées entre les analyses
+ARTICLE_CACHE = TTLCache(maxsize=20000, ttl=24 * 3600)
+# délai maximal (secondes) d'une requête à Legifrance, à défaut d'un délai plus court (see get_article_record)
+API_TIMEOUT = 30
 
 
-def get_legifrance_auth(client_id, client_secret):
+class UnauthorizedError(Exception):
+    """Legifrance a refusé le jeton (401): expiré ou révoqué avant la fin de sa durée de validité en cache"""
+
+
+class MissingCredentialsError(ValueError):
+    """Les identifiants de l'API Legifrance (API_KEY, API_SECRET) ne sont pas configurés sur le serveur"""
+
+
+
+def get_legifrance_auth(client_id, client_secret, timeout=API_TIMEOUT):
     """
     Get authorization token from LEGIFRANCE API
 
@@ -30,6 +47,8 @@ def get_legifrance_auth(client_id, client_secret):
         OAUTH CLIENT key provided by API
     client_secret: str
         OAUTH SECRET key provided by API
+    timeout: float
+        délai maximal de la requête (secondes). Default to API_TIMEOUT
 
     Returns
     ---------
@@ -38,7 +57,7 @@ def get_legifrance_auth(client_id, client_secret):
 
     Raise
     ------
-    Exception: 
+    MissingCredentialsError:
         No credentials have been set. Client_id or client_secret is None
     Exception: 
         Invalid credentials. Request to authentication server failed with 400 or 401 error
@@ -49,7 +68,7 @@ def get_legifrance_auth(client_id, client_secret):
 
     if client_id is None or client_secret is None:
         # return HTTPError(401, "No credential have been set")
-        raise ValueError(
+        raise MissingCredentialsError(
             "No credential: client_id or/and client_secret are not set. \nPlease register your API at https://developer.aife.economie.gouv.fr/"
         )
     session = requests.Session()
@@ -62,6 +81,7 @@ def get_legifrance_auth(client_id, client_secret):
                 "client_secret": client_secret,
                 "scope": "openid",
             },
+            timeout=timeout,
         )
 
         if res.status_code in [400, 401]:
@@ -72,7 +92,32 @@ def get_legifrance_auth(client_id, client_secret):
     return {"Authorization": f"Bearer {access_token}"}
 
 
-def get_article_uid(short_code_name, article_number, headers):
+def get_cached_legifrance_auth(client_id, client_secret, timeout=API_TIMEOUT):
+    """
+    Get authorization token from TOKEN_CACHE or from LEGIFRANCE API if expired
+
+    Arguments
+    ---------
+    client_id: str
+        OAUTH CLIENT key provided by API
+    client_secret: str
+        OAUTH SECRET key provided by API
+    timeout: float
+        see get_legifrance_auth
+
+    Returns
+    ---------
+    authorization_header: dict
+        a header composed of a json dict with access_token
+    """
+    headers = TOKEN_CACHE.get((client_id, client_secret))
+    if headers is None:
+        headers = get_legifrance_auth(client_id, client_secret, timeout)
+        TOKEN_CACHE.set((client_id, client_secret), headers)
+    return headers
+
+
+def get_article_uid(short_code_name, article_number, headers, timeout=API_TIMEOUT):
     """
     GET the article uid given by [Legifrance API](https://developer.aife.economie.gouv.fr/index.php?option=com_apiportal&view=apitester&usage=api&apitab=tests&apiName=L%C3%A9gifrance+Beta&apiId=426cf3c0-1c6d-46ba-a8b0-f79289086ed5&managerId=2&type=rest&apiVersion=1.6.2.5&Itemid=402&swaggerVersion=2.0&lang=fr)
 
@@ -82,6 +127,8 @@ def get_article_uid(short_code_name, article_number, headers):
         Nom du code de droit français (version courte)
     article_number: str 
         Référence de l'article mentionné (version normalisée eg. L25-67)
+    timeout: float
+        délai maximal de la requête (secondes). Default to API_TIMEOUT
 
     Returns
     --------
@@ -91,6 +138,8 @@ def get_article_uid(short_code_name, article_number, headers):
     ------
     ValueError:
         Le nom du code est incorrect
+    UnauthorizedError:
+        Le jeton a été refusé (401)
     Exception:
         La requete a échoué response.status_code [400-500] 
     """
@@ -130,8 +179,10 @@ def get_article_uid(short_code_name, article_number, headers):
     }
     with session as s:
         response = s.post(
-            "/".join([API_ROOT_URL, "search"]), headers=headers, json=data
+            "/".join([API_ROOT_URL, "search"]), headers=headers, json=data, timeout=timeout
         )
+        if response.status_code == 401:
+            raise UnauthorizedError(f"Error {response.status_code}: {response.reason}")
         if response.status_code > 399:
             # print(response)
             # return None
@@ -153,7 +204,7 @@ def get_article_uid(short_code_name, article_number, headers):
     
 
 
-def get_article_content(article_id, headers):
+def get_article_content(article_id, headers, timeout=API_TIMEOUT):
     """
     GET article_content from LEGIFRANCE API using POST /consult/getArticle https://developer.aife.economie.gouv.fr/index.php?option=com_apiportal&view=apitester&usage=api&apitab=tests&apiName=L%C3%A9gifrance+Beta&apiId=426cf3c0-1c6d-46ba-a8b0-f79289086ed5&managerId=2&type=rest&apiVersion=1.6.2.5&Itemid=402&swaggerVersion=2.0&lang=fr
 
@@ -161,12 +212,16 @@ def get_article_content(article_id, headers):
     ----------
     article_id: str
         article uid eg. LEGIARTI000006307920
+    timeout: float
+        délai maximal de la requête (secondes). Default to API_TIMEOUT
     Returns
     -------
     article_content: dict
         a dictionnary with the full content of article
     Raise
     -------
+    UnauthorizedError
+        Le jeton a été refusé (401)
     Exception 
         response.status_code [400-500]
     """
@@ -178,8 +233,11 @@ def get_article_content(article_id, headers):
             "/".join([API_ROOT_URL, "consult", "getArticle"]),
             headers=headers,
             json=data,
+            timeout=timeout,
         )
 
+        if response.status_code == 401:
+            raise UnauthorizedError(f"Error {response.status_code}: {response.reason}")
         if response.status_code > 399:
             raise Exception(f"Error {response.status_code}: {response.reason}")
         article_content = response.json()
@@ -235,29 +293,127 @@ def get_article_content_by_id_and_article_nb(article_id, article_num, headers):
             "/".join([API_ROOT_URL, "consult", "getArticleWithIdandNum"]),
             headers=headers,
             json=data,
+            timeout=API_TIMEOUT,
         )
         if response.status_code > 399:
             raise Exception(f"Error {response.status_code}: {response.reason}")
         article_content = response.json()
     return article_content["article"]
 
-def get_article(short_code_name, article_number, client_id, client_secret, past_year_nb=3, future_year_nb=3):
+def get_article_record(short_code_name, article_number, client_id, client_secret, timeout=None):
+    """
+    Accéder aux données brutes de l'article depuis ARTICLE_CACHE ou l'API Legifrance
+
+    Arguments
+    ---------
+    short_code_name: str
+        Nom du code de droit français (version courte)
+    article_number: str
+        Numéro de l'article de loi normalisé ex. R25-67 L214 ou 2667-1-1
+    timeout: float
+        délai maximal de l'ensemble des requêtes à Legifrance (secondes). Default to None (API_TIMEOUT par requête)
+
+    Returns
+    --------
+    record: dict
+        un dictionnaire avec id, url, texte, dateDebut, dateFin (id est None si l'article n'a pas été trouvé)
+    stored_at: float
+        date (epoch) à laquelle l'article a été récupéré auprès de Legifrance
+
+    Raises
+    ------
+    ValueError:
+        Le nom du code est incorrect
+    requests.Timeout:
+        Legifrance n'a pas répondu dans le délai imparti
+
+    Notes
+    -----
+    Un jeton refusé (401) est retiré de TOKEN_CACHE: les requêtes sont reprises une fois avec un nouveau jeton.
+    """
+    key = (short_code_name, article_number)
+    entry = ARTICLE_CACHE.get_entry(key)
+    if entry is not None:
+        return entry
+    deadline = None if timeout is None else time.monotonic() + timeout
+
+    def remaining():
+        # the requests share the timeout: each one gets what the previous ones left
+        if deadline is None:
+            return API_TIMEOUT
+        return max(deadline - time.monotonic(), 0.001)
+
+    def request_record():
+        headers = get_cached_legifrance_auth(client_id, client_secret, timeout=remaining())
+        record = {"id": get_article_uid(short_code_name, article_number, headers=headers, timeout=remaining())}
+        if record["id"] is not None:
+            article_content = get_article_content(record["id"], headers=headers, timeout=remaining())
+            if article_content is None:
+                record["id"] = None
+            else:
+                for k in ["url", "texte", "dateDebut", "dateFin"]:
+                    record[k] = article_content[k]
+        return record
+
+    try:
+        record = request_record()
+    except UnauthorizedError:
+        # the cached token has expired or been revoked: ask for a new one
+        TOKEN_CACHE.pop((client_id, client_secret))
+        record = request_record()
+    stored_at = ARTICLE_CACHE.set(key, record)
+    return record, stored_at
+
+
+def get_article(short_code_name, article_number, client_id, client_secret, past_year_nb=3, future_year_nb=3, timeout=None):
     """
     Accéder aux informations simplifiée de l'article
 
     Arguments
     ---------
-    long_code_name: str
-        Nom du code de loi française dans sa version longue
+    short_code_name: str
+        Nom du code de droit français (version courte)
     article_number: str
         Numéro de l'article de loi normalisé ex. R25-67 L214 ou 2667-1-1
+    timeout: float
+        see get_article_record. Default to None
     Returns
     --------
     article: str
         Un dictionnaire json avec code (version courte), article (numéro), status, status_code, color, url, text, id, start_date, end_date, date_debut, date_fin 
     """
-    
-    article = {
+    record, _stored_at = get_article_record(short_code_name, article_number, client_id, client_secret, timeout)
+    return get_article_from_record(short_code_name, article_number, record, past_year_nb, future_year_nb)
+
+
+def get_article_from_record(short_code_name, article_number, record, past_year_nb=3, future_year_nb=3):
+    """
+    Les informations simplifiées de l'article à partir de ses données brutes, see get_article
+
+    Arguments
+    ---------
+    record: dict
+        see get_article_record
+    """
+    article = init_article(short_code_name, article_number)
+    article["id"] = record["id"]
+    if article["id"] is None:
+        return set_article_not_found(article)
+    article["texte"] = record["texte"]
+    article["url"] = record["url"]
+    article["start_date"] = convert_epoch_to_datetime(record["dateDebut"])
+    article["end_date"] = convert_epoch_to_datetime(record["dateFin"])
+    article["status_code"], article["status"], article["color"] = get_validity_status(article["start_date"], article["end_date"], past_year_nb, future_year_nb)
+    article["date_debut"] = convert_datetime_to_str(article["start_date"]).split(" ")[0]
+    article["date_fin"] = convert_datetime_to_str(article["end_date"]).split(" ")[0]
+    del article["start_date"]
+    del article["end_date"]
+    return article
+
+
+def init_article(short_code_name, article_number):
+    """Dictionnaire de résultat d'un article avant sa résolution"""
+    return {
         "code": short_code_name,
         "code_full_name": get_code_full_name_from_short_code(short_code_name),
         "article": article_number,
@@ -268,28 +424,70 @@ def get_article(short_code_name, article_number, client_id, client_secret, past_
         "texte": "",
         "date_debut": "",
         "date_fin": "",
-        "id": get_article_uid(
-            short_code_name, article_number, headers=get_legifrance_auth(client_id, client_secret)
-        )
+        "id": None,
     }
-    if article["id"] is None:
-        article["color"] = "danger"
-        article["status_code"] = 404
-        article["status"] = "Indisponible"
-        article["texte"] = "x"
-        return article
-    article_content = get_article_content(
-        article["id"], headers=get_legifrance_auth(client_id, client_secret)
-    )
-    article["texte"] = article_content["texte"]
-    article["url"] = article_content["url"]
-    article["start_date"] = convert_epoch_to_datetime(article_content["dateDebut"])
-    article["end_date"] = convert_epoch_to_datetime(article_content["dateFin"])
-    article["status_code"], article["status"], article["color"] = get_validity_status(article["start_date"], article["end_date"], past_year_nb, future_year_nb)
-    article["date_debut"] = convert_datetime_to_str(article["start_date"]).split(" ")[0]
-    article["date_fin"] = convert_datetime_to_str(article["end_date"]).split(" ")[0]
-    del article["start_date"]
-    del article["end_date"]
+
+
+def set_article_not_found(article):
+    """L'article n'a pas été trouvé sur Legifrance (erreur de référence ou abrogation)"""
+    article["color"] = "danger"
+    article["status_code"] = 404
+    article["status"] = "Indisponible"
+    article["texte"] = "x"
     return article
 
 
+def get_articles(references, client_id, client_secret, past_year_nb=3, future_year_nb=3):
+    """
+    Accéder aux informations simplifiées d'un lot d'articles
+
+    Arguments
+    ---------
+    references: array
+        une liste de couples (short_code_name, article_number)
+    past_year_nb: int or float
+        Nombre d'année avant aujourd'hui
+    future_year_nb: int or float
+        Nombre d'année après aujourd'hui
+    Returns
+    --------
+    articles: list
+        les dictionnaires au format de get_article, dans l'ordre des références
+        (status_code 502 si la requête à Legifrance a échoué)
+    stored_at: list
+        date (epoch) de récupération de chaque article auprès de Legifrance ou None
+
+    Notes
+    -----
+    Le status de validité de tous les articles trouvés est calculé en une seule passe (get_validity_status_batch).
+    """
+    articles, stored_at, records = [], [], []
+    for short_code_name, article_number in references:
+        article = init_article(short_code_name, article_number)
+        try:
+            record, record_stored_at = get_article_record(short_code_name, article_number, client_id, client_secret)
+        except Exception as e:
+            article.update({"status_code": 502, "status": str(e), "color": "danger"})
+            record, record_stored_at = None, None
+        if record is not None:
+            article["id"] = record["id"]
+            if record["id"] is None:
+                set_article_not_found(article)
+            else:
+                article["texte"] = record["texte"]
+                article["url"] = record["url"]
+                records.append((article, record))
+        articles.append(article)
+        stored_at.append(record_stored_at)
+    starts = [record["dateDebut"] for _article, record in records]
+    ends = [record["dateFin"] for _article, record in records]
+    status_codes, responses, colors = get_validity_status_batch(starts, ends, past_year_nb, future_year_nb)
+    dates_debut = convert_epochs_to_str(starts)
+    dates_fin = convert_epochs_to_str(ends)
+    for i, (article, _record) in enumerate(records):
+        article["status_code"] = int(status_codes[i])
+        article["status"] = str(responses[i])
+        article["color"] = str(colors[i])
+        article["date_debut"] = str(dates_debut[i])
+        article["date_fin"] = str(dates_fin[i])
+    return articles, stored_at
@@ -3,29 +3,13 @@ import os
 import time
 from dotenv import load_dotenv
 import pytest
+from code_references import CODE_REFERENCE, SHORT_CODE_INDEX
 
 API_ROOT_URL = "https://sandbox-api.piste.gouv.fr/dila/legifrance-beta/lf-engine-app/"
 # API_ROOT_URL =  "https://api.piste.gouv.fr/dila/legifrance-beta/lf-engine-app/",
 
-MAIN_CODELIST = {
-    "CCIV": "Code civil",
-    "CPRCIV": "Code de procédure civile",
-    "CCOM": "Code de commerce",
-    "CTRAV": "Code du travail",
-    "CPI": "Code de la propriété intellectuelle",
-    "CPEN": "Code pénal",
-    "CPP": "Code de procédure pénale",
-    "CASSUR": "Code des assurances",
-    "CCONSO": "Code de la consommation",
-    "CSI": "Code de la sécurité intérieure",
-    "CSP": "Code de la santé publique",
-    "CSS": "Code de la sécurité sociale",
-    "CESEDA": "Code de l'entrée et du séjour des étrangers et du droit d'asile",
-    "CGCT": "Code général des collectivités territoriales",
-    "CPCE": "Code des postes et des communications électroniques",
-    "CENV": "Code de l'environnement",
-    "CJA": "Code de justice administrative",
-}
+# the codes supported are those of the code registry (code_references.csv)
+MAIN_CODELIST = CODE_REFERENCE
 
 
 def get_code_full_name_from_short_code(short_code):
@@ -52,11 +36,7 @@ def get_short_code_from_full_name(full_name):
     Returns:
         short_code: short form of Code eg. CCIV
     """
-    keys = [k for k, v in MAIN_CODELIST.items() if v == full_name]
-    if len(keys) > 0:
-        return keys[0]
-    else:
-        return None
+    return SHORT_CODE_INDEX.get(full_name)
 
 
 def get_legifrance_auth(client_id, client_secret):
@@ -116,10 +96,10 @@ def get_article_uid(code_name, article_number, headers):
         article_uid: Identifiant unique de l'article dans Legifrance or None
 
     """
-    if code_name in list(MAIN_CODELIST.keys()):
+    if code_name in MAIN_CODELIST:
         code_short = code_name
         code_long = MAIN_CODELIST[code_name]
-    elif code_name in list(MAIN_CODELIST.values()):
+    elif code_name in SHORT_CODE_INDEX:
         code_long = code_name
         code_short = get_short_code_from_full_name(code_long)
     else:
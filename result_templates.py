@@ -9,6 +9,19 @@ start_results="""<!DOCTYPE html>
     <link rel="stylesheet" href="https://cdn.jsdelivr.net/npm/bootstrap@4.0.0/dist/css/bootstrap.min.css" integrity="sha384-Gn5384xqQ1aoWXA+058RXPxPg6fy4IWvTNh0E263XmFcJlSAwiGgFAW/dAiS6JXm" crossorigin="anonymous">
     <link rel="stylesheet" href="https://cdnjs.cloudflare.com/ajax/libs/font-awesome/6.2.0/css/all.min.css" integrity="sha512-xh6O/CkQoPOWDdYTDqeRdPCVd1SpvCA9XXcUnZS2FmJNp1coAFzvtCN9BmamE+4aHK8yyUHUSCcJHgXloTyT2A==" crossorigin="anonymous" referrerpolicy="no-referrer" />
     <title>Code is low - Accueil</title>
+    <script>
+    // rows resolved out of order (most cited articles first) are moved to their rank in the document
+    function placeRow(position) {
+        var row = document.querySelector('tr[data-position="' + position + '"]');
+        var rows = row.parentNode.querySelectorAll("tr[data-position]");
+        for (var i = 0; i < rows.length; i++) {
+            if (Number(rows[i].getAttribute("data-position")) > position) {
+                row.parentNode.insertBefore(row, rows[i]);
+                return;
+            }
+        }
+    }
+    </script>
 </head>
 
 
@@ -51,6 +64,18 @@ start_results="""<!DOCTYPE html>
                 </thead>
                 <tbody>
 """
+cancel_row="""
+                  <tr id="job-{job_id}">
+                    <td colspan="4">
+                      <button type="button" class="btn btn-sm btn-outline-danger" onclick="fetch('/jobs/{job_id}/cancel/', {{method: 'POST'}}); this.disabled = true;">Interrompre l'analyse</button>
+                    </td>
+                  </tr>
+"""
+message_row="""
+                  <tr>
+                    <td colspan="4"><span class="badge badge-pill badge-{color}">{message}</span></td>
+                  </tr>
+"""
 end_results="""</tbody>
             </table>
         <a href="/" class="btn btn-primary" role="button">Nouvelle Analyse</a>
@@ -0,0 +1,385 @@
+#!/usr/bin/env python3
+# filename: sandbox.py
+"""
+Sandbox module
+
+Lecture des documents déposés dans des processus isolés, démarrés à l'avance:
+
+- ParserPool: un pool de processus d'analyse. Chaque document est lu avec une limite de mémoire et de temps
+  processeur (rlimits) et un délai au-delà duquel le processus est tué. Les processus sont remplacés après
+  PARSER_MAX_DOCUMENTS documents.
+- iter_doc: parsing.iter_doc, exécuté dans le pool (PARSER_WORKERS > 0) ou dans le processus courant
+- get_parser_pool: le pool partagé par l'application, démarré au premier appel
+
+Un document malformé (ou une bombe zip) ne peut ni bloquer ni épuiser la mémoire du serveur web:
+seul le processus d'analyse est interrompu, et remplacé.
+
+"""
+
+import math
+import multiprocessing
+import os
+import queue
+import signal
+import threading
+import time
+from contextlib import contextmanager
+
+import parsing
+
+try:
+    import resource
+except ImportError:
+    # not a POSIX system: documents are read without memory and CPU limits
+    resource = None
+
+# nombre de processus d'analyse démarrés à l'avance (0: les documents sont lus dans le processus courant)
+PARSER_WORKERS = int(os.getenv("CODEISLOW_PARSER_WORKERS", 2))
+# un processus est remplacé après ce nombre de documents: les fuites de mémoire des bibliothèques restent bornées
+PARSER_MAX_DOCUMENTS = int(os.getenv("CODEISLOW_PARSER_MAX_DOCUMENTS", 50))
+# espace d'adressage maximal (octets) d'un processus pendant la lecture d'un document
+PARSER_MEMORY_LIMIT = int(os.getenv("CODEISLOW_PARSER_MEMORY_LIMIT", 1024 * 1024 * 1024))
+# temps processeur maximal (secondes) par document: au-delà, le système tue le processus (SIGXCPU)
+PARSER_CPU_LIMIT = int(os.getenv("CODEISLOW_PARSER_CPU_LIMIT", 30))
+# temps maximal d'attente des lignes d'un document (secondes), cumulé depuis le début de la lecture: au-delà,
+# le processus est tué. Le temps passé par l'appelant entre deux lignes (eg. requêtes à Légifrance) n'est pas compté.
+# C'est aussi le temps maximal d'attente d'un processus inoccupé.
+PARSER_TIMEOUT = float(os.getenv("CODEISLOW_PARSER_TIMEOUT", 30))
+# nombre maximal de lignes par message du processus d'analyse
+PARSER_BATCH_SIZE = 256
+
+
+class ParserError(Exception):
+    """La lecture du document a échoué dans le processus d'analyse"""
+
+
+class ParserTimeout(ParserError):
+    """Le processus d'analyse n'a pas lu le document dans le délai imparti (PARSER_TIMEOUT), ou aucun processus n'était libre"""
+
+
+class ParserDeadline(ParserTimeout):
+    """L'échéance de l'analyse est passée avant la fin de la lecture du document: le reste n'est pas lu"""
+
+
+def set_soft_limit(limit, value):
+    """Abaisser la limite souple `limit` à `value`, sans dépasser la limite stricte (qui ne pourrait plus être relevée)"""
+    _soft, hard = resource.getrlimit(limit)
+    if hard != resource.RLIM_INFINITY:
+        value = min(value, hard)
+    resource.setrlimit(limit, (value, hard))
+
+
+@contextmanager
+def resource_limits(memory_limit=PARSER_MEMORY_LIMIT, cpu_limit=PARSER_CPU_LIMIT):
+    """
+    Limiter la mémoire et le temps processeur du processus courant pendant le bloc
+
+    Arguments
+    ---------
+    memory_limit: int
+        espace d'adressage maximal (octets): au-delà, les allocations échouent (MemoryError). None for no limit
+    cpu_limit: int
+        temps processeur accordé au bloc (secondes): au-delà, le processus reçoit SIGXCPU. None for no limit
+
+    Notes
+    -----
+    Seules les limites souples sont modifiées, puis rétablies à la sortie du bloc.
+    Sans le module resource (hors POSIX), le bloc n'est pas limité.
+    """
+    if resource is None:
+        yield
+        return
+    previous = {limit: resource.getrlimit(limit) for limit in (resource.RLIMIT_AS, resource.RLIMIT_CPU)}
+    if memory_limit is not None:
+        set_soft_limit(resource.RLIMIT_AS, memory_limit)
+    if cpu_limit is not None:
+        # RLIMIT_CPU counts the whole life of the process: add the time already used
+        usage = resource.getrusage(resource.RUSAGE_SELF)
+        set_soft_limit(resource.RLIMIT_CPU, math.ceil(usage.ru_utime + usage.ru_stime) + cpu_limit)
+    try:
+        yield
+    finally:
+        for limit, limits in previous.items():
+            resource.setrlimit(limit, limits)
+
+
+def parser_worker(connection, memory_limit, cpu_limit):
+    """
+    La boucle d'un processus d'analyse: un document par message (document, doc_ext, pdf_backend), jusqu'à None
+
+    Les lignes sont renvoyées au fil de la lecture: ("lines", [(page_nb, line), ...]), puis ("done", report)
+    ou ("error", message).
+    """
+    if hasattr(signal, "SIGXCPU"):
+        # the CPU limit terminates the process: the pool sees it die and replaces it
+        signal.signal(signal.SIGXCPU, signal.SIG_DFL)
+    for document, doc_ext, pdf_backend in iter(connection.recv, None):
+        report = {}
+        try:
+            with resource_limits(memory_limit, cpu_limit):
+                lines = []
+                # workers=1: a daemonic worker cannot start the processes of iter_pdf_pages,
+                # the page ranges of a PDF are only spread with PARSER_WORKERS = 0
+                for page_nb, page_lines in parsing.iter_normalized_pages(document, doc_ext, 1, pdf_backend, report):
+                    lines.extend((page_nb, line) for line in page_lines)
+                    # a PDF page is sent as soon as it is read, paragraphs (odt, docx) by batches
+                    if doc_ext == "pdf" or len(lines) >= PARSER_BATCH_SIZE:
+                        connection.send(("lines", lines))
+                        lines = []
+                if lines:
+                    connection.send(("lines", lines))
+            connection.send(("done", report))
+        except Exception as error:
+            connection.send(("error", f"{type(error).__name__}: {error}"))
+
+
+class ParserWorker:
+    """Un processus d'analyse et la connexion qui le relie au pool"""
+
+    def __init__(self, context, memory_limit, cpu_limit):
+        self.connection, child_connection = context.Pipe()
+        self.process = context.Process(
+            target=parser_worker, args=(child_connection, memory_limit, cpu_limit), daemon=True
+        )
+        self.process.start()
+        child_connection.close()
+        self.documents = 0
+
+    def stop(self, kill=False):
+        """Arrêter le processus: à la fin du document en cours, ou immédiatement (kill)"""
+        if not kill and self.process.is_alive():
+            try:
+                self.connection.send(None)
+                self.process.join(1)
+            except (OSError, ValueError):
+                pass
+        if self.process.is_alive():
+            self.process.kill()
+            self.process.join()
+        self.connection.close()
+
+
+class ParserPool:
+    """
+    Un pool de processus d'analyse démarrés à l'avance
+
+    Arguments
+    ---------
+    size: int
+        nombre de processus. Default to PARSER_WORKERS
+    max_documents: int
+        nombre de documents lus par un processus avant son remplacement. Default to PARSER_MAX_DOCUMENTS
+    memory_limit: int
+        see resource_limits. Default to PARSER_MEMORY_LIMIT
+    cpu_limit: int
+        see resource_limits. Default to PARSER_CPU_LIMIT
+    timeout: float
+        temps maximal d'attente des lignes d'un document (secondes), cumulé sur toute la lecture:
+        une bombe zip qui produit des lignes sans fin est interrompue. Default to PARSER_TIMEOUT
+
+    Notes
+    -----
+    Les processus sont démarrés par "spawn": ils n'héritent ni des threads ni de la mémoire du serveur web.
+    Un processus qui dépasse une limite, ou dont la lecture est interrompue, est remplacé. Si le remplaçant
+    ne peut pas être démarré, il l'est à la prochaine lecture.
+    """
+
+    def __init__(
+        self, size=PARSER_WORKERS, max_documents=PARSER_MAX_DOCUMENTS, memory_limit=PARSER_MEMORY_LIMIT,
+        cpu_limit=PARSER_CPU_LIMIT, timeout=PARSER_TIMEOUT
+    ):
+        self.context = multiprocessing.get_context("spawn")
+        self.size = size
+        self.max_documents = max_documents
+        self.memory_limit = memory_limit
+        self.cpu_limit = cpu_limit
+        self.timeout = timeout
+        self.workers = []
+        self.idle = queue.Queue()
+        self.lock = threading.Lock()
+        # workers being started to replace a lost one (see get_worker)
+        self.starting = 0
+        for _ in range(size):
+            self.idle.put(self.start_worker())
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc_info):
+        self.close()
+
+    def start_worker(self):
+        worker = ParserWorker(self.context, self.memory_limit, self.cpu_limit)
+        with self.lock:
+            self.workers.append(worker)
+        return worker
+
+    def release_worker(self, worker, healthy):
+        """Rendre le processus au pool, ou le remplacer s'il a échoué ou lu max_documents documents"""
+        worker.documents += 1
+        if healthy and worker.documents < self.max_documents:
+            self.idle.put(worker)
+            return
+        worker.stop(kill=not healthy)
+        with self.lock:
+            self.workers.remove(worker)
+        try:
+            self.idle.put(self.start_worker())
+        except OSError:
+            # the pool is one worker short until the next reading (see get_worker)
+            pass
+
+    def get_worker(self, deadline=None):
+        """
+        Un processus inoccupé, ou un nouveau processus si le pool n'a pas pu en remplacer un
+
+        Arguments
+        ----------
+        deadline: float
+            échéance (time.monotonic) de l'attente, si elle précède la fin du délai imparti. Default to None
+
+        Raises
+        ----------
+        ParserError:
+            le processus n'a pas pu être démarré
+        ParserTimeout:
+            aucun processus ne s'est libéré dans le délai imparti
+        ParserDeadline:
+            aucun processus ne s'est libéré avant l'échéance
+        """
+        try:
+            return self.idle.get_nowait()
+        except queue.Empty:
+            pass
+        with self.lock:
+            replace = len(self.workers) + self.starting < self.size
+            if replace:
+                self.starting += 1
+        if replace:
+            try:
+                return self.start_worker()
+            except OSError as error:
+                raise ParserError(f"the parser worker could not be started ({error})") from None
+            finally:
+                with self.lock:
+                    self.starting -= 1
+        timeout = self.timeout if deadline is None else min(self.timeout, max(deadline - time.monotonic(), 0))
+        try:
+            return self.idle.get(timeout=timeout)
+        except queue.Empty:
+            if timeout < self.timeout:
+                raise ParserDeadline("no parser worker was available before the deadline") from None
+            raise ParserTimeout(f"no parser worker was available within {self.timeout}s") from None
+
+    def close(self):
+        """Arrêter les processus inoccupés"""
+        while True:
+            try:
+                worker = self.idle.get_nowait()
+            except queue.Empty:
+                return
+            worker.stop()
+            with self.lock:
+                self.workers.remove(worker)
+
+    def iter_doc(self, file_path, pdf_backend=None, report=None, doc_ext=None, deadline=None):
+        """
+        Lire le document dans un processus du pool, see parsing.iter_doc
+
+        Arguments
+        ----------
+        deadline: float
+            échéance (time.monotonic) de la lecture: les attentes du pool (processus libre, lignes) s'arrêtent
+            au plus tard à cette échéance. Default to None (PARSER_TIMEOUT seulement)
+
+        Returns
+        ----------
+        lines: generator
+            des couples (page_nb, line), produits au fil de la lecture. Le fichier (un chemin) est supprimé une fois lu.
+        Raises
+        ----------
+        ValueError:
+            Extension incorrecte (à l'appel)
+        ParserError:
+            le document n'a pas pu être lu, ou le processus a dépassé une limite (à la lecture)
+        ParserTimeout:
+            le processus n'a pas répondu dans le délai imparti (à la lecture)
+        ParserDeadline:
+            l'échéance est passée avant la fin de la lecture (à la lecture): le processus est tué
+        """
+        document, doc_ext = parsing.prepare_document(file_path, doc_ext)
+        return self.iter_doc_lines(document, doc_ext, pdf_backend, report, deadline)
+
+    def iter_doc_lines(self, document, doc_ext, pdf_backend=None, report=None, deadline=None):
+        worker = self.get_worker(deadline)
+        healthy = False
+        try:
+            worker.connection.send((document, doc_ext, pdf_backend))
+            waited = 0.0
+            while True:
+                start = time.monotonic()
+                wait, error = max(self.timeout - waited, 0), ParserTimeout(f"the parser worker took more than {self.timeout}s")
+                if deadline is not None and deadline - start < wait:
+                    wait, error = max(deadline - start, 0), ParserDeadline("the document was not read before the deadline")
+                ready = worker.connection.poll(wait)
+                waited += time.monotonic() - start
+                if not ready:
+                    raise error
+                kind, payload = worker.connection.recv()
+                if kind == "lines":
+                    yield from payload
+                elif kind == "done":
+                    if report is not None:
+                        for backend, page_nbs in payload.items():
+                            report.setdefault(backend, []).extend(page_nbs)
+                    healthy = True
+                    return
+                else:
+                    raise ParserError(payload)
+        except (EOFError, OSError):
+            worker.process.join(1)
+            raise ParserError(f"the parser worker died (exit code {worker.process.exitcode})") from None
+        finally:
+            # an interrupted reading (close, timeout, crash) kills the worker: it may still be reading
+            self.release_worker(worker, healthy)
+            if isinstance(document, str) and os.path.exists(document):
+                os.remove(document)
+
+
+PARSER_POOL = None
+_lock = threading.Lock()
+
+
+def get_parser_pool():
+    """Le pool partagé de PARSER_WORKERS processus, démarré au premier appel"""
+    global PARSER_POOL
+    with _lock:
+        if PARSER_POOL is None:
+            PARSER_POOL = ParserPool()
+        return PARSER_POOL
+
+
+def iter_doc(file_path, workers=None, pdf_backend=None, report=None, doc_ext=None, deadline=None):
+    """
+    Parcourir le document page par page dans un processus d'analyse, see parsing.iter_doc
+
+    Arguments
+    ----------
+    see parsing.iter_doc. `workers` ne s'applique qu'à la lecture dans le processus courant (PARSER_WORKERS = 0):
+    un processus d'analyse extrait les pages d'un PDF une à une, quel que soit leur nombre
+    (parsing.PARALLEL_PAGE_THRESHOLD ne s'applique pas). `deadline` borne les attentes du pool, see ParserPool.iter_doc:
+    dans le processus courant, l'appelant vérifie l'échéance à chaque ligne.
+    Returns
+    ----------
+    lines: generator
+        des couples (page_nb, line), see parsing.iter_doc
+    Raises
+    ----------
+    ValueError:
+        Extension incorrecte
+    ParserError:
+        see ParserPool.iter_doc
+    """
+    if PARSER_WORKERS < 1:
+        return parsing.iter_doc(file_path, workers, pdf_backend, report, doc_ext)
+    return get_parser_pool().iter_doc(file_path, pdf_backend, report, doc_ext, deadline)
@@ -0,0 +1,173 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import io
+import json
+import pytest
+
+import app as codeislow_app
+import request_api
+from caching import TTLCache
+
+FAKE_RECORDS = {
+    ("CTRAV", "L1234-5"): {
+        "id": "LEGIARTI000006901234",
+        "url": "https://www.legifrance.gouv.fr/codes/article_lc/LEGIARTI000006901234",
+        "texte": "Texte de l'article",
+        "dateDebut": 1467331200000,
+        "dateFin": 32472144000000,
+    },
+}
+
+
+def call(method, path, body=None, headers=None):
+    """Appelle l'application WSGI et renvoie (status, headers, body)"""
+    payload = json.dumps(body).encode("utf-8") if body is not None else b""
+    environ = {
+        "REQUEST_METHOD": method,
+        "PATH_INFO": path.split("?")[0],
+        "QUERY_STRING": path.split("?")[1] if "?" in path else "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "8080",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(payload),
+        "CONTENT_LENGTH": str(len(payload)),
+        "CONTENT_TYPE": "application/json",
+    }
+    for k, v in (headers or {}).items():
+        environ["HTTP_" + k.upper().replace("-", "_")] = v
+    result = {}
+
+    def start_response(status, response_headers, exc_info=None):
+        result["status"] = int(status.split(" ")[0])
+        result["headers"] = {k.lower(): v for k, v in response_headers}
+
+    content = b"".join(codeislow_app.app(environ, start_response))
+    return result["status"], result["headers"], content
+
+
+GET_CACHED_LEGIFRANCE_AUTH = request_api.get_cached_legifrance_auth
+
+
+@pytest.fixture
+def fake_api(monkeypatch):
+    calls = []
+
+    def fake_uid(short_code_name, article_number, headers, timeout=None):
+        calls.append((short_code_name, article_number))
+        record = FAKE_RECORDS.get((short_code_name, article_number))
+        return record["id"] if record else None
+
+    def fake_content(article_id, headers, timeout=None):
+        return [r for r in FAKE_RECORDS.values() if r["id"] == article_id][0]
+
+    monkeypatch.setattr(request_api, "ARTICLE_CACHE", TTLCache(maxsize=10, ttl=60))
+    monkeypatch.setattr(request_api, "get_article_uid", fake_uid)
+    monkeypatch.setattr(request_api, "get_article_content", fake_content)
+    monkeypatch.setattr(request_api, "get_cached_legifrance_auth", lambda client_id, client_secret, timeout=None: {})
+    return calls
+
+
+class TestTTLCache:
+    def test_lru_bound(self):
+        cache = TTLCache(maxsize=2, ttl=60)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+        assert "a" in cache and "c" in cache
+        assert "b" not in cache
+
+    def test_expiration(self):
+        cache = TTLCache(maxsize=2, ttl=0)
+        cache.set("a", 1)
+        assert cache.get("a") is None
+
+
+class TestTokenCache:
+    def test_revoked_token(self, fake_api, monkeypatch):
+        tokens = iter(["revoked", "fresh"])
+        monkeypatch.setattr(request_api, "TOKEN_CACHE", TTLCache(maxsize=8, ttl=60))
+        monkeypatch.setattr(
+            request_api, "get_legifrance_auth", lambda client_id, client_secret, timeout=None: {"token": next(tokens)}
+        )
+        monkeypatch.setattr(request_api, "get_cached_legifrance_auth", GET_CACHED_LEGIFRANCE_AUTH)
+        fake_uid = request_api.get_article_uid
+
+        def uid(short_code_name, article_number, headers, timeout=None):
+            if headers["token"] == "revoked":
+                raise request_api.UnauthorizedError("Error 401: Unauthorized")
+            return fake_uid(short_code_name, article_number, headers, timeout)
+
+        monkeypatch.setattr(request_api, "get_article_uid", uid)
+        record, _stored_at = request_api.get_article_record("CTRAV", "L1234-5", "id", "secret")
+        assert record["id"] == "LEGIARTI000006901234"
+        assert request_api.TOKEN_CACHE.get(("id", "secret")) == {"token": "fresh"}
+
+
+class TestArticleEndpoint:
+    def test_get_article(self, fake_api):
+        status, headers, content = call("GET", "/api/articles/CTRAV/L1234-5")
+        assert status == 200, content
+        article = json.loads(content)
+        assert article["id"] == "LEGIARTI000006901234"
+        assert article["status_code"] == 204, article
+        assert "etag" in headers and "last-modified" in headers
+        # second call is served from the cache
+        call("GET", "/api/articles/CTRAV/L1234-5")
+        assert fake_api == [("CTRAV", "L1234-5")]
+
+    def test_get_article_one_lookup(self, fake_api, monkeypatch):
+        lookups = []
+        get_entry = request_api.ARTICLE_CACHE.get_entry
+        monkeypatch.setattr(request_api.ARTICLE_CACHE, "get_entry", lambda key: lookups.append(key) or get_entry(key))
+        call("GET", "/api/articles/CTRAV/L1234-5")
+        assert lookups == [("CTRAV", "L1234-5")]
+
+    def test_get_article_not_modified(self, fake_api):
+        _status, headers, _content = call("GET", "/api/articles/CTRAV/L1234-5")
+        status, _headers, content = call("GET", "/api/articles/CTRAV/L1234-5", headers={"If-None-Match": headers["etag"]})
+        assert status == 304
+        assert content == b""
+
+    def test_get_article_wrong_code(self, fake_api):
+        status, _headers, _content = call("GET", "/api/articles/CXYZ/12")
+        assert status == 404
+        assert fake_api == []
+
+    def test_get_article_no_credentials(self, fake_api, monkeypatch):
+        monkeypatch.setattr(request_api, "get_cached_legifrance_auth", GET_CACHED_LEGIFRANCE_AUTH)
+        monkeypatch.setattr(codeislow_app, "load_dotenv", lambda: None)
+        monkeypatch.delenv("API_KEY", raising=False)
+        monkeypatch.delenv("API_SECRET", raising=False)
+        status, _headers, content = call("GET", "/api/articles/CTRAV/L1234-5")
+        assert status == 503
+        assert "credentials" in json.loads(content)["error"]
+
+    def test_batch(self, fake_api):
+        references = [
+            {"code": "CTRAV", "article": "L1234-5"},
+            {"code": "CCIV", "article": "99999"},
+            {"code": "CXYZ", "article": "12"},
+        ]
+        status, _headers, content = call("POST", "/api/articles/", {"references": references})
+        assert status == 200, content
+        articles = json.loads(content)["articles"]
+        assert [a["status_code"] for a in articles] == [204, 404, 400]
+
+    @pytest.mark.parametrize("past", [1e10, float("inf"), float("nan"), -1, "3 ans"])
+    def test_batch_wrong_period(self, fake_api, past):
+        references = [{"code": "CTRAV", "article": "L1234-5"}]
+        status, _headers, _content = call("POST", "/api/articles/", {"past": past, "references": references})
+        assert status == 400
+        assert fake_api == []
+
+    @pytest.mark.parametrize("query", ["past=1e10", "future=inf", "past=nan"])
+    def test_get_article_wrong_period(self, fake_api, query):
+        status, _headers, _content = call("GET", "/api/articles/CTRAV/L1234-5?" + query)
+        assert status == 400
+        assert fake_api == []
+
+    def test_batch_too_large(self, fake_api):
+        references = [{"code": "CTRAV", "article": "L1234-5"}] * (codeislow_app.API_BATCH_MAX + 1)
+        status, _headers, _content = call("POST", "/api/articles/", {"references": references})
+        assert status == 413
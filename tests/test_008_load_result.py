@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import hashlib
+import re
+import pytest
+
+import codeislow
+import jobs
+from matching import Citation, iter_citations
+from caching import TTLCache
+from sandbox import ParserDeadline
+
+CITATIONS = [("CCIV", "2288"), ("CPP", "R57-6-1"), ("CCIV", "1120"), ("CCIV", "1120")]
+
+
+@pytest.fixture
+def fake_pipeline(monkeypatch):
+    """Remplace l'analyse du document et l'API par des résultats connus"""
+    requested = []
+
+    def fake_get_article(code, article_nb, client_id, client_secret, past_year_nb=3, future_year_nb=3, timeout=None):
+        requested.append((code, article_nb))
+        return {
+            "code": code,
+            "article": article_nb,
+            "url": "",
+            "color": "green",
+            "status": "Pas de modification",
+            "status_code": 204,
+            "texte": "",
+            "date_debut": "",
+            "date_fin": "",
+        }
+
+    monkeypatch.setattr(codeislow, "iter_doc", lambda file_path, report=None, doc_ext=None, deadline=None: (line for line in [(0, "texte")]))
+    monkeypatch.setattr(
+        codeislow, "iter_citations",
+        lambda full_text, selected_codes, pattern_format, **kwargs: (
+            Citation(*citation, 0, 0, 0, 0) for _line in full_text for citation in CITATIONS
+        )
+    )
+    monkeypatch.setattr(codeislow, "get_document_hash", lambda file_path: "sha256")
+    monkeypatch.setattr(codeislow, "CITATION_CACHE", TTLCache(maxsize=8))
+    monkeypatch.setattr(codeislow, "get_article", fake_get_article)
+    return requested
+
+
+class TestCancellation:
+    def test_cancel_job(self, fake_pipeline):
+        job = jobs.register_job()
+        results = codeislow.load_result("document.pdf", job=job)
+        next(results)
+        jobs.cancel_job(job.id)
+        assert list(results) == []
+        assert fake_pipeline == CITATIONS[:1]
+        assert (job.resolved, job.skipped, job.skipped_unknown) == (1, 1, True)
+        jobs.release_job(job)
+        assert jobs.get_job(job.id) is None
+
+    def test_client_disconnect(self, fake_pipeline):
+        job = jobs.Job()
+        results = codeislow.load_result("document.pdf", job=job)
+        next(results)
+        next(results)
+        results.close()
+        assert job.is_cancelled()
+        assert len(fake_pipeline) == 2
+        assert (job.skipped, job.skipped_unknown) == (0, True)
+
+    def test_cancel_stats(self, fake_pipeline):
+        before = jobs.get_cancel_stats()
+        job = jobs.Job()
+        results = codeislow.load_result("document.pdf", job=job)
+        next(results)
+        job.cancel()
+        list(results)
+        after = jobs.get_cancel_stats()
+        assert after["jobs_cancelled"] == before["jobs_cancelled"] + 1
+        assert after["citations_skipped"] == before["citations_skipped"] + 1
+        assert after["jobs_skipped_unknown"] == before["jobs_skipped_unknown"] + 1
+
+    @pytest.mark.parametrize("cancel", ["job", "disconnect"])
+    def test_document_not_drained(self, fake_pipeline, monkeypatch, cancel):
+        read = []
+
+        def fake_iter_doc(file_path, report=None, doc_ext=None, deadline=None):
+            for i in range(10000):
+                read.append(i)
+                yield 0, "Voir l'article 1240 du Code civil."
+
+        monkeypatch.setattr(codeislow, "iter_doc", fake_iter_doc)
+        monkeypatch.setattr(codeislow, "iter_citations", iter_citations)
+        job = jobs.Job()
+        results = codeislow.load_result("document.pdf", job=job)
+        next(results)
+        if cancel == "job":
+            job.cancel()
+            assert list(results) == []
+        else:
+            results.close()
+        assert len(read) < 100
+
+
+class TestResolutionOrder:
+    def test_document_order(self, fake_pipeline):
+        rows = list(codeislow.load_result("document.pdf"))
+        assert fake_pipeline == CITATIONS
+        assert len(rows) == 4
+        assert "data-position" not in rows[0]
+
+    def test_frequency_order(self, fake_pipeline):
+        rows = list(codeislow.load_result("document.pdf", order="frequency"))
+        # the most cited article is resolved first, each article only once
+        assert fake_pipeline == [("CCIV", "1120"), ("CCIV", "2288"), ("CPP", "R57-6-1")]
+        positions = [int(re.search(r'data-position="(\d+)"', row).group(1)) for row in rows]
+        assert positions == [2, 0, 1]
+        assert "(2 citations)" in rows[0]
+
+    def test_wrong_order(self, fake_pipeline):
+        with pytest.raises(ValueError):
+            list(codeislow.load_result("document.pdf", order="random"))
+
+
+class TestTimeBudget:
+    @pytest.fixture
+    def clock(self, fake_pipeline, monkeypatch):
+        """Une horloge qui avance d'une seconde par requête à l'API"""
+        clock = [0]
+        timeouts = []
+
+        def fake_get_article(code, article_nb, client_id, client_secret, past_year_nb=3, future_year_nb=3, timeout=None):
+            timeouts.append(timeout)
+            clock[0] += 1
+            fake_pipeline.append((code, article_nb))
+            return codeislow.get_unchecked_article(code, article_nb) | {"status_code": 204}
+
+        monkeypatch.setattr(codeislow.time, "monotonic", lambda: clock[0])
+        monkeypatch.setattr(codeislow, "get_article", fake_get_article)
+        return clock, timeouts
+
+    def test_budget_exhausted(self, fake_pipeline):
+        rows = list(codeislow.load_result("document.pdf", budget=0))
+        assert fake_pipeline == []
+        assert len(rows) == 1
+        assert codeislow.PARTIAL_STATUS in rows[0]
+
+    def test_budget_exhausted_from_cache(self, fake_pipeline):
+        list(codeislow.get_document_citations("document.pdf"))
+        articles = list(codeislow.main("document.pdf", budget=0))
+        assert fake_pipeline == []
+        assert len(articles) == len(CITATIONS)
+        assert all(a["status_code"] == codeislow.UNCHECKED_STATUS_CODE for a in articles)
+
+    def test_budget_partial(self, clock):
+        _clock, timeouts = clock
+        rows = list(codeislow.load_result("document.pdf", budget=2))
+        assert timeouts == [2, 1]
+        assert len(rows) == 4
+        assert codeislow.UNCHECKED_STATUS in rows[-1]
+        assert codeislow.PARTIAL_STATUS not in rows[-1]
+
+    def test_deadline_while_reading(self, clock, monkeypatch):
+        clock, timeouts = clock
+
+        def slow_iter_doc(file_path, report=None, doc_ext=None, deadline=None):
+            for page_nb in range(100):
+                clock[0] += 1
+                yield page_nb, "texte"
+
+        monkeypatch.setattr(codeislow, "iter_doc", slow_iter_doc)
+        report = {}
+        articles = list(codeislow.resolve_articles("document.pdf", budget=3, report=report))
+        assert report == {"partial": True}
+        assert timeouts == [2, 1]
+        # the first line only is read: 2 citations resolved before the deadline, the others listed as unchecked
+        assert len(articles) == len(CITATIONS)
+        assert [a["status_code"] for a, _position, _nb in articles[2:]] == [codeislow.UNCHECKED_STATUS_CODE] * 2
+        assert len(codeislow.CITATION_CACHE) == 0
+
+    def test_parser_deadline(self, clock, monkeypatch):
+        clock, _timeouts = clock
+        deadlines = []
+
+        def stalled_iter_doc(file_path, report=None, doc_ext=None, deadline=None):
+            # the parser worker stops waiting for the next line at the deadline
+            deadlines.append(deadline)
+            yield 0, "texte"
+            raise ParserDeadline("the document was not read before the deadline")
+
+        monkeypatch.setattr(codeislow, "iter_doc", stalled_iter_doc)
+        report = {}
+        articles = list(codeislow.resolve_articles("document.pdf", budget=10, report=report))
+        assert deadlines == [10]
+        assert report == {"partial": True}
+        assert len(articles) == len(CITATIONS)
+        assert len(codeislow.CITATION_CACHE) == 0
+
+    def test_api_timeout(self, fake_pipeline, monkeypatch):
+        def timeout_get_article(*args, **kwargs):
+            raise codeislow.Timeout()
+
+        monkeypatch.setattr(codeislow, "get_article", timeout_get_article)
+        articles = list(codeislow.main("document.pdf", budget=60))
+        assert all(a["status_code"] == codeislow.UNCHECKED_STATUS_CODE for a in articles)
+
+
+class TestSkippedPages:
+    @pytest.fixture
+    def skipped(self, fake_pipeline, monkeypatch):
+        def fake_iter_doc(file_path, report=None, doc_ext=None, deadline=None):
+            yield 0, "texte"
+            report[codeislow.SKIPPED_PAGES] = [1, 4]
+
+        monkeypatch.setattr(codeislow, "iter_doc", fake_iter_doc)
+
+    def test_skipped_row(self, skipped):
+        rows = list(codeislow.load_result("document.pdf"))
+        assert len(rows) == len(CITATIONS) + 1
+        assert codeislow.SKIPPED_STATUS.format(pages="2, 5") in rows[-1]
+
+    def test_skipped_not_stored(self, skipped):
+        report = {}
+        list(codeislow.get_document_citations("document.pdf", report=report))
+        assert report == {codeislow.SKIPPED_PAGES: [1, 4]}
+        assert len(codeislow.CITATION_CACHE) == 0
+
+
+class TestCitationCache:
+    @pytest.fixture
+    def matched(self, fake_pipeline, monkeypatch):
+        """Les documents effectivement analysés"""
+        matched = []
+
+        def fake_iter_citations(full_text, selected_codes, pattern_format, **kwargs):
+            matched.append((selected_codes, pattern_format))
+            return (Citation(*citation, 0, 0, 0, 0) for citation in CITATIONS)
+
+        monkeypatch.setattr(codeislow, "iter_citations", fake_iter_citations)
+        return matched
+
+    def test_same_document(self, matched):
+        first = list(codeislow.get_document_citations("document.pdf", ["CCIV", "CPP"], "both"))
+        second = list(codeislow.get_document_citations("document.pdf", ["CPP", "CCIV"], "both"))
+        assert first == second
+        assert [citation[:2] for citation in first] == CITATIONS
+        assert len(matched) == 1
+        assert list(codeislow.CITATION_CACHE.get(("sha256", ("CCIV", "CPP"), "both"))) == CITATIONS
+
+    def test_frequency_order_from_cache(self, matched, fake_pipeline):
+        list(codeislow.load_result("document.pdf"))
+        rows = list(codeislow.load_result("document.pdf", order="frequency"))
+        assert len(matched) == 1
+        assert len(rows) == 3 and "(2 citations)" in rows[0]
+
+    def test_other_selection(self, matched):
+        list(codeislow.get_document_citations("document.pdf", ["CCIV"], "both"))
+        list(codeislow.get_document_citations("document.pdf", ["CCIV"], "article_code"))
+        list(codeislow.get_document_citations("document.pdf", None, "both"))
+        assert len(matched) == 3
+
+    def test_incomplete_not_stored(self, matched):
+        citations = codeislow.get_document_citations("document.pdf")
+        next(citations)
+        citations.close()
+        assert len(codeislow.CITATION_CACHE) == 0
+
+    def test_pages(self, fake_pipeline, monkeypatch):
+        lines = [(0, "Voir l'article 1240"), (1, "du Code civil."), (2, "Et l'article 1241 du Code civil.")]
+        monkeypatch.setattr(codeislow, "iter_doc", lambda file_path, **kwargs: (line for line in lines))
+        monkeypatch.setattr(codeislow, "iter_citations", iter_citations)
+        first = list(codeislow.get_document_citations("document.pdf"))
+        # the citation starts on the page of its keyword, its offsets are those of the lines joined by a space
+        text = " ".join(line for _page_nb, line in lines)
+        assert [(c.code, c.article, c.page, text[c.start : c.end]) for c in first] == [
+            ("CCIV", "1240", 0, "article 1240 du Code civil"),
+            ("CCIV", "1241", 2, "article 1241 du Code civil"),
+        ]
+        cached = codeislow.CITATION_CACHE.get(("sha256", (), "article_code"))
+        assert list(cached.paragraph_starts) == [0, 20, 35]
+        assert list(codeislow.get_document_citations("document.pdf")) == first
+
+    def test_document_hash(self, tmp_path):
+        file_path = tmp_path / "document.pdf"
+        file_path.write_bytes(b"%PDF" * 100000)
+        assert codeislow.get_document_hash(str(file_path)) == hashlib.sha256(b"%PDF" * 100000).hexdigest()
+
+    def test_document_hash_bytes(self, tmp_path):
+        file_path = tmp_path / "document.pdf"
+        file_path.write_bytes(b"%PDF" * 100000)
+        assert codeislow.get_document_hash(b"%PDF" * 100000) == codeislow.get_document_hash(str(file_path))
@@ -0,0 +1,60 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import datetime
+import pytest
+
+from check_validity import (
+    convert_datetime_to_epoch,
+    convert_epoch_to_datetime,
+    convert_epochs_to_str,
+    get_validity_status,
+    get_validity_status_batch,
+    time_delta,
+)
+
+
+def epoch(operator, year_nb):
+    return int(convert_datetime_to_epoch(time_delta(operator, year_nb)))
+
+
+class TestTimeDeltaFractional:
+    def test_six_months(self):
+        today = datetime.date.today()
+        past = time_delta("-", 0.5)
+        months = (today.year - past.year) * 12 + today.month - past.month
+        assert months == 6, past
+
+    def test_integer_unchanged(self):
+        today = datetime.date.today()
+        assert time_delta("+", 3).year == today.year + 3
+
+    def test_wrong_nb(self):
+        with pytest.raises(TypeError):
+            time_delta("-", "3")
+
+    @pytest.mark.parametrize("year_nb", [1e10, float("inf"), float("nan"), -1, 100])
+    def test_out_of_range(self, year_nb):
+        with pytest.raises(ValueError):
+            time_delta("-", year_nb)
+
+
+class TestValidityStatusBatch:
+    STARTS = [1467331200000, epoch("-", 1), epoch("-", 10), epoch("-", 0.25)]
+    ENDS = [32472144000000, 32472144000000, epoch("+", 1), 32472144000000]
+
+    def test_same_as_scalar(self):
+        status_codes, responses, colors = get_validity_status_batch(self.STARTS, self.ENDS, 3, 3)
+        for i, (start, end) in enumerate(zip(self.STARTS, self.ENDS)):
+            expected = get_validity_status(convert_epoch_to_datetime(start), convert_epoch_to_datetime(end), 3, 3)
+            assert (status_codes[i], responses[i], colors[i]) == expected, i
+
+    def test_fractional_window(self):
+        status_codes, _responses, _colors = get_validity_status_batch(self.STARTS, self.ENDS, 0.5, 0.5)
+        assert list(status_codes) == [204, 204, 204, 301]
+
+    def test_convert_epochs_to_str(self):
+        assert list(convert_epochs_to_str([1467331200000, 32472144000000])) == ["01/07/2016", "01/01/2999"]
+
+    def test_empty(self):
+        status_codes, responses, colors = get_validity_status_batch([], [], 3, 3)
+        assert len(status_codes) == len(responses) == len(colors) == 0
@@ -0,0 +1,372 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import ast
+import os
+import re
+import time
+import pytest
+from concurrent.futures import ThreadPoolExecutor
+
+import matching
+from parsing import normalize_text
+from test_001_parsing import parse_doc
+from test_003_matching import switch_pattern as legacy_switch_pattern
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+DOCUMENTS = ["newtest.doc", "newtest.docx", "newtest.pdf", "newtest2.pdf", "testnew.pdf", "testnew.odt"]
+
+
+def load_needles():
+    """Les citations de référence: une ligne par citation `n {'art': ..., 'ref': ..., 'CODE': ...}`"""
+    with open(os.path.join(TESTS_DIR, "needles.csv"), encoding="utf-8") as f:
+        return [ast.literal_eval(line.split(" ", 1)[1]) for line in f if line.strip()]
+
+
+KEYWORD_REGEX = re.compile("|".join(matching.ARTICLE_KEYWORDS), flags=re.I)
+
+
+def restart_at_keyword(ref):
+    """La référence commence au dernier mot-clé qui n'est pas suivi d'une liste de numéros (see matching.get_reference_keyword)"""
+    start = previous_end = 0
+    for keyword in KEYWORD_REGEX.finditer(ref):
+        if not matching.is_article_list(ref[previous_end : keyword.start()]):
+            start = keyword.end()
+        previous_end = keyword.end()
+    return ref[start:]
+
+
+def get_legacy_matching_result_item(full_text, selected_codes, keyword_rule=True):
+    """
+    Les références trouvées par la regex d'origine, normalisées par matching.normalize_references
+
+    keyword_rule: applique restart_at_keyword. La regex d'origine part toujours du premier mot-clé, comme max_span=None.
+    """
+    text = normalize_text(" ".join(full_text))
+    for match in legacy_switch_pattern(selected_codes).finditer(text):
+        code = [k for k, v in match.groupdict().items() if v is not None and k not in ["ref", "art"]][0]
+        ref = restart_at_keyword(match.group("ref")) if keyword_rule else match.group("ref")
+        for article_nb in matching.normalize_references(ref):
+            yield (code, article_nb)
+
+
+def needles_text():
+    return " ".join(needle["art"] + needle["ref"] + list(needle.values())[2] for needle in load_needles())
+
+
+class TestMatcherCompatibility:
+    def test_needles(self):
+        full_text = [needles_text()]
+        expected = list(get_legacy_matching_result_item(full_text, None))
+        results = list(matching.get_matching_result_item(full_text, None))
+        assert len(results) > len(load_needles())
+        assert results == expected
+
+    def test_needles_found(self):
+        """Chaque citation de needles.csv est trouvée, sauf celles d'un code désigné par un alias inconnu (" du CE")"""
+        results = list(matching.get_matching_result_item([needles_text()], None))
+        missing = []
+        for needle in load_needles():
+            code = list(needle)[2]
+            missing.extend((code, article_nb) for article_nb in matching.normalize_references(needle["ref"]) if (code, article_nb) not in results)
+        assert missing == [("CENV", "L753-1"), ("CENV", "12")]
+        # needles.csv line 21 follows the unclosed reference of line 20
+        assert ("CGCT", "L1424-71") in results and ("CGCT", "L1") in results
+
+    @pytest.mark.parametrize(
+        "text, expected",
+        [
+            (
+                "Vu l'article 5 de la loi du 10 juillet 1965 et l'article L. 1234-5 du Code du travail",
+                [("CTRAV", "L1234-5")],
+            ),
+            ("Vu l'article 5 et l'article 6 du Code civil", [("CCIV", "5"), ("CCIV", "6")]),
+            ("Articles L. 1111-1 et art. R. 4512-15 du Code du travail", [("CTRAV", "L1111-1"), ("CTRAV", "R4512-15")]),
+        ],
+    )
+    def test_uncited_keyword(self, text, expected):
+        assert list(matching.get_matching_result_item([text], None)) == expected
+
+    @pytest.mark.parametrize("file_path", DOCUMENTS)
+    @pytest.mark.parametrize("selected_codes", [None, ["CASSUR"], ["CASSUR", "CENV", "CSI", "CCIV"]])
+    def test_documents(self, file_path, selected_codes):
+        full_text = parse_doc(os.path.join(TESTS_DIR, file_path))
+        expected = list(get_legacy_matching_result_item(full_text, selected_codes, keyword_rule=False))
+        assert list(matching.get_matching_result_item(full_text, selected_codes, max_span=None)) == expected
+
+    @pytest.mark.parametrize("file_path", DOCUMENTS)
+    def test_documents_bounded(self, file_path):
+        full_text = parse_doc(os.path.join(TESTS_DIR, file_path))
+        # no reference of the test documents is longer than the default window
+        expected = list(get_legacy_matching_result_item(full_text, None))
+        assert list(matching.get_matching_result_item(full_text, None)) == expected
+        # the bounded regex and the bounded scanner agree
+        text = normalize_text(" ".join(full_text))
+        pattern = matching.switch_pattern(["CASSUR"], max_span=matching.MAX_REF_SPAN)
+        scanner, lookup = matching.build_scanner(["CASSUR"])
+        assert [restart_at_keyword(m.group("ref")) for m in pattern.finditer(text)] == [
+            ref for _code, ref in matching.scan_references(text, scanner, lookup)
+        ]
+
+    def test_results_dict(self):
+        full_text = parse_doc(os.path.join(TESTS_DIR, "newtest.docx"))
+        results_dict = matching.get_matching_results_dict(full_text, None)
+        assert results_dict["CASSUR"] == ["L385-2", "R343-4", "A421-13"]
+        assert results_dict["CCIV"][:4] == ["1120", "2288", "1240", "1140"]
+        assert sum(len(v) for v in results_dict.values()) == 37
+
+    def test_longest_alias(self):
+        results = list(matching.get_matching_result_item(["Article L. 32-1 du CPCE"], None))
+        assert results == [("CPCE", "L32-1")]
+
+    def test_wrong_pattern(self):
+        with pytest.raises(ValueError):
+            list(matching.get_matching_result_item(["article 1240 C. civ."], None, "wrong"))
+
+
+class TestArticleRef:
+    @pytest.mark.parametrize(
+        "ref, expected",
+        [
+            (" L. 385-2, R. 343-4 et A421-13 ", ["L385-2", "R343-4", "A421-13"]),
+            (" 3-12, 12-4-6, 14, 15 et 27 ", ["3-12", "12-4-6", "14", "15", "27"]),
+            (" L. 1111-1 et art. R. 4512-15. ", ["L1111-1", "R4512-15"]),
+            (" R. 811- 3. ", ["R811-3"]),
+            (" 1er du ", ["1"]),
+            # the text after the last number is not part of the reference
+            (" 1120. Voir aussi, dans le même sens, ", ["1120"]),
+            (" 2288 C. ", ["2288"]),
+        ],
+    )
+    def test_normalize(self, ref, expected):
+        assert matching.normalize_references(ref) == expected
+
+    def test_alinea(self):
+        article_ref = matching.parse_article_refs(" 1240 al. 1 est de nature à changer la donne. ")
+        assert article_ref == [matching.ArticleRef("", ("1240",), 1)]
+        assert str(article_ref[0]) == "1240"
+        assert len({article_ref[0], matching.ArticleRef("", ["1240"], 1)}) == 1
+
+    @pytest.mark.parametrize("ref", ["", " ", " du ", " premier ", " L. ", " - "])
+    def test_degenerate(self, ref):
+        assert matching.parse_article_refs(ref) == []
+
+    def test_slots(self):
+        with pytest.raises(AttributeError):
+            matching.ArticleRef("L", ("1",)).code = "CCIV"
+
+
+class TestCitations:
+    TEXT = [
+        "Introduction.",
+        "Selon l'article 1240 du Code civil et\tl'article L. 385-2 du Code des assurances,",
+        "voir l'article 1240 du C. civ.",
+    ]
+
+    def test_positions(self):
+        citations = matching.get_citations(self.TEXT, None, pages=[0, 0, 1])
+        assert list(citations) == [("CCIV", "1240"), ("CASSUR", "L385-2"), ("CCIV", "1240")]
+        text = " ".join(self.TEXT)
+        assert [text[citations.starts[i] : citations.ends[i]] for i in range(len(citations))] == [
+            "article 1240 du Code civil",
+            "article L. 385-2 du Code des assurances",
+            "article 1240 du C. civ.",
+        ]
+        assert citations[2] == matching.Citation("CCIV", "1240", 102, 125, 2, 1)
+        assert list(citations.paragraphs) == [1, 1, 2]
+
+    def test_back_references(self):
+        citations = matching.get_citations(self.TEXT, None)
+        assert citations.first_citation(2) == 0
+        assert citations.occurrences("CCIV", "1240") == [0, 2]
+        assert list(citations.pages) == [0, 0, 0]
+
+    def test_same_as_items(self):
+        full_text = parse_doc(os.path.join(TESTS_DIR, "newtest.docx"))
+        assert list(matching.get_citations(full_text, None)) == list(matching.get_matching_result_item(full_text, None))
+
+    def test_compact(self):
+        full_text = (f"Voir l'article {i % 500} du Code civil." for i in range(10000))
+        citations = matching.get_citations(full_text, None)
+        assert len(citations) == 10000
+        columns = [citations.keys, citations.starts, citations.ends, citations.paragraphs, citations.pages]
+        assert sum(column.itemsize * len(column) for column in columns) <= 10000 * 20
+        assert len(citations.articles) == 500
+
+
+class TestCodeArticle:
+    TEXT = [
+        "Voir C. civ., art. 1240, al. 2 et C. com., art. L. 110-1.",
+        "L'article 1240 du Code civil, article 1241 du Code pénal.",
+        "Code de la consommation : article L. 121-14 ; Code civil. Article 5 du Code pénal.",
+    ]
+
+    def test_code_article(self):
+        results = list(matching.get_matching_result_item(self.TEXT, None, "code_article"))
+        assert results == [("CCIV", "1240"), ("CCOM", "L110-1"), ("CCONSO", "L121-14")]
+
+    def test_both(self):
+        results = list(matching.get_matching_result_item(self.TEXT, None, "both"))
+        assert results == [
+            ("CCIV", "1240"),
+            ("CCOM", "L110-1"),
+            ("CCIV", "1240"),
+            ("CPEN", "1241"),
+            ("CCONSO", "L121-14"),
+            ("CPEN", "5"),
+        ]
+
+    def test_article_code_unchanged(self):
+        full_text = parse_doc(os.path.join(TESTS_DIR, "newtest.docx"))
+        # the sample documents only use the article_code order
+        assert list(matching.get_matching_result_item(full_text, None, "both")) == list(
+            matching.get_matching_result_item(full_text, None)
+        )
+
+    @pytest.mark.parametrize("chunk_size", [3, 20])
+    def test_streaming(self, chunk_size):
+        text = " ".join(self.TEXT)
+        chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+        expected = list(matching.get_matching_result_item([" ".join(chunks)], None, "both"))
+        assert list(matching.get_matching_result_item(iter(chunks), None, "both")) == expected
+        with ThreadPoolExecutor(2) as executor:
+            results = matching.get_matching_result_item_parallel(chunks * 20, None, "both", chunk_size=50, executor=executor)
+            assert list(results) == list(matching.get_matching_result_item(chunks * 20, None, "both"))
+
+    @pytest.mark.parametrize("file_path", ["newtest.docx", "testnew.odt"])
+    def test_no_double_counting(self, file_path):
+        full_text = parse_doc(os.path.join(TESTS_DIR, file_path)) + self.TEXT
+
+        def spans(pattern_format):
+            return list(matching.get_matcher(None, pattern_format=pattern_format).reference_spans(full_text))
+
+        both = spans("both")
+        assert set(spans("code_article")) <= set(both)
+        # running the two orders separately reads "C. civ., art. 1240 et C. com." twice
+        assert len(both) < len(spans("article_code")) + len(spans("code_article"))
+
+    def test_cache(self):
+        assert matching.get_matcher(None, pattern_format="both") is not matching.get_matcher(None)
+
+
+class TestRegexBackend:
+    def test_needles(self):
+        pytest.importorskip("re2")
+        full_text = [needles_text()]
+        expected = list(matching.get_matching_result_item(full_text, None, "both"))
+        matcher = matching.get_matcher(None, pattern_format="both", backend="re2")
+        assert matcher.backend == "re2"
+        assert list(matcher.iter_articles(full_text)) == expected
+
+    @pytest.mark.parametrize("file_path", DOCUMENTS)
+    def test_documents(self, file_path):
+        pytest.importorskip("re2")
+        full_text = parse_doc(os.path.join(TESTS_DIR, file_path))
+        text = normalize_text(" ".join(full_text))
+        expected = list(matching.get_matcher(None).iter_articles(full_text))
+        assert list(matching.get_matcher(None, backend="re2").iter_articles(full_text)) == expected
+        legacy = [m.group("ref") for m in matching.switch_pattern(None, backend="re").finditer(text)]
+        assert [m.group("ref") for m in matching.switch_pattern(None, backend="re2").finditer(text)] == legacy
+
+    def test_linear_time(self):
+        """Le motif d'origine ne s'emballe plus sur des milliers de mots-clés sans code"""
+        pytest.importorskip("re2")
+        text = "Code civil " + " ".join("Voir l'article {} des présentes.".format(i) for i in range(20000))
+        start = time.perf_counter()
+        assert list(matching.switch_pattern(None, backend="re2").finditer(text)) == []
+        assert time.perf_counter() - start < 1
+
+    def test_fallback(self, monkeypatch):
+        monkeypatch.setattr(matching, "re2", None)
+        assert matching.get_regex_backend("re2") == "re"
+        assert matching.compile_regex("article", "re2").search("Article 1240")
+
+    def test_wrong_backend(self):
+        with pytest.raises(ValueError):
+            matching.get_matcher(None, backend="pcre")
+
+
+class TestMatcherCache:
+    def test_same_selection(self):
+        matcher = matching.get_matcher(["CTRAV", "CCIV"])
+        assert matching.get_matcher(["CCIV", "CTRAV"]) is matcher
+        assert matching.get_matcher(["CCIV"]) is not matcher
+        assert matching.get_matcher(None) is matching.get_matcher([])
+
+    def test_selected_codes_only(self):
+        matcher = matching.get_matcher(["CTRAV"])
+        assert set(matcher.lookup.values()) == {"CTRAV", matching.ARTICLE_TOKEN}
+        text = ["Article 1240 du Code civil.", "Article L1234-1 du Code du travail"]
+        assert {code for code, _article_nb in matcher.iter_articles(text)} == {"CTRAV"}
+
+    def test_unknown_code(self):
+        with pytest.raises(KeyError):
+            matching.get_matcher(["CINCONNU"])
+
+
+class TestStreamingMatcher:
+    @pytest.mark.parametrize("chunk_size", [3, 50, 1000])
+    def test_split_anywhere(self, chunk_size):
+        """Les citations à cheval sur deux paragraphes sont trouvées comme dans le texte complet"""
+        text = normalize_text(" ".join(parse_doc(os.path.join(TESTS_DIR, "newtest.docx"))))
+        chunks = [text[i : i + chunk_size] for i in range(0, len(text), chunk_size)]
+        expected = list(get_legacy_matching_result_item([" ".join(chunks)], None))
+        assert list(matching.get_matching_result_item(iter(chunks), None)) == expected
+
+    def test_yield_before_end(self):
+        """La première citation est produite avant la lecture des paragraphes suivants"""
+        read = []
+
+        def paragraphs():
+            for i in range(1000):
+                read.append(i)
+                yield f"Article {i} du Code civil. " + "Sans référence. " * 10
+
+        results = matching.get_matching_result_item(paragraphs(), None)
+        assert next(results) == ("CCIV", "0")
+        assert len(read) < 5
+
+    def test_long_stream(self):
+        paragraphs = (f"Sans référence à un code, voir l'article {i} du Code civil." for i in range(100000))
+        start = time.perf_counter()
+        assert sum(1 for _ in matching.get_matching_result_item(paragraphs, None)) == 100000
+        assert time.perf_counter() - start < 10
+
+
+class TestParallelMatcher:
+    @pytest.mark.parametrize("file_path", ["newtest.docx", "newtest.pdf", "testnew.odt"])
+    def test_same_as_sequential(self, file_path):
+        full_text = parse_doc(os.path.join(TESTS_DIR, file_path)) * 5
+        expected = list(matching.get_matching_result_item(full_text, None))
+        results = matching.get_matching_result_item_parallel(full_text, None, workers=2, chunk_size=300)
+        assert list(results) == expected
+
+    def test_overlapping_references(self):
+        """Les mots-clés en attente d'un code à la frontière de deux morceaux ne sont comptés qu'une fois"""
+        full_text = [f"Voir l'article {i} et l'article {i + 1}, puis les articles L. {i}-2 du Code civil." for i in range(300)]
+        expected = list(matching.get_matching_result_item(full_text, None))
+        with ThreadPoolExecutor(2) as executor:
+            for chunk_size in [17, 64, 250]:
+                results = matching.get_matching_result_item_parallel(full_text, None, chunk_size=chunk_size, executor=executor)
+                assert list(results) == expected, chunk_size
+
+    def test_unbounded(self):
+        with pytest.raises(ValueError):
+            list(matching.get_matching_result_item_parallel(["article 1240 C. civ."], None, max_span=None))
+
+
+class TestMatcherScaling:
+    def test_bounded_reference(self):
+        """Un mot-clé trop éloigné du code ne produit plus de référence géante"""
+        filler = "sans aucune référence à un code de droit français " * 5
+        full_text = ["{}, voir l'article {}.".format(filler, i) for i in range(2000)] + ["Code civil"]
+        matcher = matching.get_matcher(None)
+        [(_code, ref)] = matching.stream_references(full_text, matcher.scanner, matcher.lookup, max_span=None)
+        assert len(ref) > 100000
+        assert list(matching.get_matching_result_item(full_text, None)) == [("CCIV", "1999")]
+
+    def test_uncited_articles(self):
+        """Des milliers de mots-clés sans code derrière eux ne font plus rescanner le texte"""
+        full_text = ["Code civil"] + ["Voir l'article {} des présentes.".format(i) for i in range(20000)]
+        start = time.perf_counter()
+        assert list(matching.get_matching_result_item(full_text, None)) == []
+        assert time.perf_counter() - start < 2
@@ -0,0 +1,50 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import pytest
+
+import matching
+from matching import get_matcher
+from parsing import normalize_text
+
+
+class TestNormalizeText:
+    @pytest.mark.parametrize(
+        "raw, expected",
+        [
+            ("article\xa0L. 121-1", "article L. 121-1"),
+            ("article L. 121-1", "article L. 121-1"),
+            ("L’article 1240", "L'article 1240"),
+            ("L. 121‑1", "L. 121-1"),
+            ("signiﬁcation", "signification"),
+            ("obli\xadgation​", "obligation"),
+            ("Code\tcivil\r\n", "Code civil  "),
+        ],
+    )
+    def test_characters(self, raw, expected):
+        assert normalize_text(raw) == expected
+
+    def test_unchanged(self):
+        text = "L'article 1240 du Code civil"
+        assert normalize_text(text) is text
+
+    def test_matching(self):
+        matcher = get_matcher(["CCIV"])
+        raw = ["Vu l’article\xa0L. 1240‑1 du Code\xa0civil."]
+        assert list(matcher.iter_articles(raw)) == list(matcher.iter_articles(["Vu l'article L. 1240-1 du Code civil."]))
+        assert len(list(matcher.iter_articles(raw))) == 1
+
+    def test_already_normalized(self, monkeypatch):
+        calls = []
+        monkeypatch.setattr(matching, "normalize_text", lambda text: calls.append(text) or normalize_text(text))
+        text = [normalize_text("Vu l’article\xa0L. 1240‑1 du Code\xa0civil.")]
+        assert list(matching.get_matching_result_item(text, ["CCIV"], normalized=True)) == [("CCIV", "L1240-1")]
+        assert list(get_matcher(["CCIV"]).find_citations(text, normalized=True)) == list(get_matcher(["CCIV"]).find_citations(text))
+        assert calls == text
+
+    def test_citations_offsets(self):
+        full_text = ["Une signiﬁcation.", "Vu l'article 1240 du Code civil."]
+        citations = get_matcher(["CCIV"]).find_citations(full_text)
+        citation = citations[0]
+        text = " ".join(normalize_text(paragraph) for paragraph in full_text)
+        assert text[citation.start : citation.end].startswith("article 1240")
+        assert citation.paragraph == 1
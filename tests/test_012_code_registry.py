@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import pytest
+
+import code_references
+from code_references import (
+    load_code_references,
+    get_long_and_short_code,
+    get_short_code,
+    get_short_code_from_full_name,
+    CODE_ALIASES,
+    CODE_REFERENCE,
+    CODE_REGEX,
+)
+from matching import get_matcher
+
+
+class TestCodeRegistry:
+    def test_registry(self):
+        assert len(CODE_REFERENCE) > 70
+        assert set(CODE_REFERENCE) == set(CODE_ALIASES) == set(CODE_REGEX)
+        assert CODE_REFERENCE["CCIV"] == "Code civil"
+
+    @pytest.mark.parametrize("short_code", list(CODE_REFERENCE))
+    def test_indexes(self, short_code):
+        long_code = CODE_REFERENCE[short_code]
+        assert get_short_code_from_full_name(long_code) == short_code
+        assert get_long_and_short_code(short_code) == (long_code, short_code)
+        for alias in CODE_ALIASES[short_code]:
+            # a full name wins over an alias eg. Code minier (CMINANC) and the alias Code minier (CMIN)
+            expected = get_short_code_from_full_name(alias) or short_code
+            assert get_short_code(alias) == expected, alias
+
+    def test_alias_lookup(self):
+        assert get_long_and_short_code("c. civ.") == ("Code civil", "CCIV")
+        assert get_long_and_short_code("Code inconnu") == (None, None)
+
+    def test_scanner_aliases(self):
+        matcher = get_matcher(["CCOMNC", "CMINANC", "CGIAN3", "CPCEX"])
+        text = "article 12 du Code des communes de la Nouvelle-Calédonie, art. 3 du Code minier (ancien), art. 4 du CGI, ann. III et art. L. 111-1 du CPC exéc."
+        assert list(matcher.iter_articles([text])) == [("CCOMNC", "12"), ("CMINANC", "3"), ("CGIAN3", "4"), ("CPCEX", "L111-1")]
+
+    def test_duplicate_alias(self, tmp_path):
+        file_path = tmp_path / "codes.csv"
+        file_path.write_text("short_code;long_code;aliases\nCCIV;Code civil;Code civil|civ.\nCX;Code x;Civ.\n", encoding="utf-8")
+        with pytest.raises(ValueError):
+            load_code_references(str(file_path))
+
+    def test_load(self, tmp_path):
+        file_path = tmp_path / "codes.csv"
+        file_path.write_text("short_code;long_code;aliases\nCX;Code x;Code x|C. x\n", encoding="utf-8")
+        assert load_code_references(str(file_path)) == ({"CX": "Code x"}, {"CX": ("Code x", "C. x")})
+        assert code_references.CODE_REFERENCES_PATH.endswith("code_references.csv")
@@ -0,0 +1,186 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import os
+import shutil
+import time
+from array import array
+
+import pytest
+from concurrent.futures import ProcessPoolExecutor
+from PyPDF2 import PdfReader, PdfWriter
+
+import parsing
+from matching import get_matcher
+from parsing import get_pdf_backends, iter_doc, iter_pdf_pages, parse_doc, PyPDF2Pages, PDF_BACKENDS, SKIPPED_PAGES
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def copy_document(tmp_path, file_name):
+    """parse_doc et iter_doc suppriment le fichier lu: travailler sur une copie"""
+    file_path = str(tmp_path / file_name)
+    shutil.copy(os.path.join(TESTS_DIR, file_name), file_path)
+    return file_path
+
+
+def build_pdf(tmp_path, nb_pages):
+    """Un PDF de nb_pages pages, chacune copie de newtest.pdf"""
+    page = PdfReader(os.path.join(TESTS_DIR, "newtest.pdf")).pages[0]
+    writer = PdfWriter()
+    for _ in range(nb_pages):
+        writer.add_page(page)
+    file_path = str(tmp_path / "pages.pdf")
+    with open(file_path, "wb") as f:
+        writer.write(f)
+    return file_path
+
+
+class TestIterDoc:
+    @pytest.mark.parametrize("file_name", ["newtest.pdf", "newtest.docx", "testnew.odt"])
+    def test_same_as_parse_doc(self, tmp_path, file_name):
+        expected = parse_doc(copy_document(tmp_path, file_name))
+        file_path = copy_document(tmp_path, file_name)
+        assert [line for _page_nb, line in iter_doc(file_path)] == expected
+        assert not os.path.exists(file_path)
+
+    def test_pages(self, tmp_path):
+        lines = list(iter_doc(build_pdf(tmp_path, 3)))
+        page_nbs = [page_nb for page_nb, _line in lines]
+        assert sorted(set(page_nbs)) == [0, 1, 2] and page_nbs == sorted(page_nbs)
+        assert lines[: page_nbs.count(0)] == [(0, line) for _page_nb, line in lines[-page_nbs.count(2) :]]
+
+    def test_lazy(self, tmp_path):
+        file_path = build_pdf(tmp_path, 2)
+        lines = iter_doc(file_path)
+        assert os.path.exists(file_path)
+        assert next(lines)[0] == 0
+        lines.close()
+        assert not os.path.exists(file_path)
+
+    def test_wrong_extension(self):
+        with pytest.raises(ValueError):
+            iter_doc("document.txt")
+
+    def test_citations_pages(self, tmp_path):
+        pages = array("I")
+
+        def read_lines():
+            for page_nb, line in iter_doc(build_pdf(tmp_path, 2)):
+                pages.append(page_nb)
+                yield line
+
+        citations = get_matcher(None).find_citations(read_lines(), pages)
+        assert len(citations) > 0
+        assert set(citations.pages) == {0, 1}
+
+
+class TestInMemoryDocument:
+    @pytest.mark.parametrize("file_name", ["newtest.pdf", "newtest.docx", "testnew.odt"])
+    def test_bytes_same_as_path(self, tmp_path, file_name):
+        expected = parse_doc(copy_document(tmp_path, file_name))
+        with open(os.path.join(TESTS_DIR, file_name), "rb") as f:
+            content = f.read()
+        assert parse_doc(content, doc_ext=file_name.split(".")[-1]) == expected
+
+    def test_file_object(self, tmp_path):
+        expected = parse_doc(copy_document(tmp_path, "newtest.pdf"))
+        with open(os.path.join(TESTS_DIR, "newtest.pdf"), "rb") as f:
+            assert [line for _page_nb, line in iter_doc(f, doc_ext="pdf")] == expected
+        # the source document is not removed
+        assert os.path.exists(os.path.join(TESTS_DIR, "newtest.pdf"))
+
+    def test_parallel_bytes(self, tmp_path):
+        with open(build_pdf(tmp_path, 5), "rb") as f:
+            content = f.read()
+        expected = list(iter_pdf_pages(content, workers=1))
+        assert list(iter_pdf_pages(content, workers=2, page_range=2, threshold=2)) == expected
+
+    def test_extension_required(self):
+        with pytest.raises(ValueError):
+            iter_doc(b"%PDF")
+        with pytest.raises(ValueError):
+            iter_doc(b"%PDF", doc_ext="txt")
+
+
+class TestParallelPdf:
+    def test_same_as_sequential(self, tmp_path):
+        file_path = build_pdf(tmp_path, 7)
+        expected = list(iter_pdf_pages(file_path, workers=1))
+        assert len(expected) == 7
+        assert list(iter_pdf_pages(file_path, workers=2, page_range=3, threshold=2)) == expected
+
+    def test_executor(self, tmp_path):
+        file_path = build_pdf(tmp_path, 4)
+        expected = list(iter_pdf_pages(file_path, workers=1))
+        with ProcessPoolExecutor(2) as executor:
+            assert list(iter_pdf_pages(file_path, page_range=1, threshold=2, executor=executor)) == expected
+            # the pool is not shut down with the document
+            assert list(iter_pdf_pages(file_path, page_range=3, threshold=2, executor=executor)) == expected
+
+    def test_below_threshold(self, tmp_path, monkeypatch):
+        monkeypatch.setattr(parsing, "ProcessPoolExecutor", None)
+        assert len(list(iter_pdf_pages(build_pdf(tmp_path, 3), workers=4, threshold=4))) == 3
+
+
+class FailingPages(PyPDF2Pages):
+    def extract_text(self, page_nb):
+        raise ValueError("unreadable page")
+
+
+class UnreadablePdf(PyPDF2Pages):
+    def __init__(self, f):
+        raise ValueError("no xref table")
+
+
+class SlowPages(PyPDF2Pages):
+    def extract_text(self, page_nb):
+        time.sleep(5)
+        return super().extract_text(page_nb)
+
+
+class TestPdfBackends:
+    PDF = os.path.join(TESTS_DIR, "newtest.pdf")
+
+    @pytest.mark.parametrize("backend", list(PDF_BACKENDS))
+    def test_backend(self, backend):
+        report = {}
+        lines = [line for _page_nb, lines in iter_pdf_pages(self.PDF, backend=backend, report=report) for line in lines]
+        assert report == {backend: [0]}
+        assert any("article 1120 du Code civil" in line for line in lines)
+
+    def test_wrong_backend(self):
+        with pytest.raises(ValueError):
+            get_pdf_backends("pdftotext")
+
+    def test_fallback(self, monkeypatch):
+        monkeypatch.setitem(PDF_BACKENDS, "pdfminer", FailingPages)
+        report = {}
+        assert list(iter_pdf_pages(self.PDF, backend="pdfminer", report=report)) == list(iter_pdf_pages(self.PDF, backend="pypdf2"))
+        assert report == {"pypdf2": [0]}
+
+    def test_document_fallback(self, monkeypatch):
+        monkeypatch.setitem(PDF_BACKENDS, "pdfminer", UnreadablePdf)
+        report = {}
+        assert list(iter_pdf_pages(self.PDF, backend="pdfminer", report=report)) == list(iter_pdf_pages(self.PDF, backend="pypdf2"))
+        assert report == {"pypdf2": [0]}
+
+    def test_unreadable_document(self, monkeypatch):
+        monkeypatch.setitem(PDF_BACKENDS, "pdfminer", UnreadablePdf)
+        monkeypatch.setitem(PDF_BACKENDS, "pypdf2", UnreadablePdf)
+        with pytest.raises(ValueError):
+            list(iter_pdf_pages(self.PDF))
+
+    def test_budget(self, monkeypatch):
+        monkeypatch.setitem(PDF_BACKENDS, "pdfminer", SlowPages)
+        report = {}
+        start = time.perf_counter()
+        list(iter_pdf_pages(self.PDF, backend="pdfminer", budget=0.2, report=report))
+        assert time.perf_counter() - start < 2
+        assert report == {"pypdf2": [0]}
+
+    def test_skipped(self, monkeypatch):
+        monkeypatch.setitem(PDF_BACKENDS, "pdfminer", FailingPages)
+        monkeypatch.setitem(PDF_BACKENDS, "pypdf2", FailingPages)
+        report = {}
+        assert list(iter_pdf_pages(self.PDF, report=report)) == [(0, [])]
+        assert report == {SKIPPED_PAGES: [0]}
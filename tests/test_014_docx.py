@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import os
+import zipfile
+
+import docx
+import pytest
+
+from matching import get_matcher
+from parsing import iter_doc, iter_docx_paragraphs
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+W = 'xmlns:w="http://schemas.openxmlformats.org/wordprocessingml/2006/main"'
+
+DOCUMENT = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:document {W}><w:body>
+<w:p><w:pPr><w:tabs><w:tab w:val="left" w:pos="720"/></w:tabs></w:pPr><w:r><w:t>Vu l'article 1240 du Code civil</w:t></w:r><w:r><w:footnoteReference w:id="1"/></w:r></w:p>
+<w:tbl><w:tr><w:tc><w:p><w:r><w:t>Art. L. 121</w:t><w:noBreakHyphen/><w:t>1 C. com.</w:t></w:r></w:p></w:tc>
+<w:tc><w:p><w:hyperlink><w:r><w:t>article 1241</w:t></w:r></w:hyperlink><w:r><w:tab/><w:t>du Code civil</w:t></w:r></w:p></w:tc></w:tr></w:tbl>
+<w:p><w:r><w:t xml:space="preserve">Texte </w:t></w:r><w:del><w:r><w:delText>supprimé </w:delText></w:r></w:del><w:ins><w:r><w:t>inséré</w:t></w:r></w:ins></w:p>
+<w:p><w:r><w:t>Avant </w:t></w:r><w:r><w:pict><w:txbxContent><w:p><w:r><w:t>Encadré</w:t></w:r></w:p></w:txbxContent></w:pict></w:r><w:r><w:t>après</w:t></w:r></w:p>
+</w:body></w:document>"""
+
+FOOTNOTES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:footnotes {W}>
+<w:footnote w:type="separator" w:id="-1"><w:p><w:r><w:separator/></w:r></w:p></w:footnote>
+<w:footnote w:id="1"><w:p><w:r><w:t>Voir aussi l'art. 1242 C. civ.</w:t></w:r></w:p></w:footnote>
+</w:footnotes>"""
+
+ENDNOTES = f"""<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<w:endnotes {W}><w:endnote w:id="1"><w:p><w:r><w:t>Art. 1243 C. civ.</w:t></w:r></w:p></w:endnote></w:endnotes>"""
+
+
+@pytest.fixture
+def docx_path(tmp_path):
+    file_path = str(tmp_path / "notes.docx")
+    with zipfile.ZipFile(file_path, "w") as archive:
+        archive.writestr("word/document.xml", DOCUMENT)
+        archive.writestr("word/footnotes.xml", FOOTNOTES)
+        archive.writestr("word/endnotes.xml", ENDNOTES)
+    return file_path
+
+
+class TestDocxParagraphs:
+    def test_locations(self, docx_path):
+        assert list(iter_docx_paragraphs(docx_path)) == [
+            ("body", "Vu l'article 1240 du Code civil"),
+            ("table", "Art. L. 121-1 C. com."),
+            ("table", "article 1241\tdu Code civil"),
+            ("body", "Texte inséré"),
+            ("body", "Encadré"),
+            ("body", "Avant après"),
+            ("footnote", ""),
+            ("footnote", "Voir aussi l'art. 1242 C. civ."),
+            ("endnote", "Art. 1243 C. civ."),
+        ]
+
+    def test_citations(self, docx_path):
+        lines = [line for _page_nb, line in iter_doc(docx_path)]
+        assert list(get_matcher(None).iter_articles(lines)) == [
+            ("CCIV", "1240"),
+            ("CCOM", "L121-1"),
+            ("CCIV", "1241"),
+            ("CCIV", "1242"),
+            ("CCIV", "1243"),
+        ]
+
+    @pytest.mark.parametrize("file_name", ["newtest.docx", "newtest.doc"])
+    def test_same_as_python_docx(self, file_name):
+        file_path = os.path.join(TESTS_DIR, file_name)
+        expected = [paragraph.text for paragraph in docx.Document(file_path).paragraphs]
+        assert [paragraph for _location, paragraph in iter_docx_paragraphs(file_path)] == expected
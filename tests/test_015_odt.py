@@ -0,0 +1,65 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import os
+import zipfile
+
+import pytest
+from odf import teletype, text
+from odf.opendocument import load
+
+from matching import get_matcher
+from parsing import iter_doc, iter_odt_paragraphs
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+NAMESPACES = " ".join(
+    [
+        'xmlns:office="urn:oasis:names:tc:opendocument:xmlns:office:1.0"',
+        'xmlns:text="urn:oasis:names:tc:opendocument:xmlns:text:1.0"',
+        'xmlns:table="urn:oasis:names:tc:opendocument:xmlns:table:1.0"',
+        'xmlns:draw="urn:oasis:names:tc:opendocument:xmlns:drawing:1.0"',
+    ]
+)
+
+CONTENT = f"""<?xml version="1.0" encoding="UTF-8"?>
+<office:document-content {NAMESPACES}><office:body><office:text>
+<text:h text:outline-level="1">L'article 1240 du Code civil</text:h>
+<text:p>Vu l'article<text:s text:c="3"/>1241 du <text:span>Code civil</text:span><text:note text:note-class="footnote"><text:note-citation>1</text:note-citation><text:note-body><text:p>Voir l'art. 1242 C. civ.</text:p></text:note-body></text:note>, et la suite.</text:p>
+<table:table><table:table-row><table:table-cell><text:p>Art. L. 121-1<text:tab/>C. com.</text:p></table:table-cell></table:table-row></table:table>
+<text:p>Avant <draw:frame><draw:text-box><text:p>Encadré</text:p></draw:text-box></draw:frame>après<text:note text:note-class="endnote"><text:note-citation>i</text:note-citation><text:note-body><text:p>Art. 1243 C. civ.</text:p></text:note-body></text:note></text:p>
+</office:text></office:body></office:document-content>"""
+
+
+@pytest.fixture
+def odt_path(tmp_path):
+    file_path = str(tmp_path / "notes.odt")
+    with zipfile.ZipFile(file_path, "w") as archive:
+        archive.writestr("content.xml", CONTENT)
+    return file_path
+
+
+class TestOdtParagraphs:
+    def test_locations(self, odt_path):
+        assert list(iter_odt_paragraphs(odt_path)) == [
+            ("heading", "L'article 1240 du Code civil"),
+            ("footnote", "Voir l'art. 1242 C. civ."),
+            ("body", "Vu l'article   1241 du Code civil, et la suite."),
+            ("table", "Art. L. 121-1\tC. com."),
+            ("body", "Encadré"),
+            ("endnote", "Art. 1243 C. civ."),
+            ("body", "Avant après"),
+        ]
+
+    def test_citations(self, odt_path):
+        lines = [line for _page_nb, line in iter_doc(odt_path)]
+        assert list(get_matcher(None).iter_articles(lines)) == [
+            ("CCIV", "1240"),
+            ("CCIV", "1242"),
+            ("CCIV", "1241"),
+            ("CCOM", "L121-1"),
+            ("CCIV", "1243"),
+        ]
+
+    def test_same_as_odfpy(self):
+        file_path = os.path.join(TESTS_DIR, "testnew.odt")
+        expected = [teletype.extractText(paragraph) for paragraph in load(file_path).getElementsByType(text.P)]
+        assert [paragraph for _location, paragraph in iter_odt_paragraphs(file_path)] == expected
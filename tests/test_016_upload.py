@@ -0,0 +1,237 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import io
+import os
+
+import bottle
+import pytest
+
+import app as codeislow_app
+from sandbox import ParserError
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+BOUNDARY = "codeislowboundary"
+
+
+def form_payload(file_name, content, fields=None):
+    """Le corps multipart/form-data du formulaire de dépôt"""
+    fields = {"user_past": "3", "user_future": "3", **(fields or {})}
+    parts = [
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="{name}"\r\n\r\n{value}\r\n'.encode("utf-8")
+        for name, value in fields.items()
+    ]
+    parts.append(
+        f'--{BOUNDARY}\r\nContent-Disposition: form-data; name="upload"; filename="{file_name}"\r\n'
+        "Content-Type: application/octet-stream\r\n\r\n".encode("utf-8") + content + b"\r\n"
+    )
+    return b"".join(parts) + f"--{BOUNDARY}--\r\n".encode("utf-8")
+
+
+def open_upload(file_name, content, fields=None, chunked=False):
+    """Dépose un document sur /upload/ (multipart/form-data) et renvoie la réponse, sans la lire"""
+    payload = form_payload(file_name, content, fields)
+    environ = {
+        "REQUEST_METHOD": "POST",
+        "PATH_INFO": "/upload/",
+        "QUERY_STRING": "",
+        "SERVER_NAME": "localhost",
+        "SERVER_PORT": "8080",
+        "wsgi.url_scheme": "http",
+        "wsgi.input": io.BytesIO(payload),
+        "CONTENT_LENGTH": str(len(payload)),
+        "CONTENT_TYPE": f"multipart/form-data; boundary={BOUNDARY}",
+    }
+    if chunked:
+        del environ["CONTENT_LENGTH"]
+        environ["HTTP_TRANSFER_ENCODING"] = "chunked"
+        environ["wsgi.input"] = io.BytesIO(b"%x\r\n%s\r\n0\r\n\r\n" % (len(payload), payload))
+    return codeislow_app.app(environ, lambda status, headers, exc_info=None: None)
+
+
+def post_upload(file_name, content, fields=None, chunked=False):
+    """Dépose un document sur /upload/ et renvoie le corps de la réponse"""
+    return b"".join(open_upload(file_name, content, fields, chunked)).decode("utf-8")
+
+
+@pytest.fixture
+def loaded(monkeypatch):
+    """Les documents transmis à load_result"""
+    documents = []
+
+    def fake_load_result(document, *args, doc_ext=None, **kwargs):
+        documents.append((document, doc_ext))
+        # like load_result, a generator which does nothing before its first row
+        return (row for row in [])
+
+    monkeypatch.setattr(codeislow_app, "load_result", fake_load_result)
+    return documents
+
+
+class TestReadUpload:
+    def test_in_memory(self):
+        assert codeislow_app.read_upload([b"x" * 600, b"x" * 400], max_size=2000, memory_size=1000) == b"x" * 1000
+
+    def test_spill(self):
+        file_path = codeislow_app.read_upload([b"x" * 600, b"x" * 401], max_size=2000, memory_size=1000, suffix=".pdf")
+        try:
+            assert file_path.endswith(".pdf")
+            with open(file_path, "rb") as f:
+                assert f.read() == b"x" * 1001
+        finally:
+            os.remove(file_path)
+
+    def test_too_large(self, monkeypatch):
+        spilled = []
+        real_temporary_file = codeislow_app.tempfile.NamedTemporaryFile
+
+        def temporary_file(**kwargs):
+            spilled.append(real_temporary_file(**kwargs))
+            return spilled[-1]
+
+        monkeypatch.setattr(codeislow_app.tempfile, "NamedTemporaryFile", temporary_file)
+        upload = io.BytesIO(b"x" * 10000)
+        with pytest.raises(codeislow_app.UploadTooLarge):
+            codeislow_app.read_upload(iter(lambda: upload.read(100), b""), max_size=2000, memory_size=1000)
+        # reading stopped at the limit, and the temporary file is removed
+        assert upload.tell() == 2100
+        assert len(spilled) == 1 and not os.path.exists(spilled[0].name)
+
+
+class TestReadForm:
+    @pytest.mark.parametrize("chunk_size", [1, 7, 16, 64 * 1024])
+    def test_fields(self, chunk_size):
+        payload = form_payload("mémoire.pdf", b"%PDF\r\n--codeislow", {"user_order": "", "CCIV": "on"})
+        forms, file_name, document = codeislow_app.read_form(
+            io.BytesIO(payload + b"epilogue"), BOUNDARY, len(payload), memory_size=100
+        )
+        assert forms == {"user_past": "3", "user_future": "3", "user_order": "", "CCIV": "on"}
+        assert file_name == "memoire.pdf" and document == b"%PDF\r\n--codeislow"
+
+    def test_spill_once(self, monkeypatch):
+        spilled = []
+        real_temporary_file = codeislow_app.tempfile.NamedTemporaryFile
+
+        def temporary_file(**kwargs):
+            spilled.append(real_temporary_file(**kwargs))
+            return spilled[-1]
+
+        monkeypatch.setattr(codeislow_app.tempfile, "NamedTemporaryFile", temporary_file)
+        payload = form_payload("document.pdf", b"x" * 5000)
+        _forms, _file_name, file_path = codeislow_app.read_form(io.BytesIO(payload), BOUNDARY, memory_size=1000)
+        try:
+            with open(file_path, "rb") as f:
+                assert f.read() == b"x" * 5000
+            assert file_path.endswith(".pdf") and [f.name for f in spilled] == [file_path]
+        finally:
+            os.remove(file_path)
+
+    def test_truncated(self):
+        payload = form_payload("document.pdf", b"x" * 5000)
+        with pytest.raises(ValueError):
+            codeislow_app.read_form(io.BytesIO(payload[:-10]), BOUNDARY)
+
+    def test_truncated_spill_removed(self, monkeypatch):
+        spilled = []
+        real_temporary_file = codeislow_app.tempfile.NamedTemporaryFile
+        monkeypatch.setattr(
+            codeislow_app.tempfile, "NamedTemporaryFile", lambda **kwargs: spilled.append(real_temporary_file(**kwargs)) or spilled[-1]
+        )
+        payload = form_payload("document.pdf", b"x" * 5000)
+        with pytest.raises(ValueError):
+            codeislow_app.read_form(io.BytesIO(payload[:3000]), BOUNDARY, memory_size=1000)
+        assert len(spilled) == 1 and not os.path.exists(spilled[0].name)
+
+    def test_boundary(self):
+        assert codeislow_app.get_boundary(f'multipart/form-data; boundary="{BOUNDARY}"') == BOUNDARY
+        assert codeislow_app.get_boundary("application/x-www-form-urlencoded") is None
+
+
+class TestUploadRoute:
+    def test_in_memory(self, loaded):
+        with open(os.path.join(TESTS_DIR, "newtest.pdf"), "rb") as f:
+            content = f.read()
+        post_upload("mémoire.pdf", content)
+        assert loaded == [(content, "pdf")]
+        assert not os.path.exists(os.path.join("tmp", "memoire.pdf"))
+
+    def test_not_spooled_by_bottle(self, monkeypatch, loaded):
+        # bottle writes the request body to a TemporaryFile above MEMFILE_MAX, cgi.FieldStorage the file parts
+        monkeypatch.setattr(bottle, "TemporaryFile", None)
+        monkeypatch.setattr(bottle.cgi.FieldStorage, "make_file", None)
+        content = b"x" * (bottle.BaseRequest.MEMFILE_MAX + 1)
+        post_upload("document.pdf", content)
+        assert loaded == [(content, "pdf")]
+
+    def test_not_multipart(self, loaded):
+        environ = {
+            "REQUEST_METHOD": "POST",
+            "PATH_INFO": "/upload/",
+            "wsgi.input": io.BytesIO(b"user_past=3"),
+            "CONTENT_LENGTH": "11",
+            "CONTENT_TYPE": "application/x-www-form-urlencoded",
+        }
+        body = b"".join(codeislow_app.app(environ, lambda status, headers, exc_info=None: None)).decode("utf-8")
+        assert body == codeislow_app.UPLOAD_FORM_INCORRECT
+        assert loaded == []
+
+    def test_wrong_format(self, loaded):
+        assert post_upload("document.txt", b"texte") == "Le format du fichier est incorrect"
+        assert loaded == []
+
+    def test_too_large(self, loaded):
+        body = post_upload("document.pdf", b"x" * (codeislow_app.UPLOAD_MAX_SIZE + 1))
+        assert "2 Mo" in body
+        assert loaded == []
+
+    def test_content_length(self, loaded):
+        body = post_upload("document.pdf", b"x" * (codeislow_app.UPLOAD_MAX_SIZE + codeislow_app.UPLOAD_FORM_MARGIN))
+        assert "2 Mo" in body
+        assert loaded == []
+
+    def test_chunked_too_large(self, loaded):
+        body = post_upload("document.pdf", b"x" * (codeislow_app.UPLOAD_MAX_SIZE + codeislow_app.UPLOAD_FORM_MARGIN), chunked=True)
+        assert body == codeislow_app.UPLOAD_TOO_LARGE
+        assert loaded == []
+
+    def test_chunked(self, loaded):
+        post_upload("document.pdf", b"%PDF", chunked=True)
+        assert loaded == [(b"%PDF", "pdf")]
+
+    def test_spill_removed_on_disconnect(self, loaded):
+        response = open_upload("document.pdf", b"x" * (codeislow_app.UPLOAD_MEMORY_SIZE + 1))
+        # the client goes away after the first chunk: the analysis never started
+        response.close()
+        file_path, _doc_ext = loaded[0]
+        assert isinstance(file_path, str) and not os.path.exists(file_path)
+
+    @pytest.mark.parametrize("fields, order", [({}, "document"), ({"user_order": "random"}, "document"), ({"user_order": "frequency"}, "frequency")])
+    def test_order(self, monkeypatch, fields, order):
+        orders = []
+        monkeypatch.setattr(codeislow_app, "load_result", lambda *args, order=None, **kwargs: orders.append(order) or iter([]))
+        post_upload("document.pdf", b"%PDF", fields)
+        assert orders == [order]
+
+    @pytest.mark.parametrize(
+        "fields",
+        [{"user_past": "-1"}, {"user_future": "nan"}, {"user_past": "100"}, {"user_future": "inf"}, {"user_past": "trois"}],
+    )
+    def test_wrong_period(self, monkeypatch, loaded, fields):
+        spilled = []
+        real_temporary_file = codeislow_app.tempfile.NamedTemporaryFile
+        monkeypatch.setattr(
+            codeislow_app.tempfile, "NamedTemporaryFile", lambda **kwargs: spilled.append(real_temporary_file(**kwargs)) or spilled[-1]
+        )
+        body = post_upload("document.pdf", b"x" * (codeislow_app.UPLOAD_MEMORY_SIZE + 1), fields)
+        assert body == codeislow_app.UPLOAD_PERIOD_INCORRECT
+        assert loaded == []
+        assert len(spilled) == 1 and not os.path.exists(spilled[0].name)
+
+    def test_parser_error(self, monkeypatch):
+        def failed_load_result(*args, **kwargs):
+            yield "<tr>row</tr>"
+            raise ParserError("the parser worker died")
+
+        monkeypatch.setattr(codeislow_app, "load_result", failed_load_result)
+        body = post_upload("document.pdf", b"%PDF")
+        assert "<tr>row</tr>" in body and codeislow_app.PARSER_FAILED in body
+        assert body.endswith(codeislow_app.end_results)
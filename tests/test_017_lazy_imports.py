@@ -0,0 +1,36 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import os
+import subprocess
+import sys
+
+import pytest
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.realpath(__file__)))
+TESTS_DIR = os.path.join(ROOT_DIR, "tests")
+PARSER_MODULES = ("PyPDF2", "pdfminer", "docx", "odf")
+
+
+def loaded_modules(code):
+    """Les bibliothèques d'analyse chargées après `code`, exécuté dans un nouvel interpréteur"""
+    check = "import sys; print(' '.join(m for m in {!r} if m in sys.modules))".format(PARSER_MODULES)
+    process = subprocess.run(
+        [sys.executable, "-c", f"{code}; {check}"], cwd=ROOT_DIR, capture_output=True, text=True, check=True
+    )
+    return process.stdout.split()
+
+
+class TestLazyImports:
+    @pytest.mark.parametrize("module", ["parsing", "matching", "codeislow", "app"])
+    def test_not_loaded_at_import(self, module):
+        assert loaded_modules(f"import {module}") == []
+
+    def test_docx_without_pdf_libraries(self):
+        docx_path = os.path.join(TESTS_DIR, "newtest.docx")
+        code = f"import parsing; assert list(parsing.iter_docx_paragraphs({docx_path!r}))"
+        assert loaded_modules(code) == []
+
+    def test_loaded_with_pdf(self):
+        pdf_path = os.path.join(TESTS_DIR, "newtest.pdf")
+        code = f"import parsing; assert len(parsing.PdfDocument({pdf_path!r}, 'pypdf2'))"
+        assert loaded_modules(code) == ["PyPDF2"]
@@ -0,0 +1,161 @@
+#!/usr/bin/env python3
+# coding: utf-8
+import os
+import shutil
+import time
+
+import pytest
+
+import parsing
+import sandbox
+from parsing import parse_doc
+from sandbox import ParserDeadline, ParserError, ParserPool, ParserTimeout
+
+TESTS_DIR = os.path.dirname(os.path.realpath(__file__))
+
+
+def copy_document(tmp_path, file_name):
+    """Le pool supprime le fichier lu: travailler sur une copie"""
+    file_path = str(tmp_path / file_name)
+    shutil.copy(os.path.join(TESTS_DIR, file_name), file_path)
+    return file_path
+
+
+def read_bytes(file_name):
+    with open(os.path.join(TESTS_DIR, file_name), "rb") as f:
+        return f.read()
+
+
+@pytest.fixture(scope="module")
+def pool():
+    with ParserPool(1) as pool:
+        yield pool
+
+
+def worker_pid(pool):
+    return pool.workers[0].process.pid
+
+
+class TestParserPool:
+    @pytest.mark.parametrize("file_name", ["newtest.pdf", "newtest.docx", "testnew.odt"])
+    def test_same_as_parse_doc(self, pool, tmp_path, file_name):
+        expected = parse_doc(copy_document(tmp_path, file_name))
+        file_path = copy_document(tmp_path, file_name)
+        assert [line for _page_nb, line in pool.iter_doc(file_path)] == expected
+        assert not os.path.exists(file_path)
+
+    def test_bytes_and_report(self, pool):
+        report = {}
+        lines = list(pool.iter_doc(read_bytes("newtest.pdf"), pdf_backend="pypdf2", report=report, doc_ext="pdf"))
+        assert lines == list(parsing.iter_doc(read_bytes("newtest.pdf"), pdf_backend="pypdf2", doc_ext="pdf"))
+        assert report == {"pypdf2": [0]}
+
+    def test_wrong_extension(self, pool):
+        with pytest.raises(ValueError):
+            pool.iter_doc("document.txt")
+
+    def test_unreadable_document(self, pool):
+        with pytest.raises(ParserError):
+            list(pool.iter_doc(b"not a zip archive", doc_ext="docx"))
+        # the worker is replaced and the pool keeps reading
+        assert len(list(pool.iter_doc(read_bytes("newtest.docx"), doc_ext="docx"))) > 0
+
+    def test_closed_reading(self, pool, tmp_path):
+        pid = worker_pid(pool)
+        file_path = copy_document(tmp_path, "newtest.docx")
+        lines = pool.iter_doc(file_path)
+        next(lines)
+        lines.close()
+        assert not os.path.exists(file_path)
+        assert worker_pid(pool) != pid and len(pool.workers) == 1
+
+    def test_worker_killed(self, pool):
+        lines = pool.iter_doc(read_bytes("newtest.pdf"), doc_ext="pdf")
+        next(lines)
+        pool.workers[0].process.kill()
+        with pytest.raises(ParserError):
+            list(lines)
+        assert pool.workers[0].process.is_alive()
+
+
+class TestLimits:
+    def test_timeout(self):
+        with ParserPool(1, timeout=0.001) as pool:
+            pid = worker_pid(pool)
+            with pytest.raises(ParserTimeout):
+                list(pool.iter_doc(read_bytes("newtest.pdf"), doc_ext="pdf"))
+            assert worker_pid(pool) != pid
+
+    @pytest.mark.skipif(sandbox.resource is None, reason="rlimits are POSIX only")
+    def test_memory_limit(self):
+        with ParserPool(1, memory_limit=10 * 1024 * 1024) as pool:
+            with pytest.raises(ParserError):
+                list(pool.iter_doc(read_bytes("newtest.pdf"), doc_ext="pdf"))
+
+    @pytest.mark.skipif(sandbox.resource is None, reason="rlimits are POSIX only")
+    def test_limits_restored(self):
+        before = [sandbox.resource.getrlimit(limit) for limit in (sandbox.resource.RLIMIT_AS, sandbox.resource.RLIMIT_CPU)]
+        with sandbox.resource_limits(1024 ** 4, 3600):
+            assert sandbox.resource.getrlimit(sandbox.resource.RLIMIT_CPU)[0] >= 3600
+        assert [sandbox.resource.getrlimit(limit) for limit in (sandbox.resource.RLIMIT_AS, sandbox.resource.RLIMIT_CPU)] == before
+
+    def test_no_idle_worker(self):
+        with ParserPool(1, timeout=0.2) as pool:
+            lines = pool.iter_doc(read_bytes("newtest.docx"), doc_ext="docx")
+            next(lines)
+            with pytest.raises(ParserTimeout):
+                list(pool.iter_doc(read_bytes("newtest.docx"), doc_ext="docx"))
+            lines.close()
+            assert len(list(pool.iter_doc(read_bytes("newtest.docx"), doc_ext="docx"))) > 0
+
+    def test_deadline(self):
+        with ParserPool(1) as pool:
+            pid = worker_pid(pool)
+            start = time.monotonic()
+            with pytest.raises(ParserDeadline):
+                list(pool.iter_doc(read_bytes("newtest.pdf"), doc_ext="pdf", deadline=start + 0.001))
+            # the reading stops at the deadline, not after PARSER_TIMEOUT, and the worker is replaced
+            assert time.monotonic() - start < pool.timeout
+            assert worker_pid(pool) != pid
+
+    def test_no_idle_worker_deadline(self):
+        with ParserPool(1) as pool:
+            lines = pool.iter_doc(read_bytes("newtest.docx"), doc_ext="docx")
+            next(lines)
+            start = time.monotonic()
+            with pytest.raises(ParserDeadline):
+                list(pool.iter_doc(read_bytes("newtest.docx"), doc_ext="docx", deadline=start + 0.2))
+            assert time.monotonic() - start < pool.timeout
+            lines.close()
+
+    def test_replacement_failed(self, monkeypatch):
+        with ParserPool(1, max_documents=1) as pool:
+            start_worker = pool.start_worker
+
+            def failed_start_worker():
+                raise OSError("no more processes")
+
+            monkeypatch.setattr(pool, "start_worker", failed_start_worker)
+            list(pool.iter_doc(read_bytes("newtest.docx"), doc_ext="docx"))
+            assert pool.workers == []
+            with pytest.raises(ParserError):
+                list(pool.iter_doc(read_bytes("newtest.docx"), doc_ext="docx"))
+            # the lost worker is started again by the next reading
+            monkeypatch.setattr(pool, "start_worker", start_worker)
+            assert len(list(pool.iter_doc(read_bytes("newtest.docx"), doc_ext="docx"))) > 0
+
+    def test_recycled(self):
+        with ParserPool(1, max_documents=2) as pool:
+            pids = []
+            for _ in range(3):
+                pids.append(worker_pid(pool))
+                list(pool.iter_doc(read_bytes("newtest.docx"), doc_ext="docx"))
+            assert pids[0] == pids[1] != pids[2]
+
+
+class TestIterDoc:
+    def test_in_process(self, monkeypatch, tmp_path):
+        monkeypatch.setattr(sandbox, "PARSER_WORKERS", 0)
+        monkeypatch.setattr(sandbox, "get_parser_pool", None)
+        expected = parse_doc(copy_document(tmp_path, "testnew.odt"))
+        assert [line for _page_nb, line in sandbox.iter_doc(copy_document(tmp_path, "testnew.odt"))] == expected